@@ -8,6 +8,7 @@ import sys
 import json
 import time
 import tempfile
+import uuid
 import shutil
 import warnings
 import random
@@ -16,17 +17,27 @@ from pathlib import Path
 from io import BytesIO
 
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
 import numpy as np
 import pyodbc
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import geopandas as gpd
 import leafmap.foliumap as leafmap
 from streamlit_lottie import st_lottie
 import folium
 from folium.plugins import MarkerCluster, HeatMap
+from openpyxl import load_workbook
+
+# polars is optional; the scatter-map filter falls back to pandas without it
+try:
+    import polars as pl
+    HAS_POLARS = True
+except ImportError:
+    HAS_POLARS = False
 
 # Local imports (make sure these modules exist in your project)
 from utils import (
@@ -38,16 +49,33 @@ from utils import (
     filter_data as filter_data_util,
     render_glow_line as render_glow_line_util,
     get_shared_data,
-    refresh_data_if_needed
+    refresh_data_if_needed,
+    count_by_category,
+    category_isin,
+    read_excel_fast,
+    read_tabular,
+    read_sample_data,
+    sample_data_exists,
+    prebuilt_parquet_path,
+    share_path_exists,
+    call_with_timeout,
+    group_mean_and_slope,
+    dataframe_to_csv_bytes,
+    session_frame_digest,
+    sql_snapshot_age_text,
+    HAS_PYARROW
 )
 from translations import TRANSLATIONS, get_translation
 from config import (
     THEME_CONFIG,
     RISK_THRESHOLDS,
     UPLOAD_CONFIG,
+    DATA_CONFIG,
     PDF_CONFIG,
     DB_CONFIG,
-    GLOBAL_CSS
+    GLOBAL_CSS,
+    LOADING_PULSE_HTML,
+    KPI_CSS
 )
 from pdf_generator import generate_report, generate_dashboard_report
 
@@ -63,7 +91,7 @@ st.set_page_config(
 # ------------------------------------------------------------------------------
 # Global CSS Injection (from your GLOBAL_CSS config)
 # ------------------------------------------------------------------------------
-st.markdown(GLOBAL_CSS, unsafe_allow_html=True)
+st.markdown(GLOBAL_CSS + KPI_CSS, unsafe_allow_html=True)
 
 # ------------------------------------------------------------------------------
 # Session State Defaults
@@ -116,6 +144,13 @@ event_translation = {
     "Short Following Distance": "跟车距离过近"
 }
 
+# Event types left out of the distribution charts (sensor noise / warnings)
+EXCLUDED_EVENTS = frozenset(("Occlusion", "PCW", "Tired", "Overspeed warning in the area", "Short Following Distance"))
+EXCLUDED_EVENTS_DETAIL = EXCLUDED_EVENTS | {"FCW"}
+# Label columns stored as categoricals once the dataset is loaded
+CATEGORICAL_COLUMNS = tuple(UPLOAD_CONFIG["categorical_columns"]) + ("Risk Level",)
+EXCLUDED_EVENTS_SQL = "[Event Type] NOT IN ({})".format(", ".join(f"'{event}'" for event in sorted(EXCLUDED_EVENTS)))
+
 # ------------------------------------------------------------------------------
 # Theme Configuration & Switch Function
 # ------------------------------------------------------------------------------
@@ -328,7 +363,6 @@ def run_sql_query(query, params=None):
                 query = query[:-1]
             query += """
                 OPTION (
-                    RECOMPILE,
                     OPTIMIZE FOR UNKNOWN,
                     FAST 50,
                     USE HINT('ENABLE_PARALLEL_PLAN_PREFERENCE')
@@ -349,6 +383,98 @@ def run_sql_query(query, params=None):
         st.error(f"Error executing SQL query: {e}")
         return pd.DataFrame()
 
+def build_sql_filters(selections: dict, include_events: bool = True):
+    """Translate sidebar selections into parameterized WHERE conditions.
+
+    Returns a list of SQL conditions using ``?`` placeholders and the tuple of
+    values to bind, so the query text stays identical across filter changes.
+    """
+    conditions, params = [], []
+    if not selections:
+        return conditions, tuple(params)
+    plate = selections.get("selected_license_plate")
+    if plate and plate != "All":
+        conditions.append("[License Plate] = ?")
+        params.append(plate)
+    groups = selections.get("selected_groups") or []
+    if groups:
+        conditions.append(f"[Group] IN ({', '.join('?' * len(groups))})")
+        params.extend(groups)
+    dates = selections.get("selected_dates")
+    if isinstance(dates, (list, tuple)) and len(dates) == 2:
+        conditions.append("[Shift Date] >= ? AND [Shift Date] <= ?")
+        params.extend(d.strftime('%Y-%m-%d') for d in dates)
+    shift = selections.get("selected_shift")
+    if shift and shift != "All":
+        conditions.append("[Shift] = ?")
+        params.append(shift)
+    events = selections.get("selected_events") or []
+    if include_events and events:
+        conditions.append(f"[Event Type] IN ({', '.join('?' * len(events))})")
+        params.extend(events)
+    return conditions, tuple(params)
+
+def selections_key(selections: dict) -> tuple:
+    """Hashable, order-independent form of the sidebar selections for cache keys."""
+    return tuple(sorted(
+        (key, tuple(value) if isinstance(value, list) else value)
+        for key, value in (selections or {}).items()
+    ))
+
+@st.cache_data(ttl=300, show_spinner=False)
+def sql_group_event_counts(selections_items: tuple) -> pd.DataFrame:
+    """Event counts per fleet group (noise events excluded) for a selections key."""
+    filter_conditions, params = build_sql_filters(dict(selections_items))
+    filter_conditions.append(EXCLUDED_EVENTS_SQL)
+    where_clause = "WHERE " + " AND ".join(filter_conditions)
+    sql_query = f"""
+        SELECT [Group], COUNT(*) as [Event Count]
+        FROM dbo.FMS_SPEED
+        {where_clause}
+        GROUP BY [Group]
+        ORDER BY [Event Count] DESC
+    """
+    return run_sql_query(sql_query, params)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def sql_speeding_group_counts(selections_items: tuple):
+    """Speeding counts per fleet group plus the overall total for a selections key."""
+    filter_conditions, params = build_sql_filters(dict(selections_items), include_events=False)
+    filter_conditions.append("[Event Type] = 'Speeding'")
+    where_clause = "WHERE " + " AND ".join(filter_conditions)
+    total_query = f"SELECT COUNT(*) as total_count FROM dbo.FMS_SPEED {where_clause}"
+    total_df = run_sql_query(total_query, params)
+    total_events = total_df.iloc[0]['total_count'] if not total_df.empty else 1
+    sql_query = f"""
+        SELECT [Group], COUNT(*) as [Number of Events]
+        FROM dbo.FMS_SPEED
+        {where_clause}
+        GROUP BY [Group]
+        ORDER BY [Number of Events] DESC
+    """
+    return run_sql_query(sql_query, params), total_events
+
+@st.cache_data(ttl=300, show_spinner=False)
+def sql_top_speeding_vehicles(selections_items: tuple) -> pd.DataFrame:
+    """Top 15 vehicles by speeding events, aggregated server-side for a selections key."""
+    filter_conditions, params = build_sql_filters(dict(selections_items))
+    filter_conditions.append("[Event Type] = 'Speeding'")
+    where_clause = "WHERE " + " AND ".join(filter_conditions)
+    sql_query = f"""
+        SELECT TOP 15
+            [License Plate],
+            [Group],
+            COUNT(*) as event_count,
+            AVG(CAST([Overspeeding Value] AS FLOAT)) as avg_speed,
+            MAX([Overspeeding Value]) as max_speed,
+            COUNT(DISTINCT CAST([Shift Date] AS DATE)) as unique_days
+        FROM dbo.FMS_SPEED
+        {where_clause}
+        GROUP BY [License Plate], [Group]
+        ORDER BY event_count DESC
+    """
+    return run_sql_query(sql_query, params)
+
 # ------------------------------------------------------------------------------
 # Helper Functions
 # ------------------------------------------------------------------------------
@@ -365,23 +491,82 @@ def load_lottie_json(json_path: str):
 
 def assign_risk_level(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Assign a 'Risk Level' based on 'Overspeeding Value':
-      - Extreme: >= 20
-      - High: 10 to <20
-      - Medium: <10
+    Assign a 'Risk Level' based on 'Overspeeding Value' and RISK_THRESHOLDS
+    (the same bins as utils.assign_risk_level):
+      - Extreme: >= RISK_THRESHOLDS["Extreme"]
+      - High: RISK_THRESHOLDS["High"] to < RISK_THRESHOLDS["Extreme"]
+      - Medium: below RISK_THRESHOLDS["High"]
     """
     if "Overspeeding Value" in df.columns:
-        conditions = [
-            df["Overspeeding Value"] >= 20,
-            (df["Overspeeding Value"] >= 10) & (df["Overspeeding Value"] < 20),
-            df["Overspeeding Value"] < 10
-        ]
-        choices = ["Extreme", "High", "Medium"]
-        df["Risk Level"] = np.select(conditions, choices, default="Medium")
+        values = df["Overspeeding Value"].to_numpy(dtype=float, na_value=np.nan)
+        # Bin edges [High, Extreme) map straight to category codes 0/1/2; missing values stay Medium
+        bins = np.array([RISK_THRESHOLDS["High"], RISK_THRESHOLDS["Extreme"]], dtype=float)
+        codes = np.searchsorted(bins, values, side="right")
+        codes[np.isnan(values)] = 0
+        df["Risk Level"] = pd.Categorical.from_codes(codes, categories=["Medium", "High", "Extreme"])
     else:
         df["Risk Level"] = "Medium"
     return df
 
+def categorize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Store the low-cardinality label columns as pandas categoricals, the
+    configured numeric columns in the smallest integer type that holds them,
+    and the remaining text columns as Arrow-backed strings, which st.dataframe
+    can ship to the browser without re-encoding Python objects on every rerun.
+    """
+    if "Driver" in df.columns and not isinstance(df["Driver"].dtype, pd.CategoricalDtype):
+        df["Driver"] = df["Driver"].fillna("").astype(str).str.strip()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in UPLOAD_CONFIG["numeric_columns"]:
+        if col in df.columns:
+            # Whole-number columns shrink to int8/int16; columns with fractions or gaps stay float64
+            df[col] = pd.to_numeric(df[col], errors="coerce", downcast="integer")
+    if HAS_PYARROW:
+        for col in df.select_dtypes(include="object").columns:
+            df[col] = df[col].astype("string[pyarrow]")
+    return df
+
+# Keyed on content so identical data arriving from different sources (SQL, upload, share, sample)
+# is prepared once and shared across sessions.
+@st.cache_data(show_spinner=False, max_entries=4, hash_funcs={
+    pd.DataFrame: lambda frame: pd.util.hash_pandas_object(frame, index=False).values.tobytes()
+})
+def prepare_dataset(df: pd.DataFrame) -> pd.DataFrame:
+    """Add Risk Level (when missing) and apply ``categorize_columns`` to a freshly loaded frame."""
+    df = df.copy()
+    if 'Overspeeding Value' in df.columns and "Risk Level" not in df.columns:
+        df = assign_risk_level(df)
+    return categorize_columns(df)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_excel(source, mtime=None, sidecar=False) -> pd.DataFrame:
+    """
+    Read an Excel dataset and normalize it with ``process_dataframe``.
+
+    ``mtime`` is only part of the cache key: a file edited on disk is re-read,
+    while refreshes of an unchanged file reuse the parsed frame. ``sidecar``
+    lets persistent files go through the Parquet sidecar of ``read_tabular``.
+    """
+    if sidecar:
+        # Persistent files live on the network share; bound the read so a dropped share can't hang the page
+        df = call_with_timeout(read_tabular, DATA_CONFIG['share_read_timeout'], source)
+    else:
+        df = read_excel_fast(source)
+    return process_dataframe(df)
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_sample_data(path: str, mtime: float) -> pd.DataFrame:
+    """
+    Read a bundled sample dataset (its pre-built Parquet copy when present).
+
+    ``mtime`` is the newest modification time of the workbook and its Parquet
+    copy and only serves as part of the cache key.
+    """
+    return process_dataframe(read_sample_data(path))
+
 @st.cache_data
 def load_data():
     """Load data from an uploaded file or a SQL database."""
@@ -405,7 +590,7 @@ def load_data():
             if df.empty:
                 st.warning("⚠️ No data returned from SQL query. Trying default file.")
                 DEFAULT_FILE_PATH = r"\\10.211.3.254\04. Mining\WBN - FLEET MANAGEMENT SYSTEM\Haulage DT Safety Event Report\FMS Event Data Query.xlsx"
-                if os.path.exists(DEFAULT_FILE_PATH):
+                if share_path_exists(DEFAULT_FILE_PATH):
                     df = pd.read_excel(DEFAULT_FILE_PATH)
                     st.session_state.using_default_data = True
                     st.info("ℹ️ Using default dataset.")
@@ -419,7 +604,7 @@ def load_data():
         except Exception as e:
             st.error(f"⚠️ Failed to connect to SQL database: {e}")
             DEFAULT_FILE_PATH = r"\\10.211.3.254\04. Mining\WBN - FLEET MANAGEMENT SYSTEM\Haulage DT Safety Event Report\FMS Event Data Query.xlsx"
-            if os.path.exists(DEFAULT_FILE_PATH):
+            if share_path_exists(DEFAULT_FILE_PATH):
                 df = pd.read_excel(DEFAULT_FILE_PATH)
                 st.session_state.using_default_data = True
                 st.info("ℹ️ Using default dataset as fallback.")
@@ -611,6 +796,32 @@ def filter_data(df: pd.DataFrame, selections: dict) -> pd.DataFrame:
         filtered_df = filtered_df[filtered_df["Event Type"].isin(selections["selected_events"])]
     return filtered_df
 
+def compute_filter_masks(filtered_df: pd.DataFrame) -> dict:
+    """Boolean row masks shared by the KPI cards and the analytics charts."""
+    no_rows = np.zeros(len(filtered_df), dtype=bool)
+    if "Event Type" in filtered_df.columns:
+        event_type = filtered_df["Event Type"]
+        speeding = category_isin(event_type, ("Speeding",))
+        included = ~category_isin(event_type, EXCLUDED_EVENTS)
+        included_detail = ~category_isin(event_type, EXCLUDED_EVENTS_DETAIL)
+    else:
+        speeding, included, included_detail = no_rows, ~no_rows, ~no_rows
+    extreme = category_isin(filtered_df["Risk Level"], ("Extreme",)) if "Risk Level" in filtered_df.columns else no_rows
+    return {
+        "speeding": speeding,
+        "extreme": extreme,
+        "included": included,
+        "included_detail": included_detail
+    }
+
+def get_filter_masks(filtered_df: pd.DataFrame) -> dict:
+    """Masks stored for the current filter application, rebuilt if they don't match ``filtered_df``."""
+    masks = st.session_state.get("filter_masks")
+    if masks is None or len(masks["speeding"]) != len(filtered_df):
+        masks = compute_filter_masks(filtered_df)
+        st.session_state.filter_masks = masks
+    return masks
+
 def render_glow_line():
     """Creates a visually appealing separator."""
     st.markdown(
@@ -722,6 +933,37 @@ def render_header():
             st_lottie(lottie_animation, speed=1, width=230, height=180, key="dashboard_animation")
     render_glow_line()
 
+def remove_uploaded_copy():
+    """Delete the on-disk copy of the previous upload, if any."""
+    path = st.session_state.pop("uploaded_path", None)
+    st.session_state.pop("uploaded_file_id", None)
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def save_uploaded_copy(uploaded_file) -> str:
+    """
+    Write the upload to this session's single temp path and return it.
+
+    The same upload is not rewritten, so its path and mtime (the ``load_excel``
+    cache key) stay stable across re-validations, and each session keeps at
+    most one copy on disk.
+    """
+    path = st.session_state.get("uploaded_path")
+    if (path and os.path.exists(path)
+            and st.session_state.get("uploaded_file_id") == uploaded_file.file_id):
+        return path
+    if "upload_token" not in st.session_state:
+        st.session_state.upload_token = uuid.uuid4().hex
+    path = os.path.join(tempfile.gettempdir(), f"fms_upload_{st.session_state.upload_token}.xlsx")
+    with open(path, "wb") as copy:
+        copy.write(uploaded_file.getbuffer())
+    st.session_state.uploaded_path = path
+    st.session_state.uploaded_file_id = uploaded_file.file_id
+    return path
+
 def render_file_upload():
     """Render file upload section."""
     st.markdown("📁 **Upload Your Dataset (Excel) / Wait for SQL Dataset**")
@@ -737,12 +979,20 @@ def render_file_upload():
                 st.write("Processing uploaded file...")
             try:
                 with st.spinner("Validating Excel file..."):
+                    # Only the header row is needed to validate the workbook
+                    wb = load_workbook(uploaded_file, read_only=True, data_only=True)
                     progress_bar.progress(25)
-                    test_df = pd.read_excel(uploaded_file, nrows=5)
+                    try:
+                        header = next(wb.worksheets[0].iter_rows(min_row=1, max_row=1, values_only=True), None)
+                    finally:
+                        wb.close()
+                    if not header or all(value is None for value in header):
+                        raise ValueError("the first sheet has no header row")
                     progress_bar.progress(50)
                     uploaded_file.seek(0)
+                    # Persist the upload once so later reloads parse a file on disk
+                    save_uploaded_copy(uploaded_file)
                     progress_bar.progress(100)
-                    time.sleep(0.5)
                     progress_container.empty()
                     st.success("✅ File uploaded successfully! Click 'Refresh Data' to use your dataset.")
                     st.session_state.data_needs_refresh = True
@@ -756,365 +1006,90 @@ def render_file_upload():
             del st.session_state.uploaded_file
             if 'pending_upload' in st.session_state:
                 del st.session_state.pending_upload
+        remove_uploaded_copy()
         st.session_state.using_default_data = True
 
+def column_nanmean(df: pd.DataFrame, column: str) -> float:
+    """NaN-skipping mean of a numeric column rounded to one decimal (0 when no values)."""
+    if column not in df.columns or df.empty:
+        return 0
+    values = df[column].to_numpy(dtype=np.float32, na_value=np.nan)
+    if np.isnan(values).all():
+        return 0
+    return round(float(np.nanmean(values)), 1)
+
+KPI_CARD_TEMPLATE = (
+    '<div class="kpi-card">'
+    '<div class="particle"></div><div class="particle"></div>'
+    '<div class="particle"></div><div class="particle"></div>'
+    '<div class="kpi-icon">{icon}</div>'
+    '<div class="kpi-title">{title}</div>'
+    '<div class="kpi-value">{value}</div>'
+    '<div class="kpi-subtext">{subtext}</div>'
+    '</div>'
+)
+
 def render_kpis(filtered_df: pd.DataFrame):
     """Calculate and display Key Performance Indicators."""
     lang = st.session_state.language
 
+    # Single pass over the KPI columns: boolean-mask reductions for the counts,
+    # NaN-skipping means for the averages (no filtered copies of the frame)
+    masks = get_filter_masks(filtered_df)
     total_safety_events = len(filtered_df)
-    total_speeding_events = len(filtered_df[filtered_df['Event Type'] == 'Speeding']) if "Event Type" in filtered_df.columns else 0
-    extreme_risk_events = len(filtered_df[filtered_df['Risk Level'] == 'Extreme']) if "Risk Level" in filtered_df.columns else 0
-
-    if "Max Speed(Km/h)" in filtered_df.columns and not filtered_df.empty:
-        valid_speeds = filtered_df['Max Speed(Km/h)'][pd.notna(filtered_df['Max Speed(Km/h)'])]
-        average_speed = valid_speeds.mean().round(1) if not valid_speeds.empty else 0
-    else:
-        average_speed = 0
+    total_speeding_events = int(masks["speeding"].sum())
+    extreme_risk_events = int(masks["extreme"].sum())
 
-    if "Overspeeding Value" in filtered_df.columns and not filtered_df.empty:
-        valid_overspeeds = filtered_df['Overspeeding Value'][pd.notna(filtered_df['Overspeeding Value'])]
-        average_overspeed = valid_overspeeds.mean().round(1) if not valid_overspeeds.empty else 0
-    else:
-        average_overspeed = 0
+    average_speed = column_nanmean(filtered_df, 'Max Speed(Km/h)')
+    average_overspeed = column_nanmean(filtered_df, 'Overspeeding Value')
 
     if "Driver" in filtered_df.columns:
         # Filter out drivers with empty names before getting top offenders
         valid_drivers_df = filtered_df[filtered_df['Driver'].notna() & (filtered_df['Driver'].str.strip() != '')]
-        top_offenders_series = valid_drivers_df['Driver'].value_counts().head(5)
-        top_offenders = "<br>".join(f"{name} ({count})" for name, count in top_offenders_series.items())
+        top_offenders_series = valid_drivers_df['Driver'].value_counts()
+        top_offenders_series = top_offenders_series[top_offenders_series > 0].head(5)
+        top_offenders = "<br>".join(
+            top_offenders_series.index.astype(str) + " (" + top_offenders_series.to_numpy().astype(str) + ")"
+        )
     else:
         top_offenders = "N/A"
 
     if "Group" in filtered_df.columns and not filtered_df.empty:
-        top_group = filtered_df['Group'].value_counts().idxmax()
-        top_group_count = filtered_df['Group'].value_counts().max()
+        group_counts = filtered_df['Group'].value_counts()
+        top_group, top_group_count = group_counts.index[0], group_counts.iloc[0]
     else:
         top_group, top_group_count = "N/A", 0
 
+    kpi_titles = TRANSLATIONS[lang]
+    cards = [
+        ("📊", kpi_titles["total_safety_events"], total_safety_events, "All recorded safety events"),
+        ("⚠️", kpi_titles["total_speeding_events"], total_speeding_events, "Speeding incidents"),
+        ("🔥", kpi_titles["extreme_risk_events"], extreme_risk_events, "High-risk incidents"),
+        ("🚩", kpi_titles["fleet_most_violations"], top_group, f"Total: {top_group_count}"),
+        ("🚛", kpi_titles["avg_speed"], average_speed, "Across all vehicles"),
+        ("⚡", kpi_titles["avg_overspeed"], average_overspeed, "Above speed limit"),
+        ("👥", kpi_titles["top_offenders"], top_offenders, "By event count"),
+    ]
+    # All seven cards go out as one markdown element laid out by the .kpi-grid CSS grid
     st.markdown(
-        """
-        <style>
-            @keyframes float {
-                0% { transform: translateY(0px); }
-                50% { transform: translateY(-10px); }
-                100% { transform: translateY(0px); }
-            }
-            
-            @keyframes particle {
-                0% { transform: translate(0, 0) scale(1); opacity: 0; }
-                50% { opacity: 1; }
-                100% { transform: translate(var(--tx), var(--ty)) scale(0); opacity: 0; }
-            }
-
-            .kpi-card {
-                background: linear-gradient(145deg, #1c2b3a, #23374d);
-                border-radius: 15px;
-                padding: 20px;
-                margin: 10px;
-                text-align: center;
-                box-shadow: 0 4px 8px rgba(0, 0, 0, 0.3);
-                transition: all 0.4s cubic-bezier(0.165, 0.84, 0.44, 1);
-                border: 1px solid rgba(255, 255, 255, 0.1);
-                position: relative;
-                overflow: hidden;
-                z-index: 1;
-            }
-
-            .kpi-card::before {
-                content: '';
-                position: absolute;
-                top: 0;
-                left: 0;
-                right: 0;
-                bottom: 0;
-                background: linear-gradient(125deg, #2c3e50, #1a5276, #154360);
-                opacity: 0;
-                z-index: -1;
-                transition: opacity 0.4s ease;
-                border-radius: 15px;
-            }
-
-            .kpi-card:hover {
-                transform: translateY(-10px);
-                box-shadow: 0 15px 25px rgba(0, 0, 0, 0.5);
-                border-color: rgba(41, 128, 185, 0.5);
-                animation: float 6s ease-in-out infinite;
-            }
-
-            .kpi-card:hover::before {
-                opacity: 1;
-            }
-
-            .kpi-card::after {
-                content: '';
-                position: absolute;
-                width: 200%;
-                height: 200%;
-                top: -50%;
-                left: -50%;
-                background: radial-gradient(circle, rgba(255,255,255,0.1) 0%, transparent 60%);
-                transform: rotate(30deg);
-                opacity: 0;
-                transition: opacity 0.3s ease;
-                pointer-events: none;
-            }
-
-            .kpi-card:hover::after {
-                opacity: 1;
-            }
-
-            .particle {
-                position: absolute;
-                width: 4px;
-                height: 4px;
-                background: rgba(255, 255, 255, 0.5);
-                border-radius: 50%;
-                pointer-events: none;
-                opacity: 0;
-            }
-
-            .kpi-card:hover .particle {
-                animation: particle 1.5s ease-out infinite;
-            }
-
-            .kpi-card:hover .particle:nth-child(1) { --tx: 20px; --ty: -20px; animation-delay: 0s; }
-            .kpi-card:hover .particle:nth-child(2) { --tx: -20px; --ty: -15px; animation-delay: 0.2s; }
-            .kpi-card:hover .particle:nth-child(3) { --tx: 15px; --ty: 20px; animation-delay: 0.4s; }
-            .kpi-card:hover .particle:nth-child(4) { --tx: -15px; --ty: 15px; animation-delay: 0.6s; }
-
-            .kpi-icon { 
-                font-size: 2.8rem; 
-                margin-bottom: 10px; 
-                color: #ff8c42; 
-                transition: transform 0.3s ease;
-                position: relative;
-            }
-
-            .kpi-title { 
-                font-size: 1.3rem; 
-                color: #ecf0f1; 
-                margin-bottom: 10px; 
-                font-weight: 600; 
-                transition: color 0.3s ease;
-                text-shadow: 0 2px 4px rgba(0,0,0,0.2);
-            }
-
-            .kpi-value { 
-                font-size: 2.2rem; 
-                font-weight: bold; 
-                color: #ffffff; 
-                margin-bottom: 5px; 
-                transition: all 0.3s ease;
-                position: relative;
-            }
-
-            .kpi-subtext { 
-                font-size: 1rem; 
-                color: #bdc3c7; 
-                font-style: italic; 
-                transition: color 0.3s ease;
-                opacity: 0.8;
-            }
-            
-            .kpi-card:hover .kpi-icon { 
-                transform: scale(1.1); 
-                color: #f39c12; 
-            }
-
-            .kpi-card:hover .kpi-title { 
-                color: #3498db; 
-            }
-
-            .kpi-card:hover .kpi-value { 
-                text-shadow: 0 0 15px rgba(52, 152, 219, 0.7);
-                letter-spacing: 1px; 
-            }
-
-            .kpi-card:hover .kpi-subtext { 
-                color: #e0e0e0; 
-                opacity: 1;
-            }
-        </style>
-        """,
+        '<div class="kpi-grid">'
+        + "".join(
+            KPI_CARD_TEMPLATE.format(icon=icon, title=title, value=value, subtext=subtext)
+            for icon, title, value, subtext in cards
+        )
+        + "</div>",
         unsafe_allow_html=True
     )
-
-    col1, col2, col3 = st.columns(3)
-    col4, col5, col6 = st.columns(3)
-    col7 = st.columns(1)[0]
-
-    with col1:
-        st.markdown(f"""
-        <div class="kpi-card">
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="kpi-icon">📊</div>
-            <div class="kpi-title">{TRANSLATIONS[lang]["total_safety_events"]}</div>
-            <div class="kpi-value">{total_safety_events}</div>
-            <div class="kpi-subtext">All recorded safety events</div>
-        </div>
-        """, unsafe_allow_html=True)
-    with col2:
-        st.markdown(f"""
-        <div class="kpi-card">
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="kpi-icon">⚠️</div>
-            <div class="kpi-title">{TRANSLATIONS[lang]["total_speeding_events"]}</div>
-            <div class="kpi-value">{total_speeding_events}</div>
-            <div class="kpi-subtext">Speeding incidents</div>
-        </div>
-        """, unsafe_allow_html=True)
-    with col3:
-        st.markdown(f"""
-        <div class="kpi-card">
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="kpi-icon">🔥</div>
-            <div class="kpi-title">{TRANSLATIONS[lang]["extreme_risk_events"]}</div>
-            <div class="kpi-value">{extreme_risk_events}</div>
-            <div class="kpi-subtext">High-risk incidents</div>
-        </div>
-        """, unsafe_allow_html=True)
-    with col4:
-        st.markdown(f"""
-        <div class="kpi-card">
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="kpi-icon">🚩</div>
-            <div class="kpi-title">{TRANSLATIONS[lang]["fleet_most_violations"]}</div>
-            <div class="kpi-value">{top_group}</div>
-            <div class="kpi-subtext">Total: {top_group_count}</div>
-        </div>
-        """, unsafe_allow_html=True)
-    with col5:
-        st.markdown(f"""
-        <div class="kpi-card">
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="kpi-icon">🚛</div>
-            <div class="kpi-title">{TRANSLATIONS[lang]["avg_speed"]}</div>
-            <div class="kpi-value">{average_speed}</div>
-            <div class="kpi-subtext">Across all vehicles</div>
-        </div>
-        """, unsafe_allow_html=True)
-    with col6:
-        st.markdown(f"""
-        <div class="kpi-card">
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="kpi-icon">⚡</div>
-            <div class="kpi-title">{TRANSLATIONS[lang]["avg_overspeed"]}</div>
-            <div class="kpi-value">{average_overspeed}</div>
-            <div class="kpi-subtext">Above speed limit</div>
-        </div>
-        """, unsafe_allow_html=True)
-    with col7:
-        st.markdown(f"""
-        <div class="kpi-card">
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="particle"></div>
-            <div class="kpi-icon">👥</div>
-            <div class="kpi-title">{TRANSLATIONS[lang]["top_offenders"]}</div>
-            <div class="kpi-value">{top_offenders}</div>
-            <div class="kpi-subtext">By event count</div>
-        </div>
-        """, unsafe_allow_html=True)
     render_glow_line()
 
 # -----------------------------------------------------------------------------
 # CHART RENDERING FUNCTIONS (Event distribution, group comparison, top vehicles, time series, maps, dynamic table)
 # -----------------------------------------------------------------------------
-def render_event_distribution(filtered_df: pd.DataFrame, event_df=None):
-    """Bar chart for event distribution by fleet group."""
-    render_chart_title("event_distribution")
-    if st.session_state.get("data_source") == "sql" and event_df is None:
-        try:
-            filter_conditions = []
-            selections = st.session_state.get("selections", {})
-            if selections:
-                if selections.get("selected_license_plate") != "All":
-                    filter_conditions.append(f"[License Plate] = '{selections['selected_license_plate']}'")
-                if selections.get("selected_groups"):
-                    groups_str = ", ".join([f"'{group}'" for group in selections.get("selected_groups", [])])
-                    if groups_str:
-                        filter_conditions.append(f"[Group] IN ({groups_str})")
-                if selections.get("selected_dates"):
-                    if isinstance(selections["selected_dates"], (list, tuple)) and len(selections["selected_dates"]) == 2:
-                        start_date, end_date = selections["selected_dates"]
-                        start_date_str = start_date.strftime('%Y-%m-%d')
-                        end_date_str = end_date.strftime('%Y-%m-%d')
-                        filter_conditions.append(f"[Shift Date] >= '{start_date_str}' AND [Shift Date] <= '{end_date_str}'")
-                if selections.get("selected_shift") != "All":
-                    filter_conditions.append(f"[Shift] = '{selections['selected_shift']}'")
-                if selections.get("selected_events"):
-                    events_str = ", ".join([f"'{event}'" for event in selections.get("selected_events", [])])
-                    if events_str:
-                        filter_conditions.append(f"[Event Type] IN ({events_str})")
-            excluded_events = ["Occlusion", "PCW", "Tired", "Overspeed warning in the area", "Short Following Distance"]
-            excluded_events_str = ", ".join([f"'{event}'" for event in excluded_events])
-            where_clause = "WHERE " + " AND ".join(filter_conditions) if filter_conditions else ""
-            if where_clause:
-                where_clause += f" AND [Event Type] NOT IN ({excluded_events_str})"
-            else:
-                where_clause = f"WHERE [Event Type] NOT IN ({excluded_events_str})"
-            sql_query = f"""
-                SELECT [Group], COUNT(*) as [Event Count]
-                FROM dbo.FMS_SPEED
-                {where_clause}
-                GROUP BY [Group]
-                ORDER BY [Event Count] DESC
-            """
-            group_events = run_sql_query(sql_query)
-            if not group_events.empty:
-                fig_bar = px.bar(
-                    group_events,
-                    x="Group",
-                    y="Event Count",
-                    color="Event Count",
-                    color_continuous_scale=[(0, "#2E8B57"), (1, "#F24C3D")],
-                    labels={"Event Count": "Number of Events", "Group": "Fleet Group"},
-                    text="Event Count"
-                )
-                fig_bar.update_layout(
-                    xaxis_title="Fleet Group",
-                    yaxis_title="Number of Events",
-                    height=500,
-                    margin=dict(l=50, r=50, t=40, b=50),
-                    hovermode="x unified"
-                )
-                fig_bar.update_traces(
-                    hoverlabel=dict(bgcolor="rgba(255,255,255,0.9)", font_size=13, font_family="Helvetica", font_color="black")
-                )
-                st.plotly_chart(fig_bar, use_container_width=True)
-                render_glow_line()
-                return
-        except Exception as e:
-            st.warning(f"Could not use direct SQL query for event distribution: {e}. Falling back to pandas.")
-    if event_df is None:
-        excluded_events = ["Occlusion", "PCW", "Tired", "Overspeed warning in the area", "Short Following Distance"]
-        event_df = filtered_df[~filtered_df["Event Type"].isin(excluded_events)] if "Event Type" in filtered_df.columns else filtered_df.copy()
-    if event_df.empty or "Group" not in event_df.columns:
-        st.warning("⚠️ No data available for event distribution.")
-        return
-    group_events = event_df.groupby("Group").size().reset_index(name="Event Count")
+@st.cache_data(show_spinner=False)
+def event_distribution_figure_json(groups: tuple, counts: tuple) -> str:
+    """Serialized event distribution bar chart, cached on the plotted values."""
     fig_bar = px.bar(
-        group_events,
+        pd.DataFrame({"Group": list(groups), "Event Count": list(counts)}),
         x="Group",
         y="Event Count",
         color="Event Count",
@@ -1132,206 +1107,134 @@ def render_event_distribution(filtered_df: pd.DataFrame, event_df=None):
     fig_bar.update_traces(
         hoverlabel=dict(bgcolor="rgba(255,255,255,0.9)", font_size=13, font_family="Helvetica", font_color="black")
     )
-    st.plotly_chart(fig_bar, use_container_width=True)
+    return fig_bar.to_json()
+
+def render_event_distribution(filtered_df: pd.DataFrame, event_df=None):
+    """Bar chart for event distribution by fleet group."""
+    render_chart_title("event_distribution")
+    if st.session_state.get("data_source") == "sql" and event_df is None:
+        try:
+            group_events = sql_group_event_counts(selections_key(st.session_state.get("selections", {})))
+            if not group_events.empty:
+                st.plotly_chart(pio.from_json(event_distribution_figure_json(
+                    tuple(group_events["Group"].astype(str).tolist()), tuple(group_events["Event Count"].astype(int).tolist())
+                )), use_container_width=True)
+                render_glow_line()
+                return
+        except Exception as e:
+            st.warning(f"Could not use direct SQL query for event distribution: {e}. Falling back to pandas.")
+    if event_df is None:
+        event_df = filtered_df[get_filter_masks(filtered_df)["included"]]
+    if event_df.empty or "Group" not in event_df.columns:
+        st.warning("⚠️ No data available for event distribution.")
+        return
+    group_events = count_by_category(event_df["Group"]).rename_axis("Group").reset_index(name="Event Count")
+    st.plotly_chart(pio.from_json(event_distribution_figure_json(
+        tuple(group_events["Group"].astype(str).tolist()), tuple(group_events["Event Count"].astype(int).tolist())
+    )), use_container_width=True)
     render_glow_line()
 
+def translate_labels(series: pd.Series, mapping: dict) -> pd.Series:
+    """Translate a label column by renaming its categories (work scales with labels, not rows)."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype("category")
+    return series.cat.rename_categories(lambda label: mapping.get(label, label))
+
+def render_event_pie(counts: pd.Series, event_col: str, group, hole: float):
+    """Pie chart of one fleet group's event counts (a row of the group x event table)."""
+    counts = counts[counts > 0]
+    if counts.empty:
+        st.warning(f"No data available for {group}.")
+        return
+    grouped = counts.rename_axis(event_col).reset_index(name="Count")
+    fig_pie = px.pie(
+        grouped,
+        names=event_col,
+        values="Count",
+        hole=hole,
+        color_discrete_sequence=["#FF6B6B", "#4ECDC4", "#556270", "#C7F464", "#FFA500", "#6B5B95", "#F7CAC9"],
+        hover_data={"Count": True}
+    )
+    fig_pie.update_traces(
+        textinfo='percent+label',
+        hovertemplate="<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percent}",
+        marker=dict(line=dict(color='#ffffff', width=2)),
+        hoverlabel=dict(bgcolor="rgba(255,255,255,0.9)", font_size=13, font_family="Helvetica", font_color="black")
+    )
+    fig_pie.update_layout(
+        margin=dict(l=20, r=20, t=60, b=20),
+        legend=dict(title="Event Types", orientation="h", yanchor="top", y=1.15, xanchor="center", x=0.5),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)'
+    )
+    st.plotly_chart(fig_pie, use_container_width=True)
+
 def render_event_distribution_detailed(filtered_df: pd.DataFrame):
     """Detailed pie charts for event distribution by fleet group."""
     render_chart_title("event_distribution_detailed")
-    excluded_events = ["Occlusion", "PCW", "FCW", "Tired", "Overspeed warning in the area", "Short Following Distance"]
-    detail_df = filtered_df[~filtered_df["Event Type"].isin(excluded_events)] if "Event Type" in filtered_df.columns else filtered_df.copy()
+    detail_df = filtered_df[get_filter_masks(filtered_df)["included_detail"]]
     lang = st.session_state.language
     if lang == "ZH":
+        translated = {}
         if "Group" in detail_df.columns:
-            detail_df["Group_Translated"] = detail_df["Group"].map(lambda x: group_translation.get(x, x))
+            translated["Group_Translated"] = translate_labels(detail_df["Group"], group_translation)
         if "Event Type" in detail_df.columns:
-            detail_df["Event Type_Translated"] = detail_df["Event Type"].map(lambda x: event_translation.get(x, x))
+            translated["Event Type_Translated"] = translate_labels(detail_df["Event Type"], event_translation)
+        detail_df = detail_df.assign(**translated)
         group_col, event_col, group_label = "Group_Translated", "Event Type_Translated", "组别"
     else:
         group_col, event_col, group_label = "Group", "Event Type", "Group"
-    groups = sorted(detail_df[group_col].unique()) if group_col in detail_df.columns else []
+    # One hash-aggregate for every (group, event) pair; each pie reads its row from this table
+    if group_col in detail_df.columns and event_col in detail_df.columns:
+        event_counts = detail_df.groupby([group_col, event_col], observed=True).size().unstack(fill_value=0)
+    else:
+        event_counts = pd.DataFrame()
+    groups = sorted(event_counts.index)
     view_mode = st.radio(
         TRANSLATIONS[lang]["view_mode_label"],
         options=[TRANSLATIONS[lang]["view_mode_all_groups"], TRANSLATIONS[lang]["view_mode_one_by_one"]],
         index=1,
         horizontal=True
     )
-    safety_colors = ["#FF6B6B", "#4ECDC4", "#556270", "#C7F464", "#FFA500", "#6B5B95", "#F7CAC9"]
     if groups:
         if view_mode == TRANSLATIONS[lang]["view_mode_all_groups"]:
             cols = st.columns(2)
             for i, group in enumerate(groups):
                 with cols[i % 2]:
                     st.subheader(f"{group_label}: {group}")
-                    group_df = detail_df[detail_df[group_col] == group]
-                    if not group_df.empty:
-                        grouped = group_df.groupby(event_col).size().reset_index(name="Count")
-                        fig_pie = px.pie(
-                            grouped,
-                            names=event_col,
-                            values="Count",
-                            hole=0.4,
-                            color_discrete_sequence=safety_colors,
-                            hover_data={"Count": True}
-                        )
-                        fig_pie.update_traces(
-                            textinfo='percent+label',
-                            hovertemplate="<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percent}",
-                            marker=dict(line=dict(color='#ffffff', width=2)),
-                            hoverlabel=dict(bgcolor="rgba(255,255,255,0.9)", font_size=13, font_family="Helvetica", font_color="black")
-                        )
-                        fig_pie.update_layout(
-                            margin=dict(l=20, r=20, t=60, b=20),
-                            legend=dict(title="Event Types", orientation="h", yanchor="top", y=1.15, xanchor="center", x=0.5),
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            paper_bgcolor='rgba(0,0,0,0)'
-                        )
-                        st.plotly_chart(fig_pie, use_container_width=True)
-                    else:
-                        st.warning(f"No data available for {group}.")
+                    render_event_pie(event_counts.loc[group], event_col, group, hole=0.4)
         else:
-            tabs = st.tabs([f"{group_label}: {g}" for g in groups])
-            for i, group in enumerate(groups):
-                with tabs[i]:
-                    group_df = detail_df[detail_df[group_col] == group]
-                    if not group_df.empty:
-                        grouped = group_df.groupby(event_col).size().reset_index(name="Count")
-                        fig_pie = px.pie(
-                            grouped,
-                            names=event_col,
-                            values="Count",
-                            hole=0.3,
-                            color_discrete_sequence=safety_colors,
-                            hover_data={"Count": True}
-                        )
-                        fig_pie.update_traces(
-                            textinfo='percent+label',
-                            hovertemplate="<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percent}",
-                            marker=dict(line=dict(color='#ffffff', width=2)),
-                            hoverlabel=dict(bgcolor="rgba(255,255,255,0.9)", font_size=13, font_family="Helvetica", font_color="black")
-                        )
-                        fig_pie.update_layout(
-                            margin=dict(l=20, r=20, t=60, b=20),
-                            legend=dict(title="Event Types", orientation="h", yanchor="top", y=1.15, xanchor="center", x=0.5),
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            paper_bgcolor='rgba(0,0,0,0)'
-                        )
-                        st.plotly_chart(fig_pie, use_container_width=True)
-                    else:
-                        st.warning(f"No data available for {group}.")
+            # st.tabs would build every hidden pie on each rerun; a tab-style selector only
+            # builds the one being viewed
+            tab_labels = [f"{group_label}: {g}" for g in groups]
+            active_tab = st.radio(
+                TRANSLATIONS[lang]["view_mode_one_by_one"],
+                options=range(len(groups)),
+                index=min(st.session_state.get("active_tab_idx", 0), len(groups) - 1),
+                format_func=lambda idx: tab_labels[idx],
+                horizontal=True,
+                label_visibility="collapsed"
+            )
+            st.session_state.active_tab_idx = active_tab
+            group = groups[active_tab]
+            render_event_pie(event_counts.loc[group], event_col, group, hole=0.3)
     else:
         st.warning("No fleet groups available after filtering.")
     render_glow_line()
 
-def render_group_comparison(filtered_df: pd.DataFrame, grouped_data=None):
-    """Dual-axis chart comparing speeding event percentages and counts by fleet group."""
-    render_chart_title("group_comparison")
-    if st.session_state.get("data_source") == "sql" and grouped_data is None:
-        try:
-            filter_conditions = []
-            selections = st.session_state.get("selections", {})
-            if selections:
-                if selections.get("selected_license_plate") != "All":
-                    filter_conditions.append(f"[License Plate] = '{selections['selected_license_plate']}'")
-                if selections.get("selected_groups"):
-                    groups_str = ", ".join([f"'{group}'" for group in selections.get("selected_groups", [])])
-                    if groups_str:
-                        filter_conditions.append(f"[Group] IN ({groups_str})")
-                if selections.get("selected_dates"):
-                    if isinstance(selections["selected_dates"], (list, tuple)) and len(selections["selected_dates"]) == 2:
-                        start_date, end_date = selections["selected_dates"]
-                        start_date_str = start_date.strftime('%Y-%m-%d')
-                        end_date_str = end_date.strftime('%Y-%m-%d')
-                        filter_conditions.append(f"[Shift Date] >= '{start_date_str}' AND [Shift Date] <= '{end_date_str}'")
-                if selections.get("selected_shift") != "All":
-                    filter_conditions.append(f"[Shift] = '{selections['selected_shift']}'")
-                filter_conditions.append(f"[Event Type] = 'Speeding'")
-            else:
-                filter_conditions = [f"[Event Type] = 'Speeding'"]
-            where_clause = "WHERE " + " AND ".join(filter_conditions)
-            total_query = f"SELECT COUNT(*) as total_count FROM dbo.FMS_SPEED {where_clause}"
-            total_df = run_sql_query(total_query)
-            total_events = total_df.iloc[0]['total_count'] if not total_df.empty else 1
-            sql_query = f"""
-                SELECT [Group], COUNT(*) as [Number of Events]
-                FROM dbo.FMS_SPEED
-                {where_clause}
-                GROUP BY [Group]
-                ORDER BY [Number of Events] DESC
-            """
-            grouped_data = run_sql_query(sql_query)
-            if not grouped_data.empty:
-                grouped_data['Percentage'] = (grouped_data['Number of Events'] / total_events) * 100
-                theme_colors = {"chart-1": "#2E8B57", "chart-2": "#FF7F0F"}
-                fig = make_subplots(specs=[[{"secondary_y": True}]])
-                fig.add_trace(
-                    go.Bar(
-                        x=grouped_data['Group'],
-                        y=grouped_data['Percentage'],
-                        name="Percentage of Speeding Events",
-                        text=[f"{p:.1f}%" for p in grouped_data['Percentage']],
-                        textposition='outside',
-                        customdata=grouped_data['Number of Events'],
-                        marker=dict(color=theme_colors["chart-1"], opacity=0.9, line=dict(width=1, color="black")),
-                        hoverlabel=dict(bgcolor="rgba(255,255,255,0.9)", font_size=13, font_family="Helvetica", font_color="black")
-                    ),
-                    secondary_y=False
-                )
-                fig.add_trace(
-                    go.Scatter(
-                        x=grouped_data['Group'],
-                        y=grouped_data['Number of Events'],
-                        name="Number of Speeding Events",
-                        mode='lines+markers',
-                        line=dict(color=theme_colors["chart-2"], width=3),
-                        marker=dict(size=8, color=theme_colors["chart-2"], line=dict(width=2, color='white')),
-                        hoverlabel=dict(bgcolor="rgba(255,255,255,0.9)", font_size=13, font_family="Helvetica", font_color="black")
-                    ),
-                    secondary_y=True
-                )
-                for i, (group, count) in enumerate(zip(grouped_data["Group"], grouped_data["Number of Events"])):
-                    fig.add_annotation(
-                        x=group,
-                        y=0,
-                        text=f"{count}",
-                        showarrow=False,
-                        font=dict(size=14, color="black"),
-                        yshift=-15
-                    )
-                fig.update_layout(
-                    xaxis_title="Fleet Group",
-                    yaxis_title="Percentage of Speeding Events",
-                    yaxis2=dict(title="Number of Speeding Events", overlaying='y', side='right', showgrid=False),
-                    height=450,
-                    template="plotly_white",
-                    legend=dict(orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5),
-                    margin=dict(l=50, r=50, t=40, b=50),
-                    xaxis=dict(showgrid=False, linecolor='black', linewidth=2),
-                    yaxis=dict(showgrid=True, gridcolor='rgba(200,200,200,0.2)', zeroline=False)
-                )
-                st.plotly_chart(fig, use_container_width=True)
-                render_glow_line()
-                return
-        except Exception as e:
-            st.warning(f"Could not use direct SQL query for group comparison: {e}. Falling back to pandas.")
-    if grouped_data is None:
-        speeding_df = filtered_df[filtered_df['Event Type'] == 'Speeding']
-        grouped_data = speeding_df.groupby('Group').size().reset_index(name='Number of Events')
-        total_events = grouped_data['Number of Events'].sum() if not grouped_data.empty else 1
-        grouped_data['Percentage'] = (grouped_data['Number of Events'] / total_events) * 100
-    if grouped_data.empty:
-        st.warning("⚠️ No data available for group comparison.")
-        return
+@st.cache_data(show_spinner=False)
+def group_comparison_figure_json(groups: tuple, counts: tuple, percentages: tuple) -> str:
+    """Serialized dual-axis group comparison chart, cached on the plotted values."""
     theme_colors = {"chart-1": "#2E8B57", "chart-2": "#FF7F0F"}
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     fig.add_trace(
         go.Bar(
-            x=grouped_data['Group'],
-            y=grouped_data['Percentage'],
+            x=groups,
+            y=percentages,
             name="Percentage of Speeding Events",
-            text=[f"{p:.1f}%" for p in grouped_data['Percentage']],
+            text=[f"{p:.1f}%" for p in percentages],
             textposition='outside',
-            customdata=grouped_data['Number of Events'],
+            customdata=counts,
             marker=dict(color=theme_colors["chart-1"], opacity=0.9, line=dict(width=1, color="black")),
             hoverlabel=dict(bgcolor="rgba(255,255,255,0.9)", font_size=13, font_family="Helvetica", font_color="black")
         ),
@@ -1339,8 +1242,8 @@ def render_group_comparison(filtered_df: pd.DataFrame, grouped_data=None):
     )
     fig.add_trace(
         go.Scatter(
-            x=grouped_data['Group'],
-            y=grouped_data['Number of Events'],
+            x=groups,
+            y=counts,
             name="Number of Speeding Events",
             mode='lines+markers',
             line=dict(color=theme_colors["chart-2"], width=3),
@@ -1349,7 +1252,7 @@ def render_group_comparison(filtered_df: pd.DataFrame, grouped_data=None):
         ),
         secondary_y=True
     )
-    for i, (group, count) in enumerate(zip(grouped_data["Group"], grouped_data["Number of Events"])):
+    for i, (group, count) in enumerate(zip(groups, counts)):
         fig.add_annotation(
             x=group,
             y=0,
@@ -1369,101 +1272,217 @@ def render_group_comparison(filtered_df: pd.DataFrame, grouped_data=None):
         xaxis=dict(showgrid=False, linecolor='black', linewidth=2),
         yaxis=dict(showgrid=True, gridcolor='rgba(200,200,200,0.2)', zeroline=False)
     )
-    st.plotly_chart(fig, use_container_width=True)
+    return fig.to_json()
+
+def render_group_comparison(filtered_df: pd.DataFrame, grouped_data=None):
+    """Dual-axis chart comparing speeding event percentages and counts by fleet group."""
+    render_chart_title("group_comparison")
+    if st.session_state.get("data_source") == "sql" and grouped_data is None:
+        try:
+            grouped_data, total_events = sql_speeding_group_counts(selections_key(st.session_state.get("selections", {})))
+            if not grouped_data.empty:
+                grouped_data['Percentage'] = (grouped_data['Number of Events'] / total_events) * 100
+                st.plotly_chart(pio.from_json(group_comparison_figure_json(
+                    tuple(grouped_data['Group'].astype(str).tolist()),
+                    tuple(grouped_data['Number of Events'].astype(int).tolist()),
+                    tuple(grouped_data['Percentage'].astype(float).tolist())
+                )), use_container_width=True)
+                render_glow_line()
+                return
+        except Exception as e:
+            st.warning(f"Could not use direct SQL query for group comparison: {e}. Falling back to pandas.")
+    if grouped_data is None:
+        speeding_df = filtered_df[get_filter_masks(filtered_df)["speeding"]]
+        grouped_data = speeding_df.groupby('Group', observed=True).size().reset_index(name='Number of Events')
+        total_events = grouped_data['Number of Events'].sum() if not grouped_data.empty else 1
+        grouped_data['Percentage'] = (grouped_data['Number of Events'] / total_events) * 100
+    if grouped_data.empty:
+        st.warning("⚠️ No data available for group comparison.")
+        return
+    st.plotly_chart(pio.from_json(group_comparison_figure_json(
+        tuple(grouped_data['Group'].astype(str).tolist()),
+        tuple(grouped_data['Number of Events'].astype(int).tolist()),
+        tuple(grouped_data['Percentage'].astype(float).tolist())
+    )), use_container_width=True)
     render_glow_line()
 
 def render_top_speeding_vehicles_chart(filtered_df: pd.DataFrame):
     """Bar chart showing the Top 20 Vehicles with Most Speeding Events."""
     render_chart_title("top_speeding_vehicles")
     try:
-        if 'Event Type' in filtered_df.columns and 'License Plate' in filtered_df.columns:
-            speeding_df = filtered_df[filtered_df['Event Type'] == 'Speeding'].copy()
-            if not speeding_df.empty:
-                license_counts = speeding_df.groupby(['License Plate', 'Group']).agg(
-                    event_count=('License Plate', 'count'),
-                    avg_speed=('Overspeeding Value', 'mean'),
-                    max_speed=('Overspeeding Value', 'max'),
-                    unique_days=('Shift Date', lambda x: len(pd.to_datetime(x).dt.date.unique()))
-                ).reset_index()
-                license_counts['Vehicle Info'] = license_counts['License Plate'] + ' (' + license_counts['Group'] + ')'
-                top_vehicles = license_counts.sort_values('event_count', ascending=False).head(15)
-                fig = go.Figure()
-                fig.add_trace(go.Bar(
-                    x=top_vehicles['Vehicle Info'],
-                    y=top_vehicles['event_count'],
-                    marker=dict(
-                        color=top_vehicles['avg_speed'],
-                        colorscale='RdYlGn_r',
-                        colorbar=dict(title="Avg Speed (km/h)")
-                    ),
-                    text=top_vehicles['event_count'],
-                    textposition='auto',
-                    hovertemplate="<b>%{x}</b><br>" +
-                                  "Events: %{y}<br>" +
-                                  "Avg Speed: %{customdata[0]:.1f} km/h<br>" +
-                                  "Max Speed: %{customdata[1]} km/h<br>" +
-                                  "Active Days: %{customdata[2]}<extra></extra>",
-                    customdata=top_vehicles[['avg_speed', 'max_speed', 'unique_days']].values
-                ))
-                fig.update_layout(
-                    title=dict(
-                        text=get_translation("top_speeding_vehicles", st.session_state.language),
-                        font=dict(size=24, family="Arial", color="#2a3f5f")
-                    ),
-                    xaxis=dict(
-                        title="",
-                        tickfont=dict(size=12),
-                        tickangle=-45
-                    ),
-                    yaxis=dict(
-                        title=dict(
-                            text="Number of Speeding Events",
-                            font=dict(size=14)
-                        ),
-                        tickfont=dict(size=12)
-                    ),
-                    template="plotly_white",
-                    height=600,
-                    margin=dict(t=80, b=100, l=80, r=40),
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    hovermode='closest'
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            else:
+        top_vehicles = None
+        if st.session_state.get("data_source") == "sql":
+            try:
+                top_vehicles = sql_top_speeding_vehicles(selections_key(st.session_state.get("selections", {})))
+                if top_vehicles.empty:
+                    top_vehicles = None
+            except Exception as e:
+                st.warning(f"Could not use direct SQL query for top speeding vehicles: {e}. Falling back to pandas.")
+        if top_vehicles is None:
+            if 'Event Type' not in filtered_df.columns or 'License Plate' not in filtered_df.columns:
+                st.warning("Required columns for speeding chart not found in the data.")
+                render_glow_line()
+                return
+            speeding_df = filtered_df[filtered_df['Event Type'] == 'Speeding']
+            if speeding_df.empty:
                 st.warning("No speeding events found in the selected data.")
-        else:
-            st.warning("Required columns for speeding chart not found in the data.")
+                render_glow_line()
+                return
+            # Parse the dates once up front so unique_days can use the built-in nunique
+            speeding_df = speeding_df.assign(shift_day=pd.to_datetime(speeding_df['Shift Date']).dt.normalize())
+            license_counts = speeding_df.groupby(['License Plate', 'Group'], observed=True).agg(
+                event_count=('License Plate', 'count'),
+                avg_speed=('Overspeeding Value', 'mean'),
+                max_speed=('Overspeeding Value', 'max'),
+                unique_days=('shift_day', 'nunique')
+            ).reset_index()
+            top_vehicles = license_counts.nlargest(15, 'event_count')
+        top_vehicles['Vehicle Info'] = top_vehicles['License Plate'].astype(str) + ' (' + top_vehicles['Group'].astype(str) + ')'
+        fig = go.Figure()
+        fig.add_trace(go.Bar(
+            x=top_vehicles['Vehicle Info'],
+            y=top_vehicles['event_count'],
+            marker=dict(
+                color=top_vehicles['avg_speed'],
+                colorscale='RdYlGn_r',
+                colorbar=dict(title="Avg Speed (km/h)")
+            ),
+            text=top_vehicles['event_count'],
+            textposition='auto',
+            hovertemplate="<b>%{x}</b><br>" +
+                          "Events: %{y}<br>" +
+                          "Avg Speed: %{customdata[0]:.1f} km/h<br>" +
+                          "Max Speed: %{customdata[1]} km/h<br>" +
+                          "Active Days: %{customdata[2]}<extra></extra>",
+            customdata=top_vehicles[['avg_speed', 'max_speed', 'unique_days']].values
+        ))
+        fig.update_layout(
+            title=dict(
+                text=get_translation("top_speeding_vehicles", st.session_state.language),
+                font=dict(size=24, family="Arial", color="#2a3f5f")
+            ),
+            xaxis=dict(
+                title="",
+                tickfont=dict(size=12),
+                tickangle=-45
+            ),
+            yaxis=dict(
+                title=dict(
+                    text="Number of Speeding Events",
+                    font=dict(size=14)
+                ),
+                tickfont=dict(size=12)
+            ),
+            template="plotly_white",
+            height=600,
+            margin=dict(t=80, b=100, l=80, r=40),
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            hovermode='closest'
+        )
+        st.plotly_chart(fig, use_container_width=True)
     except Exception as e:
         st.error(f"Error generating speeding vehicles chart: {e}")
     render_glow_line()
 
+def daily_average_speeding(df: pd.DataFrame) -> pd.DataFrame:
+    """Mean Overspeeding Value per Shift Date plus its trend line, fitted in the same pass over the rows."""
+    dates = pd.Categorical(df['Shift Date'])
+    means, slope, intercept = group_mean_and_slope(
+        dates.codes, df['Overspeeding Value'].to_numpy(dtype=np.float64, na_value=np.nan), len(dates.categories)
+    )
+    return pd.DataFrame({
+        'Shift Date': dates.categories,
+        'Overspeeding Value': means,
+        'Trend': slope * np.arange(len(means)) + intercept
+    })
+
+def linear_trend(y_values):
+    """Least-squares line through ``y_values`` at positions 0..n-1 (NaNs ignored); None if under two points."""
+    y = np.asarray(y_values, dtype=float)
+    x = np.arange(y.size, dtype=float)
+    valid = ~np.isnan(y)
+    if valid.sum() < 2:
+        return None
+    x_valid, y_valid = x[valid], y[valid]
+    x_mean, y_mean = x_valid.mean(), y_valid.mean()
+    # Closed-form degree-1 fit: slope = cov(x, y) / var(x)
+    slope = ((x_valid - x_mean) * (y_valid - y_mean)).sum() / ((x_valid - x_mean) ** 2).sum()
+    return slope * (x - x_mean) + y_mean
+
+def render_trend_chart(avg_speeding: pd.DataFrame) -> bool:
+    """Plot the daily average speeding with its trend line; warns and returns False if no trend can be fitted."""
+    if 'Trend' in avg_speeding.columns:
+        trend_line = None if avg_speeding['Trend'].isna().all() else avg_speeding['Trend'].to_numpy()
+    else:
+        trend_line = linear_trend(pd.to_numeric(avg_speeding['Overspeeding Value'], errors='coerce'))
+    if trend_line is None:
+        st.warning("⚠️ Not enough valid numeric data points to compute a trend line.")
+        return False
+    avg_speeding['Trend'] = trend_line
+    fig_ts = go.Figure()
+    fig_ts.add_trace(
+        go.Scatter(
+            x=avg_speeding['Shift Date'],
+            y=avg_speeding['Trend'],
+            mode='lines',
+            name="Trend Line",
+            line=dict(width=2, color='#ff7f0e', dash='dot'),
+            hovertemplate="<b>Date: %{x}</b><br>Trend: %{y:.2f} Km/h"
+        )
+    )
+    fig_ts.add_trace(
+        go.Scatter(
+            x=avg_speeding['Shift Date'],
+            y=avg_speeding['Overspeeding Value'],
+            mode='lines+markers',
+            name="Average Speeding Value",
+            line=dict(width=3, color='#1f77b4'),
+            marker=dict(
+                size=8,
+                color=avg_speeding['Overspeeding Value'],
+                colorscale='YlOrRd',
+                showscale=False,
+                line=dict(width=1, color='black')
+            ),
+            hovertemplate="<b>Date: %{x}</b><br>Average Speeding Value: %{y:.2f} Km/h"
+        )
+    )
+    final_trend_value = avg_speeding['Trend'].iloc[-1]
+    fig_ts.add_annotation(
+        x=avg_speeding['Shift Date'].iloc[-1],
+        y=avg_speeding['Trend'].iloc[-1],
+        ax=avg_speeding['Shift Date'].iloc[-2],
+        ay=avg_speeding['Trend'].iloc[-2],
+        xref="x", yref="y", axref="x", ayref="y",
+        showarrow=True, arrowhead=2, arrowsize=1.5, arrowcolor='#ff7f0e'
+    )
+    fig_ts.add_annotation(
+        x=avg_speeding['Shift Date'].iloc[-1],
+        y=avg_speeding['Trend'].iloc[-1],
+        text=f" {final_trend_value:.2f} Km/h",
+        showarrow=False,
+        font=dict(size=14, color='#ff7f0e', family='Arial Black'),
+        xshift=50,
+        yshift=0,
+        align='left'
+    )
+    fig_ts.update_layout(
+        title="Average Over-Speeding Values Over Time",
+        xaxis_title="Date",
+        yaxis_title="Average Speeding Value (Km/h)",
+        height=400,
+        margin=dict(l=50, r=100, t=40, b=50)
+    )
+    st.plotly_chart(fig_ts, use_container_width=True)
+    return True
+
 def render_time_series(filtered_df: pd.DataFrame, avg_speeding=None):
     """Time series chart for average speeding values with a trend line."""
     render_chart_title("time_series")
     if st.session_state.get("data_source") == "sql" and avg_speeding is None:
         try:
-            filter_conditions = []
-            selections = st.session_state.get("selections", {})
-            if selections:
-                if selections.get("selected_license_plate") != "All":
-                    filter_conditions.append(f"[License Plate] = '{selections['selected_license_plate']}'")
-                if selections.get("selected_groups"):
-                    groups_str = ", ".join([f"'{group}'" for group in selections.get("selected_groups", [])])
-                    if groups_str:
-                        filter_conditions.append(f"[Group] IN ({groups_str})")
-                if selections.get("selected_dates"):
-                    if isinstance(selections["selected_dates"], (list, tuple)) and len(selections["selected_dates"]) == 2:
-                        start_date, end_date = selections["selected_dates"]
-                        start_date_str = start_date.strftime('%Y-%m-%d')
-                        end_date_str = end_date.strftime('%Y-%m-%d')
-                        filter_conditions.append(f"[Shift Date] >= '{start_date_str}' AND [Shift Date] <= '{end_date_str}'")
-                if selections.get("selected_shift") != "All":
-                    filter_conditions.append(f"[Shift] = '{selections['selected_shift']}'")
-                if selections.get("selected_events"):
-                    events_str = ", ".join([f"'{event}'" for event in selections.get("selected_events", [])])
-                    if events_str:
-                        filter_conditions.append(f"[Event Type] IN ({events_str})")
+            filter_conditions, params = build_sql_filters(st.session_state.get("selections", {}))
             where_clause = "WHERE " + " AND ".join(filter_conditions) if filter_conditions else ""
             sql_query = f"""
                 SELECT [Shift Date], AVG([Overspeeding Value]) as [Overspeeding Value]
@@ -1472,75 +1491,10 @@ def render_time_series(filtered_df: pd.DataFrame, avg_speeding=None):
                 GROUP BY [Shift Date]
                 ORDER BY [Shift Date]
             """
-            avg_speeding = run_sql_query(sql_query)
+            avg_speeding = run_sql_query(sql_query, params)
             if not avg_speeding.empty and len(avg_speeding) >= 2:
-                x_numeric = np.arange(len(avg_speeding))
-                y_values = pd.to_numeric(avg_speeding['Overspeeding Value'], errors='coerce')
-                valid_indices = ~np.isnan(y_values)
-                if sum(valid_indices) < 2:
-                    st.warning("⚠️ Not enough valid numeric data points to compute a trend line.")
-                    return
-                x_valid = x_numeric[valid_indices]
-                y_valid = y_values[valid_indices]
-                trend_coeffs = np.polyfit(x_valid, y_valid, 1)
-                trend_line = np.polyval(trend_coeffs, x_numeric)
-                avg_speeding['Trend'] = trend_line
-                fig_ts = go.Figure()
-                fig_ts.add_trace(
-                    go.Scatter(
-                        x=avg_speeding['Shift Date'],
-                        y=avg_speeding['Trend'],
-                        mode='lines',
-                        name="Trend Line",
-                        line=dict(width=2, color='#ff7f0e', dash='dot'),
-                        hovertemplate="<b>Date: %{x}</b><br>Trend: %{y:.2f} Km/h"
-                    )
-                )
-                fig_ts.add_trace(
-                    go.Scatter(
-                        x=avg_speeding['Shift Date'],
-                        y=avg_speeding['Overspeeding Value'],
-                        mode='lines+markers',
-                        name="Average Speeding Value",
-                        line=dict(width=3, color='#1f77b4'),
-                        marker=dict(
-                            size=8,
-                            color=avg_speeding['Overspeeding Value'],
-                            colorscale='YlOrRd',
-                            showscale=False,
-                            line=dict(width=1, color='black')
-                        ),
-                        hovertemplate="<b>Date: %{x}</b><br>Average Speeding Value: %{y:.2f} Km/h"
-                    )
-                )
-                final_trend_value = avg_speeding['Trend'].iloc[-1]
-                fig_ts.add_annotation(
-                    x=avg_speeding['Shift Date'].iloc[-1],
-                    y=avg_speeding['Trend'].iloc[-1],
-                    ax=avg_speeding['Shift Date'].iloc[-2],
-                    ay=avg_speeding['Trend'].iloc[-2],
-                    xref="x", yref="y", axref="x", ayref="y",
-                    showarrow=True, arrowhead=2, arrowsize=1.5, arrowcolor='#ff7f0e'
-                )
-                fig_ts.add_annotation(
-                    x=avg_speeding['Shift Date'].iloc[-1],
-                    y=avg_speeding['Trend'].iloc[-1],
-                    text=f" {final_trend_value:.2f} Km/h",
-                    showarrow=False,
-                    font=dict(size=14, color='#ff7f0e', family='Arial Black'),
-                    xshift=50,
-                    yshift=0,
-                    align='left'
-                )
-                fig_ts.update_layout(
-                    title="Average Over-Speeding Values Over Time",
-                    xaxis_title="Date",
-                    yaxis_title="Average Speeding Value (Km/h)",
-                    height=400,
-                    margin=dict(l=50, r=100, t=40, b=50)
-                )
-                st.plotly_chart(fig_ts, use_container_width=True)
-                render_glow_line()
+                if render_trend_chart(avg_speeding):
+                    render_glow_line()
                 return
             else:
                 st.warning("⚠️ Not enough data points from SQL to compute a trend line.")
@@ -1548,7 +1502,7 @@ def render_time_series(filtered_df: pd.DataFrame, avg_speeding=None):
             st.warning(f"Could not use direct SQL query for time series: {e}. Falling back to pandas.")
     if avg_speeding is None:
         if "Overspeeding Value" in filtered_df.columns:
-            avg_speeding = filtered_df.groupby('Shift Date')['Overspeeding Value'].mean().reset_index()
+            avg_speeding = daily_average_speeding(filtered_df)
         else:
             avg_speeding = pd.DataFrame()
     if avg_speeding.empty:
@@ -1556,78 +1510,71 @@ def render_time_series(filtered_df: pd.DataFrame, avg_speeding=None):
         return
     if len(avg_speeding) >= 2:
         try:
-            x_numeric = np.arange(len(avg_speeding))
-            y_values = pd.to_numeric(avg_speeding['Overspeeding Value'], errors='coerce')
-            valid_indices = ~np.isnan(y_values)
-            if sum(valid_indices) < 2:
-                st.warning("⚠️ Not enough valid numeric data points to compute a trend line.")
+            if not render_trend_chart(avg_speeding):
                 return
-            x_valid = x_numeric[valid_indices]
-            y_valid = y_values[valid_indices]
-            trend_coeffs = np.polyfit(x_valid, y_valid, 1)
-            trend_line = np.polyval(trend_coeffs, x_numeric)
-            avg_speeding['Trend'] = trend_line
-            fig_ts = go.Figure()
-            fig_ts.add_trace(
-                go.Scatter(
-                    x=avg_speeding['Shift Date'],
-                    y=avg_speeding['Trend'],
-                    mode='lines',
-                    name="Trend Line",
-                    line=dict(width=2, color='#ff7f0e', dash='dot'),
-                    hovertemplate="<b>Date: %{x}</b><br>Trend: %{y:.2f} Km/h"
-                )
-            )
-            fig_ts.add_trace(
-                go.Scatter(
-                    x=avg_speeding['Shift Date'],
-                    y=avg_speeding['Overspeeding Value'],
-                    mode='lines+markers',
-                    name="Average Speeding Value",
-                    line=dict(width=3, color='#1f77b4'),
-                    marker=dict(
-                        size=8,
-                        color=avg_speeding['Overspeeding Value'],
-                        colorscale='YlOrRd',
-                        showscale=False,
-                        line=dict(width=1, color='black')
-                    ),
-                    hovertemplate="<b>Date: %{x}</b><br>Average Speeding Value: %{y:.2f} Km/h"
-                )
-            )
-            final_trend_value = avg_speeding['Trend'].iloc[-1]
-            fig_ts.add_annotation(
-                x=avg_speeding['Shift Date'].iloc[-1],
-                y=avg_speeding['Trend'].iloc[-1],
-                ax=avg_speeding['Shift Date'].iloc[-2],
-                ay=avg_speeding['Trend'].iloc[-2],
-                xref="x", yref="y", axref="x", ayref="y",
-                showarrow=True, arrowhead=2, arrowsize=1.5, arrowcolor='#ff7f0e'
-            )
-            fig_ts.add_annotation(
-                x=avg_speeding['Shift Date'].iloc[-1],
-                y=avg_speeding['Trend'].iloc[-1],
-                text=f" {final_trend_value:.2f} Km/h",
-                showarrow=False,
-                font=dict(size=14, color='#ff7f0e', family='Arial Black'),
-                xshift=50,
-                yshift=0,
-                align='left'
-            )
-            fig_ts.update_layout(
-                title="Average Over-Speeding Values Over Time",
-                xaxis_title="Date",
-                yaxis_title="Average Speeding Value (Km/h)",
-                height=400,
-                margin=dict(l=50, r=100, t=40, b=50)
-            )
-            st.plotly_chart(fig_ts, use_container_width=True)
         except Exception as e:
             st.warning(f"Unable to compute trend line: {e}")
     else:
         st.warning("⚠️ Not enough data points to compute a trend line.")
     render_glow_line()
 
+def speeding_map_frame(filtered_df: pd.DataFrame, lat_col: str, lon_col: str) -> pd.DataFrame:
+    """Speeding events at Medium risk or above with valid coordinates (scatter map input)."""
+    if HAS_POLARS:
+        try:
+            return (
+                pl.from_pandas(filtered_df)
+                .filter(
+                    (pl.col('Event Type') == 'Speeding')
+                    & pl.col('Risk Level').is_in(['Extreme', 'High', 'Medium'])
+                )
+                .drop_nulls([lat_col, lon_col])
+                .to_pandas()
+            )
+        except Exception:
+            # e.g. pyarrow missing or a column polars cannot convert; use the pandas path
+            pass
+    speeding = category_isin(filtered_df['Event Type'], ("Speeding",))
+    map_df = filtered_df[speeding & category_isin(filtered_df['Risk Level'], ('Extreme', 'High', 'Medium'))]
+    return map_df.dropna(subset=[lat_col, lon_col])
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_roads_geojson(path: str) -> dict:
+    """Parse the roads GeoJSON once; reruns reuse the cached dict."""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def build_heatmap(heat_df: pd.DataFrame, lat_center: float, lon_center: float, roads_geojson_path=None):
+    """Satellite leafmap with the optional roads layer and the speeding heatmap of ``heat_df``."""
+    m_heat = leafmap.Map(center=(lat_center, lon_center), zoom=12)
+    m_heat.add_basemap("SATELLITE")
+    if roads_geojson_path:
+        try:
+            m_heat.add_geojson(load_roads_geojson(roads_geojson_path), layer_name="WBN Roads", style={"color": "#3388ff", "weight": 3})
+            st.info("✅ WBN roads layer added to the heatmap.")
+        except Exception as e:
+            st.error(f"Error loading WBN roads GeoJSON for heatmap: {e}")
+    try:
+        m_heat.add_heatmap(
+            heat_df,
+            latitude='Start Lat',
+            longitude='Start Lng',
+            value='Overspeeding Value',
+            radius=20,
+            name="Speeding Heatmap",
+            key='map_visualization'
+        )
+    except Exception as e:
+        st.error(f"Error creating heatmap: {e}")
+        st.info("This may be due to NaN values in the data. Please ensure your data has valid coordinates and values.")
+    return m_heat
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def heatmap_html(heat_points: np.ndarray, lat_center: float, lon_center: float, roads_geojson_path=None) -> str:
+    """Serialized heatmap page for an array of (lat, lng, overspeeding) rows; reruns with the same points reuse it."""
+    heat_df = pd.DataFrame(heat_points, columns=['Start Lat', 'Start Lng', 'Overspeeding Value'])
+    return build_heatmap(heat_df, lat_center, lon_center, roads_geojson_path).to_html()
+
 def render_geospatial_maps(filtered_df: pd.DataFrame, map_df=None):
     """Render geospatial visualizations for speeding events."""
     render_chart_title("scatter_plot_header")
@@ -1635,8 +1582,7 @@ def render_geospatial_maps(filtered_df: pd.DataFrame, map_df=None):
     roads_geojson = None
     if os.path.exists(roads_geojson_path):
         try:
-            with open(roads_geojson_path, 'r') as f:
-                roads_geojson = json.load(f)
+            roads_geojson = load_roads_geojson(roads_geojson_path)
         except Exception as e:
             st.error(f"Error loading WBN roads GeoJSON: {e}")
     lat_col = 'Start Lat' if 'Start Lat' in filtered_df.columns else ('latitude' if 'latitude' in filtered_df.columns else None)
@@ -1648,40 +1594,39 @@ def render_geospatial_maps(filtered_df: pd.DataFrame, map_df=None):
         if "Risk Level" not in filtered_df.columns:
             st.warning("⚠️ 'Risk Level' column missing! Defaulting to all speeding events.")
             filtered_df = assign_risk_level(filtered_df)
-        map_df = filtered_df[(filtered_df['Event Type'] == 'Speeding') & 
-                    (filtered_df['Risk Level'].isin(['Extreme', 'High', 'Medium']))]
-        map_df = map_df.dropna(subset=[lat_col, lon_col])
+        map_df = speeding_map_frame(filtered_df, lat_col, lon_col)
     if map_df.empty:
         st.warning("⚠️ No speeding event data available for visualization.")
     else:
         color_map = {'Extreme': '#FF0000', 'High': '#FFA500', 'Medium': '#FFFF00'}
-        hover_data = []
-        for _, row in map_df.iterrows():
-            hover_text = f"<b>Risk Level:</b> {row.get('Risk Level', 'N/A')}<br>"
-            if 'License Plate' in row:
-                hover_text += f"<b>License Plate:</b> {row['License Plate']}<br>"
-            if 'Driver' in row:
-                hover_text += f"<b>Driver:</b> {row['Driver']}<br>"
-            if 'Max Speed(Km/h)' in row:
-                hover_text += f"<b>Max Speed:</b> {row['Max Speed(Km/h)']} Km/h<br>"
-            if 'Overspeeding Value' in row:
-                hover_text += f"<b>Overspeeding Value:</b> {row['Overspeeding Value']} Km/h<br>"
-            hover_data.append(hover_text)
-        map_df['hover_text'] = hover_data
+        # One labelled part per available column, joined row-wise by a single vectorized str.cat
+        hover_fields = [
+            ('Risk Level', "<b>Risk Level:</b> ", "<br>"),
+            ('License Plate', "<b>License Plate:</b> ", "<br>"),
+            ('Driver', "<b>Driver:</b> ", "<br>"),
+            ('Max Speed(Km/h)', "<b>Max Speed:</b> ", " Km/h<br>"),
+            ('Overspeeding Value', "<b>Overspeeding Value:</b> ", " Km/h<br>")
+        ]
+        hover_parts = [
+            map_df[col].astype(str).radd(label) + suffix
+            for col, label, suffix in hover_fields if col in map_df.columns
+        ]
+        hover_text = hover_parts[0].str.cat(hover_parts[1:])
+        map_df = map_df.assign(hover_text=hover_text)
         fig = px.scatter_map(
             map_df,
             lat=lat_col,
             lon=lon_col,
             color='Risk Level',
             color_discrete_map=color_map,
-            size=[12]*len(map_df),
-            size_max=15,
             zoom=10,
             height=700,
             hover_name='Risk Level',
             hover_data={ 'hover_text': True, lat_col: False, lon_col: False, 'Risk Level': False },
             title='Speeding Events by Location'
         )
+        # Constant marker size (a uniform size column scaled to size_max drew every point at 15)
+        fig.update_traces(marker=dict(size=15))
         fig.update_layout(
             mapbox_style=st.selectbox(
                 "Select Map Style",
@@ -1709,28 +1654,8 @@ def render_geospatial_maps(filtered_df: pd.DataFrame, map_df=None):
         else:
             lat_center = map_df_heat['Start Lat'].mean()
             lon_center = map_df_heat['Start Lng'].mean()
-        m_heat = leafmap.Map(center=(lat_center, lon_center), zoom=12)
-        m_heat.add_basemap("SATELLITE")
-        if roads_geojson:
-            try:
-                m_heat.add_geojson(roads_geojson_path, layer_name="WBN Roads", style={"color": "#3388ff", "weight": 3})
-                st.info("✅ WBN roads layer added to the heatmap.")
-            except Exception as e:
-                st.error(f"Error loading WBN roads GeoJSON for heatmap: {e}")
         map_df_heat = map_df_heat.dropna(subset=['Start Lat', 'Start Lng', 'Overspeeding Value'])
-        try:
-            m_heat.add_heatmap(
-                map_df_heat,
-                latitude='Start Lat',
-                longitude='Start Lng',
-                value='Overspeeding Value',
-                radius=20,
-                name="Speeding Heatmap",
-                key='map_visualization'
-            )
-        except Exception as e:
-            st.error(f"Error creating heatmap: {e}")
-            st.info("This may be due to NaN values in the data. Please ensure your data has valid coordinates and values.")
+        roads_path = roads_geojson_path if roads_geojson else None
         uploaded_files_2 = st.file_uploader(
             "Upload additional geospatial files for heatmap", 
             type=["zip", "geojson", "shp", "dbf", "shx", "prj", "cpg", "gpkg"], 
@@ -1738,6 +1663,8 @@ def render_geospatial_maps(filtered_df: pd.DataFrame, map_df=None):
             accept_multiple_files=True
         )
         if uploaded_files_2:
+            # Extra layers make the map one-off, so it is built and rendered live
+            m_heat = build_heatmap(map_df_heat, lat_center, lon_center, roads_path)
             try:
                 if any(f.name.endswith(".shp") for f in uploaded_files_2):
                     with tempfile.TemporaryDirectory() as tmpdir:
@@ -1753,7 +1680,10 @@ def render_geospatial_maps(filtered_df: pd.DataFrame, map_df=None):
                     m_heat.add_gdf(gdf_layer, layer_name="Uploaded Layer")
             except Exception as e:
                 st.error(f"Error processing uploaded files: {e}")
-        m_heat.to_streamlit(height=600, key='map_visualization')
+            m_heat.to_streamlit(height=600, key='map_visualization')
+        else:
+            heat_points = map_df_heat[['Start Lat', 'Start Lng', 'Overspeeding Value']].to_numpy(dtype=float)
+            components.html(heatmap_html(heat_points, lat_center, lon_center, roads_path), height=600)
     else:
         st.warning("⚠️ No valid geospatial data available for heatmap.")
     render_glow_line()
@@ -1791,18 +1721,58 @@ def render_dynamic_table(df: pd.DataFrame):
             st_lottie(lottie_anim, speed=1, width=400, height=400)
     if selected_columns:
         if st.session_state.language == "ZH":
-            display_df = df.copy()
-            for col in display_df.columns:
-                translated_col = get_translation(col, st.session_state.language)
-                if translated_col != col:
-                    display_df = display_df.rename(columns={col: translated_col})
-            st.dataframe(display_df[selected_columns], use_container_width=True)
+            # Relabel only the selected columns; rename on the selection avoids copying the full frame
+            column_labels = {
+                col: get_translation(col, st.session_state.language)
+                for col in selected_columns
+                if get_translation(col, st.session_state.language) != col
+            }
+            st.dataframe(df[selected_columns].rename(columns=column_labels), use_container_width=True)
         else:
             st.dataframe(df[selected_columns], use_container_width=True)
     else:
         st.warning("⚠️ Please select at least one column to display data.")
     render_glow_line()
 
+def report_fingerprint(df: pd.DataFrame) -> tuple:
+    """Compact identity of a frame: shape, columns and a hash of at most ~1000 evenly sampled rows."""
+    sample = df.iloc[::max(1, len(df) // 1000)]
+    return (df.shape, tuple(df.columns), int(pd.util.hash_pandas_object(sample, index=False).sum()))
+
+@st.cache_data(ttl=600, show_spinner=False, hash_funcs={pd.DataFrame: lambda frame: frame.shape})
+def cached_dashboard_report(fingerprint: tuple, df: pd.DataFrame):
+    """Report ``(path, status)`` for a frame, reused while its fingerprint is unchanged."""
+    return generate_dashboard_report(df)
+
+# How each generate_dashboard_report status (other than "complete") is reported back to the user
+REPORT_STATUS_MESSAGES = {
+    "partial": ("warning", "⚠️ Some dashboard elements couldn't be captured. The report includes data-generated charts."),
+    "fallback": ("warning", "⚠️ The full report could not be built; the download is a simplified report with data-generated charts."),
+    "failed": ("error", "⚠️ Failed to generate report."),
+}
+
+def dashboard_report_bytes(df: pd.DataFrame, report_state: dict) -> bytes:
+    """
+    PDF bytes of the dashboard report, built through the fingerprint cache.
+
+    The build status is written to ``report_state`` (a plain dict kept in session
+    state), because a deferred download runs outside the script run and cannot
+    show messages itself; the next rerun displays it.
+    """
+    fingerprint = report_fingerprint(df)
+    report_path, status = cached_dashboard_report(fingerprint, df)
+    if report_path and not os.path.exists(report_path):
+        # The cached PDF was removed from disk; build it again
+        cached_dashboard_report.clear()
+        report_path, status = cached_dashboard_report(fingerprint, df)
+    report_state["status"] = status if report_path else "failed"
+    if not report_path:
+        # Don't keep the failure cached; the next download retries
+        cached_dashboard_report.clear()
+        raise RuntimeError("Failed to generate report. Please try the download again.")
+    with open(report_path, "rb") as pdf_file:
+        return pdf_file.read()
+
 def render_data_reports_section(df):
     """Render the data and reports section with download options."""
     st.header("📊 Data and Reports")
@@ -1810,7 +1780,7 @@ def render_data_reports_section(df):
     with col1:
         st.subheader("Download Raw Data")
         if st.button("Download CSV"):
-            csv = df.to_csv(index=False)
+            csv = dataframe_to_csv_bytes(df)
             st.download_button(
                 label="Click to Download",
                 data=csv,
@@ -1819,20 +1789,46 @@ def render_data_reports_section(df):
             )
     with col2:
         st.subheader("Generate Report")
-        if st.button("📊 Generate Report"):
-            with st.spinner("Generating PDF report..."):
-                report_path = generate_dashboard_report(df)
-                if report_path:
-                    with open(report_path, "rb") as pdf_file:
-                        st.download_button(
-                            label="Download PDF Report",
-                            data=pdf_file,
-                            file_name="safety_report.pdf",
-                            mime="application/pdf"
-                        )
-                    st.success("Report generated successfully!")
+        report_state = st.session_state.setdefault("report_state", {})
+        status = report_state.get("status")
+        if status in REPORT_STATUS_MESSAGES:
+            level, message = REPORT_STATUS_MESSAGES[status]
+            getattr(st, level)(message)
+        if status != "failed":
+            # Warnings are shown once; a failure stays until a build succeeds
+            report_state.pop("status", None)
+        else:
+            # After a failed deferred build, retry eagerly so progress and errors show in the page
+            if st.button("🔄 Retry Report"):
+                with st.spinner("Generating PDF report..."):
+                    try:
+                        pdf_bytes = dashboard_report_bytes(df, report_state)
+                    except RuntimeError:
+                        pdf_bytes = None
+                if pdf_bytes is None:
+                    st.error("⚠️ Retry failed. Please check the data sources and try again.")
                 else:
-                    st.error("Failed to generate report.")
+                    retry_status = report_state.pop("status", None)
+                    if retry_status in REPORT_STATUS_MESSAGES:
+                        level, message = REPORT_STATUS_MESSAGES[retry_status]
+                        getattr(st, level)(message)
+                    st.download_button(
+                        label="Download PDF Report",
+                        data=pdf_bytes,
+                        file_name="safety_report.pdf",
+                        mime="application/pdf"
+                    )
+                    st.success("Report generated successfully!")
+            return
+        # The PDF is only built when the download is actually requested; the build runs inside the
+        # download request, so its outcome is shown on the next rerun via report_state.
+        st.caption("⏳ The report is generated when you click download and can take up to a minute.")
+        st.download_button(
+            label="📊 Download PDF Report",
+            data=lambda: dashboard_report_bytes(df, report_state),
+            file_name="safety_report.pdf",
+            mime="application/pdf"
+        )
 
 # -----------------------------------------------------------------------------
 # NAVIGATION FUNCTIONS
@@ -1902,24 +1898,38 @@ def render_navigation():
         st.markdown('</div>', unsafe_allow_html=True)
     render_glow_line()
 
-@st.cache_data(ttl=3600)
-def process_analytics_data(filtered_df: pd.DataFrame):
-    """Process data for analytics charts (cached for performance)."""
-    excluded_events = ["Occlusion", "PCW", "FCW", "Tired", "Overspeed warning in the area", "Short Following Distance"]
-    event_df = filtered_df[~filtered_df["Event Type"].isin(excluded_events)] if "Event Type" in filtered_df.columns else filtered_df.copy()
-    speeding_df = filtered_df[filtered_df['Event Type'] == 'Speeding']
-    grouped_data = speeding_df.groupby('Group').size().reset_index(name='Number of Events')
+def dataset_key(df: pd.DataFrame) -> tuple:
+    """Fingerprint of the loaded dataset for cache keys: shape plus a content digest hashed once per frame."""
+    return (df.shape, session_frame_digest(df))
+
+# ``data_key`` carries the dataset's content digest, so the frame itself only needs a shape hash
+@st.cache_data(ttl=3600, max_entries=8, hash_funcs={pd.DataFrame: lambda frame: frame.shape})
+def filter_selected_data(df: pd.DataFrame, data_key: tuple) -> pd.DataFrame:
+    """filter_data for the selections in ``data_key`` (cached per dataset digest/selections key)."""
+    return filter_data(df, dict(data_key[1]))
+
+# The filtered frame is fully determined by the dataset and the selections, which the callers pass
+# as an explicit key; hashing only its shape spares Streamlit a full content scan on every rerun.
+@st.cache_data(ttl=3600, hash_funcs={pd.DataFrame: lambda frame: frame.shape})
+def process_analytics_data(filtered_df: pd.DataFrame, data_key: tuple):
+    """Process data for analytics charts (cached per dataset/selections key)."""
+    # One equality scan for the speeding rows, reused by every speeding-based aggregate below
+    is_speed = category_isin(filtered_df['Event Type'], ("Speeding",))
+    event_df = filtered_df[~category_isin(filtered_df["Event Type"], EXCLUDED_EVENTS_DETAIL)] if "Event Type" in filtered_df.columns else filtered_df.copy()
+    speeding_df = filtered_df[is_speed]
+    grouped_data = speeding_df.groupby('Group', observed=True).size().reset_index(name='Number of Events')
     if not grouped_data.empty:
         total_events = grouped_data['Number of Events'].sum()
         grouped_data['Percentage'] = (grouped_data['Number of Events'] / total_events) * 100
     if 'Event Type' in filtered_df.columns and 'License Plate' in filtered_df.columns:
-        speeding_vehicles = filtered_df[filtered_df['Event Type'] == 'Speeding']["License Plate"].value_counts().reset_index()
+        speeding_vehicles = speeding_df["License Plate"].value_counts()
+        speeding_vehicles = speeding_vehicles[speeding_vehicles > 0].reset_index()
         speeding_vehicles.columns = ["License Plate", "Speeding Events"]
         speeding_vehicles = speeding_vehicles.head(20)
     else:
         speeding_vehicles = pd.DataFrame()
     if "Overspeeding Value" in filtered_df.columns:
-        avg_speeding = filtered_df.groupby('Shift Date')['Overspeeding Value'].mean().reset_index()
+        avg_speeding = daily_average_speeding(filtered_df)
     else:
         avg_speeding = pd.DataFrame()
     return {
@@ -1929,25 +1939,27 @@ def process_analytics_data(filtered_df: pd.DataFrame):
         "avg_speeding": avg_speeding
     }
 
-@st.cache_data(ttl=3600)
-def process_map_data(filtered_df: pd.DataFrame):
-    """Process data for maps (cached for performance)."""
+@st.cache_data(ttl=3600, hash_funcs={pd.DataFrame: lambda frame: frame.shape})
+def process_map_data(filtered_df: pd.DataFrame, data_key: tuple):
+    """Process data for maps (cached per dataset/selections key)."""
     if "Risk Level" not in filtered_df.columns:
         filtered_df = assign_risk_level(filtered_df)
-    map_df = filtered_df[(filtered_df['Event Type'] == 'Speeding') & 
-                 (filtered_df['Risk Level'].isin(['Extreme', 'High', 'Medium']))]
-    map_df = map_df.dropna(subset=['Start Lat', 'Start Lng'])
-    map_df_heat = filtered_df[filtered_df['Event Type'] == 'Speeding'].dropna(subset=['Start Lat', 'Start Lng'])
+    is_speed = category_isin(filtered_df['Event Type'], ("Speeding",))
+    map_df = speeding_map_frame(filtered_df, 'Start Lat', 'Start Lng')
+    map_df_heat = filtered_df[is_speed].dropna(subset=['Start Lat', 'Start Lng'])
     return {
         "scatter_map_df": map_df,
         "heatmap_df": map_df_heat
     }
 
-def render_dashboard(filtered_df: pd.DataFrame, analytics_data, map_data):
-    """Render the main dashboard UI components."""
+def render_dashboard(filtered_df: pd.DataFrame, data_key: tuple):
+    """Render the main dashboard UI components; only the active section's aggregates are computed."""
     render_glow_line()
-    if 'data_source' in st.session_state:
-        data_source = st.session_state.data_source
+    # Read the session flags once; both refresh paths below consume the pending-refresh flag
+    session = st.session_state
+    data_source = session.get('data_source')
+    refresh_needed = session.pop('data_needs_refresh', False)
+    if data_source is not None:
         col1, col2, col3 = st.columns([3, 1, 1])
         with col1:
             if data_source == "sql":
@@ -1956,41 +1968,35 @@ def render_dashboard(filtered_df: pd.DataFrame, analytics_data, map_data):
                 st.info("ℹ️ Using uploaded dataset")
             elif data_source == "network":
                 st.info("ℹ️ Using network dataset")
+            elif data_source == "snapshot":
+                st.warning(f"⚠️ Using the last SQL snapshot ({sql_snapshot_age_text()}) - SQL Database unavailable")
             elif data_source == "sample":
                 st.warning("⚠️ Using sample dataset - For demonstration purposes only")
         with col2:
-            refresh_clicked = st.button("Refresh Data")
-            refresh_needed = st.session_state.get('data_needs_refresh', False)
-            
-            if refresh_clicked:
+            if st.button("Refresh Data"):
                 # Clear cached data on explicit refresh click
-                st.session_state.pop('df', None)
-                st.session_state.pop('data_needs_refresh', None)
-                if st.session_state.get('pending_upload', False):
-                    st.session_state.pop('pending_upload', None)
+                session.pop('df', None)
+                session.pop('df_digest', None)
+                session.pop('pending_upload', None)
                 st.rerun()
-            elif refresh_needed:
-                # Clear the flag but don't trigger refresh if we're already here because of a refresh
+            elif refresh_needed and not session.pop('_refreshing', False):
+                # Only rerun if we're not already here because of a refresh
                 # This prevents infinite refresh loops
-                st.session_state.pop('data_needs_refresh', None)
-                if not st.session_state.get('_refreshing', False):
-                    st.session_state['_refreshing'] = True
-                    st.rerun()
-                else:
-                    st.session_state.pop('_refreshing', None)
-                
+                session['_refreshing'] = True
+                st.rerun()
         with col3:
             if st.button("Database Settings"):
                 st.switch_page("pages/4_⚙️_Settings.py")
-    if 'sql_connection_error' in st.session_state and st.session_state.data_source != "sql":
+    if 'sql_connection_error' in session and data_source != "sql":
         with st.expander("Database Connection Issues"):
-            st.error(f"{st.session_state.sql_connection_error}")
+            st.error(f"{session.sql_connection_error}")
             st.info("Use the 'Database Settings' button to configure your SQL Server connection.")
     render_kpis(filtered_df)
     render_navigation()
     current_section = st.session_state.current_section
     if current_section == "analytics":
         with st.spinner("Loading analytics..."):
+            analytics_data = process_analytics_data(filtered_df, data_key)
             render_event_distribution(filtered_df, analytics_data["event_df"])
             render_event_distribution_detailed(filtered_df)
             render_group_comparison(filtered_df, analytics_data["grouped_data"])
@@ -1998,7 +2004,7 @@ def render_dashboard(filtered_df: pd.DataFrame, analytics_data, map_data):
             render_time_series(filtered_df, analytics_data["avg_speeding"])
     elif current_section == "maps":
         with st.spinner("Loading maps..."):
-            scatter_map_df = map_data.get("scatter_map_df", None)
+            scatter_map_df = process_map_data(filtered_df, data_key).get("scatter_map_df", None)
             render_geospatial_maps(filtered_df, scatter_map_df)
     elif current_section == "data":
         with st.spinner("Loading data and reports..."):
@@ -2017,68 +2023,25 @@ def main():
         loading_container = st.empty()
         success_container = st.empty()
         error_container = st.empty()
-        with loading_container:
-            st.markdown("""
-            <style>
-            .loading-pulse {
-                width: 64px;
-                height: 64px;
-                border: 5px solid #1D5B79;
-                border-radius: 50%;
-                position: relative;
-                animation: pulse 1.5s cubic-bezier(0.24, 0, 0.38, 1) infinite;
-            }
-            .loading-pulse:before {
-                content: '';
-                position: absolute;
-                top: 50%;
-                left: 50%;
-                transform: translate(-50%, -50%);
-                width: 40px;
-                height: 40px;
-                border-radius: 50%;
-                background: #2E8B57;
-                opacity: 0.6;
-                animation: pulse-inner 1.5s cubic-bezier(0.24, 0, 0.38, 1) infinite;
-            }
-            @keyframes pulse {
-                0% { transform: scale(0.95); box-shadow: 0 0 0 0 rgba(29, 91, 121, 0.7); }
-                70% { transform: scale(1); box-shadow: 0 0 0 15px rgba(29, 91, 121, 0); }
-                100% { transform: scale(0.95); box-shadow: 0 0 0 0 rgba(29, 91, 121, 0); }
-            }
-            @keyframes pulse-inner {
-                0% { transform: translate(-50%, -50%) scale(1); opacity: 0.6; }
-                70% { transform: translate(-50%, -50%) scale(1.2); opacity: 0.2; }
-                100% { transform: translate(-50%, -50%) scale(1); opacity: 0.6; }
-            }
-            </style>
-            <div style="display: flex; flex-direction: column; align-items: center; justify-content: center; padding: 2rem; background: linear-gradient(135deg, rgba(29, 91, 121, 0.05), rgba(46, 139, 87, 0.05)); border-radius: 15px; margin: 1rem 0; box-shadow: 0 4px 20px rgba(0, 0, 0, 0.05);">
-                <div class="loading-pulse"></div>
-                <h2 style="color: #1D5B79; margin-top: 1rem; font-size: 24px; font-weight: 600; text-align: center;">Loading Data from SQL Database...</h2>
-                <p style="color: #666; margin-top: 0.5rem; font-size: 16px; text-align: center;">Please wait while we fetch the latest safety records</p>
-            </div>
-            """, unsafe_allow_html=True)
+        loading_container.markdown(LOADING_PULSE_HTML.format(
+            title="Loading Data from SQL Database...",
+            subtitle="Please wait while we fetch the latest safety records"
+        ), unsafe_allow_html=True)
         df = get_shared_data()
         if df.empty:
             loading_container.warning("⚠️ SQL Database connection failed. Checking alternative data sources...")
             st.session_state.sql_connection_error = "Failed to connect to SQL database. Please check your connection settings."
             if "uploaded_file" in st.session_state and st.session_state.uploaded_file is not None:
-                with loading_container:
-                    st.markdown("""
-                    <div style="display: flex; flex-direction: column; align-items: center; justify-content: center; padding: 2rem; background: linear-gradient(135deg, rgba(29, 91, 121, 0.05), rgba(46, 139, 87, 0.05)); border-radius: 15px; margin: 1rem 0; box-shadow: 0 4px 20px rgba(0, 0, 0, 0.05);">
-                        <div class="loading-pulse"></div>
-                        <h2 style="color: #1D5B79; margin-top: 1rem; font-size: 24px; font-weight: 600; text-align: center;">Loading Uploaded Excel File...</h2>
-                        <p style="color: #666; margin-top: 0.5rem; font-size: 16px; text-align: center;">Please wait while we process your uploaded data</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+                loading_container.markdown(LOADING_PULSE_HTML.format(
+                    title="Loading Uploaded Excel File...",
+                    subtitle="Please wait while we process your uploaded data"
+                ), unsafe_allow_html=True)
                 try:
-                    df = pd.read_excel(st.session_state.uploaded_file)
-                    if "Shift Date" in df.columns:
-                        df["Shift Date"] = pd.to_datetime(df["Shift Date"], errors="coerce")
-                        df.dropna(subset=["Shift Date"], inplace=True)
-                        df["Date"] = df["Shift Date"].dt.date
-                        if "Shift" in df.columns:
-                            df["Shift"] = df["Shift"].str.capitalize()
+                    uploaded_path = st.session_state.get("uploaded_path")
+                    df = load_excel(
+                        uploaded_path or st.session_state.uploaded_file,
+                        os.path.getmtime(uploaded_path) if uploaded_path else None
+                    )
                     st.session_state.data_source = "upload"
                     loading_container.empty()
                     with success_container:
@@ -2091,15 +2054,9 @@ def main():
                     df = pd.DataFrame()
             else:
                 DEFAULT_FILE_PATH = r"\\10.211.3.254\04. Mining\WBN - FLEET MANAGEMENT SYSTEM\Haulage DT Safety Event Report\FMS Event Data Query.xlsx"
-                if os.path.exists(DEFAULT_FILE_PATH):
+                if share_path_exists(DEFAULT_FILE_PATH):
                     try:
-                        df = pd.read_excel(DEFAULT_FILE_PATH)
-                        if "Shift Date" in df.columns:
-                            df["Shift Date"] = pd.to_datetime(df["Shift Date"], errors="coerce")
-                            df.dropna(subset=["Shift Date"], inplace=True)
-                            df["Date"] = df["Shift Date"].dt.date
-                            if "Shift" in df.columns:
-                                df["Shift"] = df["Shift"].str.capitalize()
+                        df = load_excel(DEFAULT_FILE_PATH, os.path.getmtime(DEFAULT_FILE_PATH), sidecar=True)
                         st.session_state.data_source = "network"
                         loading_container.empty()
                         with success_container:
@@ -2113,14 +2070,13 @@ def main():
                 else:
                     try:
                         sample_data_path = os.path.join("assets", "sample_data.xlsx")
-                        if os.path.exists(sample_data_path):
-                            df = pd.read_excel(sample_data_path)
-                            if "Shift Date" in df.columns:
-                                df["Shift Date"] = pd.to_datetime(df["Shift Date"], errors="coerce")
-                                df.dropna(subset=["Shift Date"], inplace=True)
-                                df["Date"] = df["Shift Date"].dt.date
-                                if "Shift" in df.columns:
-                                    df["Shift"] = df["Shift"].str.capitalize()
+                        if sample_data_exists(sample_data_path):
+                            sample_mtime = max(
+                                os.path.getmtime(p)
+                                for p in (sample_data_path, prebuilt_parquet_path(sample_data_path))
+                                if os.path.exists(p)
+                            )
+                            df = load_sample_data(sample_data_path, sample_mtime)
                             st.session_state.data_source = "sample"
                             loading_container.empty()
                             with success_container:
@@ -2136,14 +2092,19 @@ def main():
                         st.session_state.data_source = "none"
                         df = pd.DataFrame()
         else:
+            # get_shared_data records the source load_data actually used (SQL, snapshot, upload, ...)
             loading_container.empty()
             with success_container:
-                st.success("✅ Data loaded successfully from SQL!")
+                if st.session_state.get("data_source") == "snapshot":
+                    st.warning(f"⚠️ SQL Database unavailable - using the last SQL snapshot ({sql_snapshot_age_text()})")
+                elif st.session_state.get("data_source") == "sql":
+                    st.success("✅ Data loaded successfully from SQL!")
+                else:
+                    st.success("✅ Data loaded successfully!")
                 time.sleep(1)
             success_container.empty()
-            st.session_state.data_source = "sql"
         if not df.empty:
-            st.session_state.df = df
+            df = st.session_state.df = prepare_dataset(df)
         else:
             loading_container.error("⚠️ No data available. Please upload an Excel file or check database connection.")
             st.warning("To use your own data, please upload an Excel file above.")
@@ -2151,11 +2112,15 @@ def main():
     else:
         df = st.session_state.df
     if not df.empty and 'Overspeeding Value' in df.columns:
-        df = assign_risk_level(df)
+        if "Risk Level" not in df.columns:
+            df = assign_risk_level(df)
+            st.session_state.df = df
         selections = render_sidebar(df)
         st.session_state.selections = selections
-        filtered_df = filter_data(df, selections)
-    render_dashboard(filtered_df, process_analytics_data(filtered_df), process_map_data(filtered_df))
+        data_key = (dataset_key(df), selections_key(selections))
+        filtered_df = filter_selected_data(df, data_key)
+        st.session_state.filter_masks = compute_filter_masks(filtered_df)
+    render_dashboard(filtered_df, data_key)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
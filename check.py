@@ -10,23 +10,43 @@ import numpy as np
 import plotly.express as px
 from datetime import datetime
 
-# Load data directly from Excel file instead of using utils
+# numba is optional; the day x risk-level binning falls back to np.bincount without it
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# Chart labels (simplified translations dictionary), built once at import instead of per chart call
+CHART_TRANSLATIONS = {
+    "en": {
+        "speeding_events_by_day": "Speeding Events by Day",
+        "speeding_events_title": "Speeding Events Trend",
+        "date": "Date",
+        "risk_level": "Risk Level",
+        "number_of_events": "Number of Events",
+        "no_data_warning": "No data available for the selected filters"
+    }
+}
+
+# Load data directly from Excel file instead of using utils (cached so reruns skip the network read)
+@st.cache_data(ttl=600, show_spinner="Loading FMS data...")
 def get_data():
     file_path = r"\\10.211.3.254\04. Mining\WBN - FLEET MANAGEMENT SYSTEM\Haulage DT Safety Event Report\FMS Event Data Query.xlsx"
     try:
-        # Read Excel file
-        df = pd.read_excel(file_path)
+        # Read Excel file (calamine is much faster than openpyxl when it is installed)
+        try:
+            df = pd.read_excel(file_path, engine="calamine")
+        except ImportError:
+            df = pd.read_excel(file_path)
         return df
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         # Return empty DataFrame if there's an error
         return pd.DataFrame()
 
-# Get the data
-df = get_data()
-
 # Function to create overspeeding chart
-def generate_overspeeding_chart():
+def generate_overspeeding_chart(df):
     if df.empty:
         # Create empty figure if data is not available
         fig, ax = plt.subplots(figsize=(10, 6))
@@ -49,23 +69,17 @@ def generate_overspeeding_chart():
             plt.tight_layout()
             return fig
         
-        # Use the found columns
-        overspeeding_data = df.groupby(vehicle_col)[speed_col].sum().sort_values(ascending=False)
+        # Use the found columns; nlargest only partially sorts the per-vehicle sums
+        top_overspeeding = df.groupby(vehicle_col)[speed_col].sum().nlargest(10)
     else:
         # Use original column names
-        overspeeding_data = df.groupby('Vehicle_No')['OverSpeeding_Count'].sum().sort_values(ascending=False)
-    
-    # Get top 10 vehicles
-    top_overspeeding = overspeeding_data.head(10)
+        top_overspeeding = df.groupby('Vehicle_No')['OverSpeeding_Count'].sum().nlargest(10)
     
     # Create bar chart
     bars = ax.bar(top_overspeeding.index, top_overspeeding.values, color='crimson')
     
     # Add data labels on top of bars
-    for bar in bars:
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                f'{int(height)}', ha='center', va='bottom', fontsize=9)
+    ax.bar_label(bars, fmt='%d', padding=3, fontsize=9)
     
     # Set title and labels
     ax.set_title('Top 10 Vehicles by Overspeeding Count')
@@ -78,46 +92,84 @@ def generate_overspeeding_chart():
     
     return fig
 
+# Count events per (day index, risk-level code); negative risk codes (missing level) are skipped
+if HAS_NUMBA:
+    @njit(cache=True)
+    def bin_day_risk_counts(days, risks, n_days, n_risks):
+        counts = np.zeros((n_days, n_risks), np.int64)
+        for i in range(days.size):
+            if risks[i] >= 0:
+                counts[days[i], risks[i]] += 1
+        return counts
+else:
+    def bin_day_risk_counts(days, risks, n_days, n_risks):
+        valid = risks >= 0
+        flat = np.bincount(days[valid] * n_risks + risks[valid], minlength=n_days * n_risks)
+        return flat.reshape(n_days, n_risks)
+
+# Speeding rows indexed by a sorted Shift Date (parsed once), so date windows are index slices
+@st.cache_data(ttl=600)
+def speeding_events_by_date(df):
+    speeding = df[df['Event Type'] == 'Speeding'].copy()
+    speeding['Shift Date'] = pd.to_datetime(speeding['Shift Date'], errors='coerce')
+    return speeding.dropna(subset=['Shift Date']).set_index('Shift Date').sort_index()
+
+# Daily speeding event counts per risk level (plus Total Events) for the last trend_days days
+def speeding_trend_data(df, trend_days=30, shift_type="All"):
+    trend_end = pd.to_datetime('today')
+    trend_start = trend_end - pd.DateOffset(days=trend_days)
+    trend_df = speeding_events_by_date(df).loc[trend_start:trend_end]
+    
+    if shift_type != "All":
+        trend_df = trend_df[trend_df['Shift'] == shift_type]
+    
+    if trend_df.empty:
+        return None
+    
+    # Day offsets and risk-level codes binned into one counts matrix (days x risk levels)
+    event_days = trend_df.index.normalize()
+    first_day = event_days.min()
+    days = ((event_days - first_day) // pd.Timedelta(days=1)).to_numpy(dtype=np.int64)
+    # Fixed Extreme/High/Medium columns first (always present, even with zero events), then any other observed levels
+    main_levels = ["Extreme", "High", "Medium"]
+    other_levels = sorted(set(trend_df['Risk Level'].dropna().unique()) - set(main_levels))
+    risk_levels = pd.Categorical(trend_df['Risk Level'], categories=main_levels + other_levels)
+    counts = bin_day_risk_counts(days, risk_levels.codes.astype(np.int64),
+                                 int(days.max()) + 1, len(risk_levels.categories))
+    trend_data = pd.DataFrame(counts, columns=list(risk_levels.categories))
+    trend_data.insert(0, 'Shift Date', pd.date_range(first_day, periods=len(counts), freq='D'))
+    # Keep only the days that had events, as the groupby did
+    trend_data = trend_data[counts.sum(axis=1) > 0].reset_index(drop=True)
+    trend_data["Total Events"] = trend_data[main_levels].sum(axis=1)
+    return trend_data
+
+# Static (matplotlib) version of the speeding events trend for the PDF; avoids a Kaleido render
+def generate_speeding_events_pdf_chart(trend_data):
+    risk_colors = {'Extreme': '#FF0000', 'High': '#FFA500', 'Medium': '#FFFF00', 'N/A': '#808080'}
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for risk in trend_data.columns[1:-1]:
+        ax.plot(trend_data["Shift Date"], trend_data[risk], marker='o', linewidth=2,
+                label=risk, color=risk_colors.get(risk))
+    ax.set_title('Speeding Events Trend')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Number of Events')
+    ax.legend(title='Risk Level')
+    fig.autofmt_xdate()
+    plt.tight_layout()
+    return fig
+
 # Function to generate speeding events by day chart
-def generate_speeding_events_chart(trend_days=30, shift_type="All"):
+def generate_speeding_events_chart(df, trend_days=30, shift_type="All"):
     if df.empty:
         return None
     
-    # Setup translations dictionary (simplified version)
-    translations = {
-        "en": {
-            "speeding_events_by_day": "Speeding Events by Day",
-            "speeding_events_title": "Speeding Events Trend",
-            "date": "Date",
-            "risk_level": "Risk Level",
-            "number_of_events": "Number of Events",
-            "no_data_warning": "No data available for the selected filters"
-        }
-    }
-    lang = "en"  # Default language
+    labels = CHART_TRANSLATIONS["en"]  # Default language
     
     # Process data for the chart
     try:
-        df['Shift Date'] = pd.to_datetime(df['Shift Date'], errors='coerce')
-        trend_end = pd.to_datetime('today')
-        trend_start = trend_end - pd.DateOffset(days=trend_days)
-        trend_df = df[(df['Shift Date'] >= trend_start) & 
-                      (df['Shift Date'] <= trend_end) & 
-                      (df['Event Type'] == 'Speeding')]
-        
-        if shift_type != "All":
-            trend_df = trend_df[trend_df['Shift'] == shift_type]
+        trend_data = speeding_trend_data(df, trend_days, shift_type)
         
-        if not trend_df.empty:
-            trend_data = trend_df.groupby(
-                [pd.Grouper(key='Shift Date', freq='D'), 'Risk Level']
-            ).size().unstack(fill_value=0).reset_index()
-            
-            for risk in ["Extreme", "High", "Medium"]:
-                if risk not in trend_data.columns:
-                    trend_data[risk] = 0
-            
-            trend_data["Total Events"] = trend_data[["Extreme", "High", "Medium"]].sum(axis=1)
+        if trend_data is not None:
             risk_colors = {'Extreme': '#FF0000', 'High': '#FFA500', 'Medium': '#FFFF00', 'N/A': '#808080'}
             
             fig = px.line(
@@ -136,9 +188,9 @@ def generate_speeding_events_chart(trend_days=30, shift_type="All"):
                              mode='lines+markers', marker=dict(size=8, line=dict(width=1, color='black')))
             
             fig.update_traces(
-                hovertemplate="<b>📅 " + translations[lang]["date"] + ": %{x}</b><br>🔥 " + 
-                              translations[lang]["risk_level"] + ": %{fullData.name}<br>📊 " + 
-                              translations[lang]["number_of_events"] + ": %{y}",
+                hovertemplate="<b>📅 " + labels["date"] + ": %{x}</b><br>🔥 " + 
+                              labels["risk_level"] + ": %{fullData.name}<br>📊 " + 
+                              labels["number_of_events"] + ": %{y}",
                 hoverlabel=dict(bgcolor="white", font_size=13, font_color="black", font_family="Arial Black")
             )
             
@@ -156,18 +208,18 @@ def generate_speeding_events_chart(trend_days=30, shift_type="All"):
             fig.update_layout(
                 height=400,
                 template="plotly_white",
-                title_text=translations[lang]["speeding_events_title"],
+                title_text=labels["speeding_events_title"],
                 title_x=0.5,
                 title_font=dict(size=24, family="Arial Black", color="#2a3f5f"),
-                xaxis_title=translations[lang]["date"],
-                yaxis_title=translations[lang]["number_of_events"],
+                xaxis_title=labels["date"],
+                yaxis_title=labels["number_of_events"],
                 plot_bgcolor='rgba(0,0,0,0)',
                 paper_bgcolor='rgba(0,0,0,0)',
                 xaxis=dict(tickformat="%b %d, %Y", showgrid=True,
                            gridcolor='rgba(200, 200, 200, 0.5)', linecolor='black', linewidth=2),
                 yaxis=dict(showgrid=True, gridcolor='rgba(200, 200, 200, 0.5)',
                            linecolor='black', linewidth=2),
-                legend=dict(title=translations[lang]["risk_level"], orientation="h", yanchor="bottom", y=-0.3,
+                legend=dict(title=labels["risk_level"], orientation="h", yanchor="bottom", y=-0.3,
                             font=dict(size=14, color="black")),
                 margin=dict(l=20, r=20, t=60, b=80)
             )
@@ -180,12 +232,17 @@ def generate_speeding_events_chart(trend_days=30, shift_type="All"):
         return None
 
 # Function to create a PDF file with both charts
-def create_pdf():
-    # Get the overspeeding chart
-    overspeeding_fig = generate_overspeeding_chart()
+def create_pdf(df, overspeeding_fig=None):
+    # Get the overspeeding chart (reuse the one already drawn on the page when given)
+    if overspeeding_fig is None:
+        overspeeding_fig = generate_overspeeding_chart(df)
     
-    # Get the speeding events chart
-    speeding_events_fig = generate_speeding_events_chart()
+    # Get the speeding events chart (drawn with matplotlib for the PDF)
+    try:
+        trend_data = speeding_trend_data(df)
+    except Exception:
+        trend_data = None
+    speeding_events_fig = generate_speeding_events_pdf_chart(trend_data) if trend_data is not None else None
     
     # Create PDF
     with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
@@ -200,7 +257,7 @@ def create_pdf():
         # If speeding events chart exists, save as image and add to PDF
         if speeding_events_fig:
             with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_img2:
-                speeding_events_fig.write_image(temp_img2.name)
+                speeding_events_fig.savefig(temp_img2.name, format="png")
                 elements.append(Image(temp_img2.name, width=450, height=300))
         
         # Build PDF
@@ -210,9 +267,13 @@ def create_pdf():
 # Streamlit UI
 st.title("FMS Safety Dashboard")
 
+# Get the data
+df = get_data()
+
 # Show overspeeding chart
 st.header("Top 10 Vehicles by Overspeeding Count")
-st.pyplot(generate_overspeeding_chart())
+overspeeding_fig = generate_overspeeding_chart(df)
+st.pyplot(overspeeding_fig)
 
 # Show speeding events by day
 st.header("Speeding Events by Day")
@@ -222,7 +283,7 @@ shift_options = ["All", "Day", "Night"]
 shift_type = st.sidebar.selectbox("Shift Type", shift_options)
 
 # Display speeding events chart
-speeding_events_fig = generate_speeding_events_chart(trend_days, shift_type)
+speeding_events_fig = generate_speeding_events_chart(df, trend_days, shift_type)
 if speeding_events_fig:
     st.plotly_chart(speeding_events_fig, use_container_width=True, key="main_speeding_trend")
 else:
@@ -230,6 +291,6 @@ else:
 
 # Button to download the PDF
 if st.button("Download PDF Report"):
-    pdf_file = create_pdf()
+    pdf_file = create_pdf(df, overspeeding_fig)
     with open(pdf_file, "rb") as f:
         st.download_button("Click to Download", f, file_name="safety_report.pdf", mime="application/pdf")
\ No newline at end of file
@@ -41,6 +41,20 @@ UPLOAD_CONFIG = {
     'categorical_columns': ['Driver', 'Group', 'Event Type', 'License Plate', 'Shift', 'Area']
 }
 
+# Data File Settings
+DATA_CONFIG = {
+    # Opt-in: keep a Parquet copy next to each Excel source and read it while it is newer (FMS_PARQUET_SIDECAR=1)
+    'parquet_sidecar': os.environ.get('FMS_PARQUET_SIDECAR', '0') == '1',
+    # Local copy of the last successful SQL pull, used before the network share when SQL is down
+    'sql_snapshot_path': os.path.join('data', 'fms_speed_snapshot.parquet'),
+    # Upper bounds (seconds) on probing / reading the network share so an unreachable SMB host can't hang the UI
+    'share_probe_timeout': 2.0,
+    'share_read_timeout': 30.0,
+    # Optional integer column for connectorx to split SQL pulls into parallel range queries (FMS_SQL_PARTITION_COLUMN)
+    'sql_partition_column': os.environ.get('FMS_SQL_PARTITION_COLUMN') or None,
+    'sql_partition_num': 4
+}
+
 # PDF Report Settings
 PDF_CONFIG = {
     'page_size': 'A4',
@@ -142,4 +156,201 @@ translations = {
         "top_speeding_vehicles": "\ud83d\ude97 \u8d85\u901f\u6700\u591a\u768420\u8f66",
         # ... other translations ...
     }
-}
\ No newline at end of file
+}
+
+# KPI card styles, injected once alongside GLOBAL_CSS at app start
+KPI_CSS = """
+    <style>
+        .kpi-grid {
+            display: grid;
+            grid-template-columns: repeat(3, minmax(0, 1fr));
+        }
+
+        .kpi-grid .kpi-card:last-child {
+            grid-column: 1 / -1;
+        }
+
+        @keyframes float {
+            0% { transform: translateY(0px); }
+            50% { transform: translateY(-10px); }
+            100% { transform: translateY(0px); }
+        }
+        
+        @keyframes particle {
+            0% { transform: translate(0, 0) scale(1); opacity: 0; }
+            50% { opacity: 1; }
+            100% { transform: translate(var(--tx), var(--ty)) scale(0); opacity: 0; }
+        }
+
+        .kpi-card {
+            background: linear-gradient(145deg, #1c2b3a, #23374d);
+            border-radius: 15px;
+            padding: 20px;
+            margin: 10px;
+            text-align: center;
+            box-shadow: 0 4px 8px rgba(0, 0, 0, 0.3);
+            transition: all 0.4s cubic-bezier(0.165, 0.84, 0.44, 1);
+            border: 1px solid rgba(255, 255, 255, 0.1);
+            position: relative;
+            overflow: hidden;
+            z-index: 1;
+        }
+
+        .kpi-card::before {
+            content: '';
+            position: absolute;
+            top: 0;
+            left: 0;
+            right: 0;
+            bottom: 0;
+            background: linear-gradient(125deg, #2c3e50, #1a5276, #154360);
+            opacity: 0;
+            z-index: -1;
+            transition: opacity 0.4s ease;
+            border-radius: 15px;
+        }
+
+        .kpi-card:hover {
+            transform: translateY(-10px);
+            box-shadow: 0 15px 25px rgba(0, 0, 0, 0.5);
+            border-color: rgba(41, 128, 185, 0.5);
+            animation: float 6s ease-in-out infinite;
+        }
+
+        .kpi-card:hover::before {
+            opacity: 1;
+        }
+
+        .kpi-card::after {
+            content: '';
+            position: absolute;
+            width: 200%;
+            height: 200%;
+            top: -50%;
+            left: -50%;
+            background: radial-gradient(circle, rgba(255,255,255,0.1) 0%, transparent 60%);
+            transform: rotate(30deg);
+            opacity: 0;
+            transition: opacity 0.3s ease;
+            pointer-events: none;
+        }
+
+        .kpi-card:hover::after {
+            opacity: 1;
+        }
+
+        .particle {
+            position: absolute;
+            width: 4px;
+            height: 4px;
+            background: rgba(255, 255, 255, 0.5);
+            border-radius: 50%;
+            pointer-events: none;
+            opacity: 0;
+        }
+
+        .kpi-card:hover .particle {
+            animation: particle 1.5s ease-out infinite;
+        }
+
+        .kpi-card:hover .particle:nth-child(1) { --tx: 20px; --ty: -20px; animation-delay: 0s; }
+        .kpi-card:hover .particle:nth-child(2) { --tx: -20px; --ty: -15px; animation-delay: 0.2s; }
+        .kpi-card:hover .particle:nth-child(3) { --tx: 15px; --ty: 20px; animation-delay: 0.4s; }
+        .kpi-card:hover .particle:nth-child(4) { --tx: -15px; --ty: 15px; animation-delay: 0.6s; }
+
+        .kpi-icon { 
+            font-size: 2.8rem; 
+            margin-bottom: 10px; 
+            color: #ff8c42; 
+            transition: transform 0.3s ease;
+            position: relative;
+        }
+
+        .kpi-title { 
+            font-size: 1.3rem; 
+            color: #ecf0f1; 
+            margin-bottom: 10px; 
+            font-weight: 600; 
+            transition: color 0.3s ease;
+            text-shadow: 0 2px 4px rgba(0,0,0,0.2);
+        }
+
+        .kpi-value { 
+            font-size: 2.2rem; 
+            font-weight: bold; 
+            color: #ffffff; 
+            margin-bottom: 5px; 
+            transition: all 0.3s ease;
+            position: relative;
+        }
+
+        .kpi-subtext { 
+            font-size: 1rem; 
+            color: #bdc3c7; 
+            font-style: italic; 
+            transition: color 0.3s ease;
+            opacity: 0.8;
+        }
+        
+        .kpi-card:hover .kpi-icon { 
+            transform: scale(1.1); 
+            color: #f39c12; 
+        }
+
+        .kpi-card:hover .kpi-title { 
+            color: #3498db; 
+        }
+
+        .kpi-card:hover .kpi-value { 
+            text-shadow: 0 0 15px rgba(52, 152, 219, 0.7);
+            letter-spacing: 1px; 
+        }
+
+        .kpi-card:hover .kpi-subtext { 
+            color: #e0e0e0; 
+            opacity: 1;
+        }
+    </style>
+"""
+
+# Loading indicator shown while the dataset is fetched; fill in with .format(title=..., subtitle=...)
+LOADING_PULSE_HTML = """
+    <style>
+    .loading-pulse {{
+        width: 64px;
+        height: 64px;
+        border: 5px solid #1D5B79;
+        border-radius: 50%;
+        position: relative;
+        animation: pulse 1.5s cubic-bezier(0.24, 0, 0.38, 1) infinite;
+    }}
+    .loading-pulse:before {{
+        content: '';
+        position: absolute;
+        top: 50%;
+        left: 50%;
+        transform: translate(-50%, -50%);
+        width: 40px;
+        height: 40px;
+        border-radius: 50%;
+        background: #2E8B57;
+        opacity: 0.6;
+        animation: pulse-inner 1.5s cubic-bezier(0.24, 0, 0.38, 1) infinite;
+    }}
+    @keyframes pulse {{
+        0% {{ transform: scale(0.95); box-shadow: 0 0 0 0 rgba(29, 91, 121, 0.7); }}
+        70% {{ transform: scale(1); box-shadow: 0 0 0 15px rgba(29, 91, 121, 0); }}
+        100% {{ transform: scale(0.95); box-shadow: 0 0 0 0 rgba(29, 91, 121, 0); }}
+    }}
+    @keyframes pulse-inner {{
+        0% {{ transform: translate(-50%, -50%) scale(1); opacity: 0.6; }}
+        70% {{ transform: translate(-50%, -50%) scale(1.2); opacity: 0.2; }}
+        100% {{ transform: translate(-50%, -50%) scale(1); opacity: 0.6; }}
+    }}
+    </style>
+    <div style="display: flex; flex-direction: column; align-items: center; justify-content: center; padding: 2rem; background: linear-gradient(135deg, rgba(29, 91, 121, 0.05), rgba(46, 139, 87, 0.05)); border-radius: 15px; margin: 1rem 0; box-shadow: 0 4px 20px rgba(0, 0, 0, 0.05);">
+        <div class="loading-pulse"></div>
+        <h2 style="color: #1D5B79; margin-top: 1rem; font-size: 24px; font-weight: 600; text-align: center;">{title}</h2>
+        <p style="color: #666; margin-top: 0.5rem; font-size: 16px; text-align: center;">{subtitle}</p>
+    </div>
+"""
@@ -2,10 +2,29 @@ import win32serviceutil
 import win32service
 import win32event
 import servicemanager
-import socket
+import queue
+import subprocess
 import sys
 import os
-from pathlib import Path
+import threading
+import time
+
+from run_service import streamlit_command
+
+# Restart backoff after the Streamlit process exits: 1s, 2s, 4s, ... capped at 60s
+RESTART_BACKOFF_MIN_MS = 1000
+RESTART_BACKOFF_MAX_MS = 60000
+# A child that stayed up at least this long counts as a healthy run and resets the backoff
+HEALTHY_RUN_SECONDS = 60
+# Manual-reset named event: every waiter sees the stop, and admin tools can request one via OpenEvent + SetEvent
+STOP_EVENT_NAME = r"Global\FMSStreamlitService_Stop"
+# Time the SCM should allow for terminating a running Streamlit child
+STOP_WAIT_HINT_MS = 5000
+# How long shutdown waits for queued event-log records before giving up on a hung Event Log service
+LOG_FLUSH_TIMEOUT_SECONDS = 2
+# SCM recovery when the service itself fails: restart after 5s, 30s, then 60s; failure count resets daily
+RECOVERY_RESTART_DELAYS_MS = (5000, 30000, 60000)
+RECOVERY_RESET_PERIOD_SECONDS = 24 * 60 * 60
 
 class FMSStreamlitService(win32serviceutil.ServiceFramework):
     _svc_name_ = "FMSStreamlitService"
@@ -14,38 +33,99 @@ class FMSStreamlitService(win32serviceutil.ServiceFramework):
 
     def __init__(self, args):
         win32serviceutil.ServiceFramework.__init__(self, args)
-        self.stop_event = win32event.CreateEvent(None, 0, 0, None)
-        socket.setdefaulttimeout(60)
-        self.running = True
+        self.stop_event = win32event.CreateEvent(None, True, False, STOP_EVENT_NAME)
+        # An existing named event keeps its state; clear a stop left signaled by a previous run
+        win32event.ResetEvent(self.stop_event)
+        self.proc = None
+        # Event-log writes are synchronous RPCs; a daemon thread drains them so restarts never wait on them
+        self._log_q = queue.SimpleQueue()
+        self._log_thread = threading.Thread(target=self._drain_log, daemon=True)
+
+    def _drain_log(self):
+        while True:
+            record = self._log_q.get()
+            if record is None:
+                break
+            level, msg = record
+            if level == servicemanager.EVENTLOG_ERROR_TYPE:
+                servicemanager.LogErrorMsg(msg)
+            else:
+                servicemanager.LogMsg(level, servicemanager.PID_INFO, (msg,))
+
+    def _log(self, level, msg):
+        self._log_q.put((level, msg))
 
     def SvcStop(self):
-        self.ReportServiceStatus(win32service.SERVICE_STOP_PENDING)
+        # Only a live Streamlit child needs time to terminate; between restarts the loop exits at once
+        # and pywin32 reports SERVICE_STOPPED without an intermediate STOP_PENDING round-trip
+        if self.proc is not None and self.proc.poll() is None:
+            self.ReportServiceStatus(win32service.SERVICE_STOP_PENDING, waitHint=STOP_WAIT_HINT_MS)
         win32event.SetEvent(self.stop_event)
-        self.running = False
 
     def SvcDoRun(self):
+        self._log_thread.start()
         try:
-            servicemanager.LogMsg(
-                servicemanager.EVENTLOG_INFORMATION_TYPE,
-                servicemanager.PID_INFO,
-                ('Starting the %s service' % self._svc_name_)
-            )
+            self._log(servicemanager.EVENTLOG_INFORMATION_TYPE, 'Starting the %s service' % self._svc_name_)
+            # Streamlit cold-starts in the child process, so the service is ready as soon as it can supervise it
+            self.ReportServiceStatus(win32service.SERVICE_RUNNING)
             
-            # Get the path to run_service.py
-            service_path = Path(__file__).parent / "run_service.py"
-            
-            # Run the Streamlit app
-            while self.running:
+            # Run the Streamlit app in a child process, restarting it until the stop event is signalled
+            backoff_ms = RESTART_BACKOFF_MIN_MS
+            command = streamlit_command()  # resolved once; restarts only pay for process creation
+            while win32event.WaitForSingleObject(self.stop_event, 0) != win32event.WAIT_OBJECT_0:
                 try:
-                    import run_service
-                    run_service.run_streamlit()
-                except Exception as e:
-                    servicemanager.LogErrorMsg(f"Error running Streamlit: {str(e)}")
-                    time.sleep(5)  # Wait before retrying
+                    started = time.monotonic()
+                    self.proc = proc = subprocess.Popen(command, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+                    # Sleep until either the service is stopped or the child exits
+                    rc = win32event.WaitForMultipleObjects(
+                        [self.stop_event, int(proc._handle)], False, win32event.INFINITE
+                    )
+                    if rc == win32event.WAIT_OBJECT_0:
+                        proc.terminate()
+                        proc.wait()
+                        break
+                    self._log(servicemanager.EVENTLOG_ERROR_TYPE, f"Streamlit exited with code {proc.wait()}")
+                    if time.monotonic() - started >= HEALTHY_RUN_SECONDS:
+                        backoff_ms = RESTART_BACKOFF_MIN_MS
+                except OSError as e:
+                    # Launch failures (missing venv interpreter, locked files) are retried with backoff,
+                    # which also bounds the event-log traffic during an outage
+                    self._log(servicemanager.EVENTLOG_ERROR_TYPE, f"Error starting Streamlit: {str(e)}")
+
+                # Block until SvcStop sets the event or the backoff expires
+                if win32event.WaitForSingleObject(self.stop_event, backoff_ms) == win32event.WAIT_OBJECT_0:
+                    break
+                backoff_ms = min(backoff_ms * 2, RESTART_BACKOFF_MAX_MS)
                     
         except Exception as e:
-            servicemanager.LogErrorMsg(f"Service error: {str(e)}")
-            self.running = False
+            # Anything else is a bug, not a transient failure: log it once, take the child down and fail
+            # the service so the SCM's recovery actions decide whether to restart it
+            self._log(servicemanager.EVENTLOG_ERROR_TYPE, f"Service error: {str(e)}")
+            if self.proc is not None and self.proc.poll() is None:
+                self.proc.terminate()
+            raise
+        finally:
+            self._log_q.put(None)
+            self._log_thread.join(LOG_FLUSH_TIMEOUT_SECONDS)
+
+def configure_recovery(opts):
+    # Called by HandleCommandLine after install/update: let the SCM restart a failed service
+    scm = win32service.OpenSCManager(None, None, win32service.SC_MANAGER_ALL_ACCESS)
+    try:
+        svc = win32service.OpenService(scm, FMSStreamlitService._svc_name_, win32service.SERVICE_ALL_ACCESS)
+        try:
+            win32service.ChangeServiceConfig2(svc, win32service.SERVICE_CONFIG_FAILURE_ACTIONS, {
+                'ResetPeriod': RECOVERY_RESET_PERIOD_SECONDS,
+                'RebootMsg': None,
+                'Command': None,
+                'Actions': [(win32service.SC_ACTION_RESTART, delay) for delay in RECOVERY_RESTART_DELAYS_MS],
+            })
+            # Also apply the actions when SvcDoRun fails with an error, not only when the process crashes
+            win32service.ChangeServiceConfig2(svc, win32service.SERVICE_CONFIG_FAILURE_ACTIONS_FLAG, True)
+        finally:
+            win32service.CloseServiceHandle(svc)
+    finally:
+        win32service.CloseServiceHandle(scm)
 
 if __name__ == '__main__':
     if len(sys.argv) == 1:
@@ -53,4 +133,9 @@ if __name__ == '__main__':
         servicemanager.PrepareToHostSingle(FMSStreamlitService)
         servicemanager.StartServiceCtrlDispatcher()
     else:
-        win32serviceutil.HandleCommandLine(FMSStreamlitService) 
\ No newline at end of file
+        argv = sys.argv
+        # Install as auto-start unless told otherwise; run it under a restricted account with
+        # --username .\FMSService --password ... before the install command
+        if 'install' in argv and '--startup' not in argv:
+            argv = [argv[0], '--startup', 'auto'] + argv[1:]
+        win32serviceutil.HandleCommandLine(FMSStreamlitService, argv=argv, customOptionHandler=configure_recovery) 
\ No newline at end of file
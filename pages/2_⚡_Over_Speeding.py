@@ -1,10 +1,7 @@
 # Standard library imports
 import streamlit as st
 import time
-import json
-import platform
 import pyodbc
-import traceback
 
 from sidebar import render_sidebar
 
@@ -20,15 +17,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 import os
 import sys
-from pathlib import Path
-import tempfile
-from datetime import datetime
-from io import BytesIO
 from streamlit_lottie import st_lottie
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage
-from reportlab.lib.styles import getSampleStyleSheet
-from concurrent.futures import ThreadPoolExecutor
 
 # Add the main folder to the Python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -135,6 +124,7 @@ from utils import (
     load_data,
     refresh_data_if_needed,
     load_lottieurl,
+    load_lottie_json,
     get_translation,
     process_dataframe,
     assign_risk_level,
@@ -143,7 +133,9 @@ from utils import (
     filter_data,
     get_shared_data,
     render_glow_line,
-    ensure_column_types
+    ensure_column_types,
+    read_excel_fast,
+    session_frame_digest
 )
 from translations import get_event_translation
 from config import (
@@ -155,100 +147,8 @@ from config import (
     GLOBAL_CSS
 )
 
-# Apply global CSS
-st.markdown(GLOBAL_CSS, unsafe_allow_html=True)
-
-# Initialize session state
-if "language" not in st.session_state:
-    st.session_state.language = "EN"
-
-# Get current language
-lang = st.session_state["language"]
-
-# Initialize group_fig_list
-group_fig_list = []
-
-# Add this function at the top of the file, after imports
-def calculate_risk_level(speed_value):
-    """Calculate risk level based on overspeeding value."""
-    try:
-        speed = float(speed_value)
-        if speed >= 20:
-            return 'Extreme'
-        elif speed >= 10:
-            return 'High'
-        else:
-            return 'Medium'
-    except (ValueError, TypeError):
-        return 'Medium'
-
-# --------------------------------------------------------------------
-# LANGUAGE TOGGLE AND ANIMATION
-# --------------------------------------------------------------------
-# Check if language was just changed
-if "language_changed" in st.session_state and st.session_state.language_changed:
-    st.session_state.language_changed = False  # Reset the flag
-    # Force a rerun to apply the language change
-    st.rerun()
-
-# Create a row with two columns for the translation button and JSON animation
-col_trans, col_json = st.columns([1, 1])
-
-with col_trans:
-    st.markdown("""
-    <div style="
-        padding: 10px;
-        border-radius: 12px;
-        margin-top: 10px;
-        text-align: center;
-        background: linear-gradient(to right, rgba(29, 91, 121, 0.05), transparent);
-    ">
-        <h3 style="
-            color: #1D5B79;
-            margin-bottom: 10px;
-            font-size: 22px;
-            font-weight: 600;
-            letter-spacing: 0.5px;
-        ">{}</h3>
-    </div>
-    """.format(get_translation("click_for_translation", lang)), unsafe_allow_html=True)
-    
-    translation_label = "切换中文" if lang == "EN" else "Switch to English"
-    
-    # Define a callback that sets a flag when language changes
-    def change_language():
-        new_lang = "ZH" if lang == "EN" else "EN"
-        st.session_state.language = new_lang
-        st.session_state.language_changed = True
-    
-    st.button(translation_label, on_click=change_language, key="lang_toggle_btn")
-
-with col_json:
-    try:
-        # Load the animation JSON file using proper path resolution
-        json_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "ani15.json")
-        with open(json_path, "r", encoding='utf-8') as f:
-            animation_data = json.load(f)
-        
-        # Display the animation
-        st_lottie(
-            animation_data,
-            speed=1,
-            reverse=False,
-            loop=True,
-            quality="high",
-            height=200
-        )
-    except Exception as e:
-        st.warning(f"Animation could not be loaded. Error: {str(e)}")
-
-# Add space after the row
-st.markdown("<br>", unsafe_allow_html=True)
-render_glow_line()
-render_glow_line()
-
-# Style and add the translation button
-st.markdown("""
+# Page styles (translation button, filters, charts), sent with the global CSS in a single element
+OVER_SPEEDING_CSS = """
     <style>
     .stButton > button {
         width: 100%;
@@ -310,14 +210,7 @@ st.markdown("""
         font-size: 1.1rem !important;
     }
     </style>
-    """, unsafe_allow_html=True)
-
-# Render header using utils function
-render_header(get_translation("speeding_title", lang), "")
-
-# After the header section, add the following CSS and content
-st.markdown("""
-<style>
+    <style>
     /* Global Font Settings for Better Multilingual Support */
     body, .stApp, .element-container, .stMarkdown, .stText, button, input, select, textarea {
         font-family: "Segoe UI", "Microsoft YaHei", "微软雅黑", "PingFang SC", "Hiragino Sans GB", sans-serif !important;
@@ -571,107 +464,82 @@ st.markdown("""
         text-shadow: 1px 1px 2px rgba(0, 0, 0, 0.2) !important;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-# Create three columns for the filters
-col1, col2, col3 = st.columns([1, 1, 1])
+# Apply global CSS
+st.markdown(GLOBAL_CSS + OVER_SPEEDING_CSS, unsafe_allow_html=True)
 
-with col1:
-    st.markdown(f"""
-    <div class="pro-container">
-        <div class="section-header">
-            <span>📊</span> {get_translation("overspeed_rating", lang)}
-        </div>
-        <div class="rating-item">
-            <div class="speed-dot medium"></div>
-            <span>{get_translation("speed_description_medium", lang)}</span>
-        </div>
-        <div class="rating-item">
-            <div class="speed-dot high"></div>
-            <span>{get_translation("speed_description_high", lang)}</span>
-        </div>
-        <div class="rating-item">
-            <div class="speed-dot extreme"></div>
-            <span>{get_translation("speed_description_extreme", lang)}</span>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+# Initialize session state
+if "language" not in st.session_state:
+    st.session_state.language = "EN"
 
-with col2:
-    st.markdown(f"""
-    <div class="pro-container">
-        <div class="section-header">
-            <span>⏰</span> {get_translation("select_shift", lang)}
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    shift_type = st.radio(
-        "",
-        [
-            get_translation("all_shifts", lang),
-            get_translation("night_shift", lang),
-            get_translation("morning_shift", lang)
-        ],
-        key="shift_selection",
-        horizontal=False
-    )
+# Get current language
+lang = st.session_state["language"]
 
-with col3:
-    st.markdown(f"""
-    <div class="pro-container">
-        <div class="section-header">
-            <span>📅</span> {get_translation("select_time_range", lang)}
-        </div>
+# --------------------------------------------------------------------
+# LANGUAGE TOGGLE AND ANIMATION
+# --------------------------------------------------------------------
+# Check if language was just changed
+if "language_changed" in st.session_state and st.session_state.language_changed:
+    st.session_state.language_changed = False  # Reset the flag
+    # Force a rerun to apply the language change
+    st.rerun()
+
+# Create a row with two columns for the translation button and JSON animation
+col_trans, col_json = st.columns([1, 1])
+
+with col_trans:
+    st.markdown("""
+    <div style="
+        padding: 10px;
+        border-radius: 12px;
+        margin-top: 10px;
+        text-align: center;
+        background: linear-gradient(to right, rgba(29, 91, 121, 0.05), transparent);
+    ">
+        <h3 style="
+            color: #1D5B79;
+            margin-bottom: 10px;
+            font-size: 22px;
+            font-weight: 600;
+            letter-spacing: 0.5px;
+        ">{}</h3>
     </div>
-    """, unsafe_allow_html=True)
+    """.format(get_translation("click_for_translation", lang)), unsafe_allow_html=True)
     
-    trend_days = st.slider(
-        "",
-        min_value=7,
-        max_value=30,
-        value=7,
-        key="trend_days"
-    )
+    translation_label = "切换中文" if lang == "EN" else "Switch to English"
     
-    # Calculate and display the actual date range
-    if 'df' in st.session_state and not st.session_state.df.empty and 'Shift Date' in st.session_state.df.columns:
-        try:
-            df = st.session_state.df  # Get df from session state
-            latest_date = df['Shift Date'].max()
-            if pd.notna(latest_date):
-                trend_end = latest_date
-                trend_start = trend_end - pd.DateOffset(days=trend_days)
-                
-                # Format dates for display
-                start_date_str = trend_start.strftime('%Y-%m-%d')
-                end_date_str = trend_end.strftime('%Y-%m-%d')
-                
-                # Display days and date range with improved styling
-                st.markdown(f"""
-                <div class="date-display">
-                    <div class="date-display-days dark-mode-compatible">{trend_days} {get_translation('days', lang)}</div>
-                    <div class="date-display-range dark-mode-compatible">{start_date_str} → {end_date_str}</div>
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
-                <div class="date-display">
-                    <div class="date-display-days">{trend_days} {get_translation('days', lang)}</div>
-                </div>
-                """, unsafe_allow_html=True)
-        except Exception as e:
-            st.markdown(f"""
-            <div class="date-display">
-                <div class="date-display-days">{trend_days} {get_translation('days', lang)}</div>
-            </div>
-            """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
-        <div class="date-display">
-            <div class="date-display-days">{trend_days} {get_translation('days', lang)}</div>
-        </div>
-        """, unsafe_allow_html=True)
+    # Define a callback that sets a flag when language changes
+    def change_language():
+        new_lang = "ZH" if lang == "EN" else "EN"
+        st.session_state.language = new_lang
+        st.session_state.language_changed = True
+    
+    st.button(translation_label, on_click=change_language, key="lang_toggle_btn")
+
+with col_json:
+    # Load the animation JSON file using proper path resolution (parsed once, then served from cache)
+    json_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "ani15.json")
+    animation_data = load_lottie_json(json_path)
+    
+    # Display the animation
+    if animation_data is not None:
+        st_lottie(
+            animation_data,
+            speed=1,
+            reverse=False,
+            loop=True,
+            quality="high",
+            height=200
+        )
+
+# Add space after the row
+st.markdown("<br>", unsafe_allow_html=True)
+render_glow_line()
+render_glow_line()
+
+# Render header using utils function
+render_header(get_translation("speeding_title", lang), "")
 
 # Create containers for loading states
 loading_container = st.empty()
@@ -726,8 +594,8 @@ if "df" not in st.session_state:
     # First check if we have an uploaded file in session state
     if "uploaded_file" in st.session_state and st.session_state.uploaded_file is not None:
         try:
-            df = pd.read_excel(st.session_state.uploaded_file)
-            st.session_state.df = df
+            df = read_excel_fast(st.session_state.uploaded_file)
+            st.session_state.df = assign_risk_level(df)
             st.session_state.data_source = "upload"
             loading_container.empty()
             success_container = st.empty()
@@ -743,9 +611,10 @@ if "df" not in st.session_state:
     if "df" not in st.session_state:
         try:
             # Try to load using utils
-            df = load_data()
+            df, source = load_data()
+            st.session_state.data_source = source
             if not df.empty:
-                st.session_state.df = df
+                st.session_state.df = assign_risk_level(df)
                 loading_container.empty()
         except Exception as e:
             st.error(f"Error loading data: {e}")
@@ -769,13 +638,12 @@ selections = {
 # Store selections in session state for other components
 st.session_state.selections = selections
 
-# Process the data if needed
-if not df.empty and 'Overspeeding Value' in df.columns:
+# Risk levels are assigned once when the data enters session state; reruns (slider, shift radio,
+# language toggle) reuse them until refresh_data_if_needed() drops the cached frame
+if not df.empty and 'Overspeeding Value' in df.columns and 'Risk Level' not in df.columns:
     df = assign_risk_level(df)
+    st.session_state.df = df
 
-
-
-# -------------------- SPEEDING EVENTS BY DAY --------------------
 def render_enhanced_chart_title(translation_key):
     """Render an enhanced chart title with styling and animations."""
     try:
@@ -796,265 +664,402 @@ def render_enhanced_chart_title(translation_key):
         </div>
         """, unsafe_allow_html=True)
 
-render_enhanced_chart_title("speeding_events_by_day")
+@st.cache_data(ttl=3600, max_entries=4, hash_funcs={pd.DataFrame: lambda frame: frame.shape})
+def speeding_events(df, data_key):
+    """Speeding rows narrowed to the columns the trend and group charts use (cached per dataset digest)."""
+    columns = [col for col in ("Shift Date", "Shift", "Group", "Risk Level", "Overspeeding Value") if col in df.columns]
+    speeding_df = df.loc[df['Event Type'] == 'Speeding', columns]
+    if "Overspeeding Value" in speeding_df.columns:
+        speeding_df = speeding_df.assign(**{
+            "Overspeeding Value": pd.to_numeric(speeding_df["Overspeeding Value"], errors="coerce", downcast="float")
+        })
+    return speeding_df
 
-# Ensure proper date conversion and handling
-if 'Shift Date' in df.columns:
-    try:
-        # Get the date range from the data
-        latest_date = df['Shift Date'].max()
-        trend_end = latest_date
-        trend_start = trend_end - pd.DateOffset(days=trend_days)
-        
-        # Filter data for the trend
-        trend_df = df[
-            (df['Shift Date'] >= trend_start) & 
-            (df['Shift Date'] <= trend_end)
-        ].copy()
+# Shift labels as stored in the data: Indonesian (Malam/Siang) or English (Night/Day)
+SHIFT_VALUES = {"night": ("Malam", "Night"), "morning": ("Siang", "Day")}
+
+@st.cache_data(ttl=3600, max_entries=32, hash_funcs={pd.DataFrame: lambda frame: frame.shape})
+def speeding_trend_counts(speeding_df, data_key, trend_end, trend_days, shift_key):
+    """
+    Daily risk-level counts for the trend chart and per fleet group.
+
+    Keyed on the dataset, window and a language-independent shift key, so a language
+    toggle only relabels the figures.
+    """
+    trend_start = trend_end - pd.DateOffset(days=trend_days)
+    trend_df = speeding_df[
+        (speeding_df['Shift Date'] >= trend_start) & 
+        (speeding_df['Shift Date'] <= trend_end)
+    ]
+
+    # Apply shift filter if selected (one membership test instead of scanning Shift for the naming in use)
+    if shift_key != "all":
+        trend_df = trend_df[trend_df['Shift'].isin(SHIFT_VALUES[shift_key])]
+
+    if trend_df.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    count_columns = ["Extreme", "High", "Medium", "Total Events"]
+    trend_data = trend_df.groupby(
+        [pd.Grouper(key='Shift Date', freq='D'), 'Risk Level'], observed=False
+    ).size().unstack(fill_value=0).reindex(columns=["Extreme", "High", "Medium"], fill_value=0).reset_index()
+    trend_data["Total Events"] = trend_data[["Extreme", "High", "Medium"]].sum(axis=1)
+    # Daily counts are small; the narrowest integer type shrinks the figure payload
+    trend_data[count_columns] = trend_data[count_columns].apply(pd.to_numeric, downcast="integer")
+
+    group_counts = pd.DataFrame()
+    if 'Group' in trend_df.columns:
+        # Count every group's daily events per risk level in one aggregation; reindex adds missing risk levels
+        group_counts = trend_df.groupby(
+            ["Group", pd.Grouper(key="Shift Date", freq="D"), "Risk Level"], observed=True
+        ).size().unstack("Risk Level", fill_value=0).reindex(columns=["Extreme", "High", "Medium"], fill_value=0)
+        group_counts["Total Events"] = group_counts.sum(axis=1)
+        group_counts = group_counts.apply(pd.to_numeric, downcast="integer")
+    return trend_data, group_counts
+
+# Slider and shift radio changes rerun only this fragment; data loading, CSS and the animation stay put
+@st.fragment
+def render_speeding_charts(df):
+    """Render the shift/time-range filters and the speeding trend and fleet group charts."""
+    # Create three columns for the filters
+    col1, col2, col3 = st.columns([1, 1, 1])
+
+    with col1:
+        st.markdown(f"""
+        <div class="pro-container">
+            <div class="section-header">
+                <span>📊</span> {get_translation("overspeed_rating", lang)}
+            </div>
+            <div class="rating-item">
+                <div class="speed-dot medium"></div>
+                <span>{get_translation("speed_description_medium", lang)}</span>
+            </div>
+            <div class="rating-item">
+                <div class="speed-dot high"></div>
+                <span>{get_translation("speed_description_high", lang)}</span>
+            </div>
+            <div class="rating-item">
+                <div class="speed-dot extreme"></div>
+                <span>{get_translation("speed_description_extreme", lang)}</span>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        st.markdown(f"""
+        <div class="pro-container">
+            <div class="section-header">
+                <span>⏰</span> {get_translation("select_shift", lang)}
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+        shift_type = st.radio(
+            "",
+            [
+                get_translation("all_shifts", lang),
+                get_translation("night_shift", lang),
+                get_translation("morning_shift", lang)
+            ],
+            key="shift_selection",
+            horizontal=False
+        )
+
+    with col3:
+        st.markdown(f"""
+        <div class="pro-container">
+            <div class="section-header">
+                <span>📅</span> {get_translation("select_time_range", lang)}
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+        trend_days = st.slider(
+            "",
+            min_value=7,
+            max_value=30,
+            value=7,
+            key="trend_days"
+        )
+    
+        # Calculate and display the actual date range
+        if not df.empty and 'Shift Date' in df.columns:
+            try:
+                latest_date = df['Shift Date'].max()
+                if pd.notna(latest_date):
+                    trend_end = latest_date
+                    trend_start = trend_end - pd.DateOffset(days=trend_days)
+                
+                    # Format dates for display
+                    start_date_str = trend_start.strftime('%Y-%m-%d')
+                    end_date_str = trend_end.strftime('%Y-%m-%d')
+                
+                    # Display days and date range with improved styling
+                    st.markdown(f"""
+                    <div class="date-display">
+                        <div class="date-display-days dark-mode-compatible">{trend_days} {get_translation('days', lang)}</div>
+                        <div class="date-display-range dark-mode-compatible">{start_date_str} → {end_date_str}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                else:
+                    st.markdown(f"""
+                    <div class="date-display">
+                        <div class="date-display-days">{trend_days} {get_translation('days', lang)}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+            except Exception as e:
+                st.markdown(f"""
+                <div class="date-display">
+                    <div class="date-display-days">{trend_days} {get_translation('days', lang)}</div>
+                </div>
+                """, unsafe_allow_html=True)
+        else:
+            st.markdown(f"""
+            <div class="date-display">
+                <div class="date-display-days">{trend_days} {get_translation('days', lang)}</div>
+            </div>
+            """, unsafe_allow_html=True)
+
+    # Chart labels and hover templates are shared by every trace and group; build them once per run
+    labels = {
+        key: get_translation(key, lang)
+        for key in ("date", "risk_level", "number_of_events", "events", "trend", "total_events", "fleet_group")
+    }
+    area_hover = f"<b>{labels['date']}: %{{x}}</b><br>{labels['risk_level']}: %{{fullData.name}}<br>{labels['events']}: %{{y}}"
+    trend_hover = f"<b>{labels['date']}: %{{x}}</b><br>{labels['trend']}: %{{y}}"
+    total_hover = f"<b>{labels['date']}: %{{x}}</b><br>{labels['total_events']} {labels['trend']}: %{{y}}"
+
+    # -------------------- SPEEDING EVENTS BY DAY --------------------
+    render_enhanced_chart_title("speeding_events_by_day")
+
+    group_counts = pd.DataFrame()
+
+    # Ensure proper date conversion and handling
+    if 'Shift Date' in df.columns:
+        try:
+            # Get the date range from the data
+            latest_date = df['Shift Date'].max()
         
-        if 'Event Type' in trend_df.columns:
-            trend_df = trend_df[trend_df['Event Type'] == 'Speeding'].copy()
+            if 'Event Type' in df.columns:
+                # One scan for Speeding rows per dataset; slider moves only re-slice the narrow frame
+                data_key = (df.shape, session_frame_digest(df))
+                speeding_df = speeding_events(df, data_key)
             
-            # Apply shift filter if selected
-            if shift_type != get_translation("all_shifts", lang):
-                # Get the original English values for shifts
-                night_shift_value = "Malam" if "Malam" in trend_df["Shift"].unique() else "Night"
-                morning_shift_value = "Siang" if "Siang" in trend_df["Shift"].unique() else "Day"
-                
-                # Map the translated selection back to the original value
-                shift_value = night_shift_value if shift_type == get_translation("night_shift", lang) else morning_shift_value
-                trend_df = trend_df[trend_df['Shift'] == shift_value]
+                # Map the translated shift selection back to a language-independent key
+                shift_key = {
+                    get_translation("night_shift", lang): "night",
+                    get_translation("morning_shift", lang): "morning",
+                }.get(shift_type, "all")
+                trend_data, group_counts = speeding_trend_counts(speeding_df, data_key, latest_date, trend_days, shift_key)
             
-            if not trend_df.empty:
-                # Group the data
-                trend_data = trend_df.groupby(
-                    [pd.Grouper(key='Shift Date', freq='D'), 'Risk Level']
-                ).size().unstack(fill_value=0).reset_index()
-                
-                # Ensure all risk levels are present
-                for risk in ["Extreme", "High", "Medium"]:
-                    if risk not in trend_data.columns:
-                        trend_data[risk] = 0
-                
-                trend_data["Total Events"] = trend_data[["Extreme", "High", "Medium"]].sum(axis=1)
+                if not trend_data.empty:
+                    # Create visualization
+                    risk_colors = {'Extreme': '#FF0000', 'High': '#FFA500', 'Medium': '#FFD700'}
+                    fig1 = px.line(
+                        trend_data,
+                        x="Shift Date",
+                        y=trend_data.columns[1:-1],
+                        labels={'value': 'Number of Events'},
+                        color_discrete_map=risk_colors,
+                        line_shape="linear",
+                        template="plotly_white"
+                    )
                 
-                # Create visualization
-                risk_colors = {'Extreme': '#FF0000', 'High': '#FFA500', 'Medium': '#FFD700'}
-                fig1 = px.line(
-                    trend_data,
-                    x="Shift Date",
-                    y=trend_data.columns[1:-1],
-                    labels={'value': 'Number of Events'},
-                    color_discrete_map=risk_colors,
-                    line_shape="linear",
-                    template="plotly_white"
-                )
+                    for i, trace in enumerate(fig1.data):
+                        trace.update(
+                            fill='tozeroy' if i == 0 else 'tonexty', 
+                            opacity=0.1,
+                            line=dict(width=3),
+                            mode='lines+markers', 
+                            marker=dict(size=8, line=dict(width=1, color='black'))
+                        )
                 
-                for i, trace in enumerate(fig1.data):
-                    trace.update(
-                        fill='tozeroy' if i == 0 else 'tonexty', 
-                        opacity=0.1,
-                        line=dict(width=3),
-                        mode='lines+markers', 
-                        marker=dict(size=8, line=dict(width=1, color='black'))
+                    fig1.update_traces(
+                        hovertemplate=f"<b>📅 {labels['date']}: %{{x}}</b><br>🔥 {labels['risk_level']}: %{{fullData.name}}<br>"
+                                      f"📊 {labels['number_of_events']}: %{{y}}",
+                        hoverlabel=dict(bgcolor="white", font_size=13, font_color="black", font_family="Arial Black")
                     )
                 
-                fig1.update_traces(
-                    hovertemplate="<b>📅 " + get_translation("date", lang) + ": %{x}</b><br>🔥 " + 
-                                  get_translation("risk_level", lang) + ": %{fullData.name}<br>📊 " + 
-                                  get_translation("number_of_events", lang) + ": %{y}",
-                    hoverlabel=dict(bgcolor="white", font_size=13, font_color="black", font_family="Arial Black")
-                )
-                
-                # Add total events annotations
-                for i, date in enumerate(trend_data["Shift Date"]):
-                    fig1.add_annotation(
-                        x=date,
-                        y=-5,
-                        text=f" {trend_data['Total Events'][i]}",
-                        showarrow=False,
-                        font=dict(size=12, color="black"),
-                        xshift=0,
-                        yshift=-20
+                    # Add total events labels under each day as one text trace instead of per-date annotations
+                    fig1.add_trace(
+                        go.Scatter(
+                            x=trend_data["Shift Date"],
+                            y=[0] * len(trend_data),
+                            mode="text",
+                            text=trend_data["Total Events"].astype(str),
+                            textposition="bottom center",
+                            textfont=dict(size=12, color="black"),
+                            cliponaxis=False,
+                            showlegend=False,
+                            hoverinfo="skip"
+                        )
                     )
                 
-                fig1.update_layout(
-                    height=400,
-                    template="plotly_white",
-                    title_text=get_translation("speeding_events_title", lang),
-                    title_x=0.5,
-                    title_font=dict(size=18, family="Arial", color="#2a3f5f"),
-                    xaxis_title=get_translation("date", lang),
-                    yaxis_title=get_translation("number_of_events", lang),
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    xaxis=dict(
-                        tickformat="%b %d, %Y", 
-                        showgrid=True,
-                        gridcolor='rgba(200, 200, 200, 0.5)', 
-                        linecolor='black', 
-                        linewidth=2
-                    ),
-                    yaxis=dict(
-                        showgrid=True, 
-                        gridcolor='rgba(200, 200, 200, 0.5)',
-                        linecolor='black', 
-                        linewidth=2
-                    ),
-                    legend=dict(
-                        title=get_translation("risk_level", lang), 
-                        orientation="h", 
-                        yanchor="bottom", 
-                        y=-0.3,
-                        font=dict(size=12, color="black")
-                    ),
-                    margin=dict(l=20, r=20, t=40, b=80)
-                )
+                    fig1.update_layout(
+                        height=400,
+                        template="plotly_white",
+                        title_text=get_translation("speeding_events_title", lang),
+                        title_x=0.5,
+                        title_font=dict(size=18, family="Arial", color="#2a3f5f"),
+                        xaxis_title=labels['date'],
+                        yaxis_title=labels['number_of_events'],
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        xaxis=dict(
+                            tickformat="%b %d, %Y", 
+                            showgrid=True,
+                            gridcolor='rgba(200, 200, 200, 0.5)', 
+                            linecolor='black', 
+                            linewidth=2
+                        ),
+                        yaxis=dict(
+                            showgrid=True, 
+                            gridcolor='rgba(200, 200, 200, 0.5)',
+                            linecolor='black', 
+                            linewidth=2
+                        ),
+                        legend=dict(
+                            title=labels['risk_level'], 
+                            orientation="h", 
+                            yanchor="bottom", 
+                            y=-0.3,
+                            font=dict(size=12, color="black")
+                        ),
+                        margin=dict(l=20, r=20, t=40, b=80)
+                    )
                 
-                # Store the main figure in session state for PDF generation
-                st.session_state["main_trend_fig"] = fig1
+                    # Store the main figure in session state for PDF generation
+                    st.session_state["main_trend_fig"] = fig1
 
-                # Display the chart
-                st.plotly_chart(fig1, use_container_width=True, key="main_speeding_trend")
-            else:
-                st.warning(get_translation("no_data_warning", lang))
-    except Exception as e:
-            st.error(get_translation("data_processing_error", lang).format(error=str(e)))
-    except Exception as e:
-        st.error(f"Error processing data: {e}")
-else:
-    st.error(get_translation("column_not_found_error", lang).format(column="Shift Date"))
+                    # Display the chart
+                    st.plotly_chart(fig1, use_container_width=True, key="main_speeding_trend")
+                else:
+                    st.warning(get_translation("no_data_warning", lang))
+        except Exception as e:
+                st.error(get_translation("data_processing_error", lang).format(error=str(e)))
+        except Exception as e:
+            st.error(f"Error processing data: {e}")
+    else:
+        st.error(get_translation("column_not_found_error", lang).format(column="Shift Date"))
 
 
-# -------------------- OVERSPEEDING INTENSITY BY GROUP --------------------
-render_enhanced_chart_title("overspeeding_intensity")
+    # -------------------- OVERSPEEDING INTENSITY BY GROUP --------------------
+    render_enhanced_chart_title("overspeeding_intensity")
 
-# Define color schemes
-bar_colors = {'Extreme': '#FF5733', 'High': '#FFA500', 'Medium': '#FFD700'}
-trend_colors = {'Extreme': '#C70039', 'High': '#FF8C00', 'Medium': '#DAA520'}
+    # Define color schemes
+    bar_colors = {'Extreme': '#FF5733', 'High': '#FFA500', 'Medium': '#FFD700'}
+    trend_colors = {'Extreme': '#C70039', 'High': '#FF8C00', 'Medium': '#DAA520'}
 
-if not trend_df.empty and 'Group' in trend_df.columns:
-    fleet_groups = sorted(trend_df['Group'].unique())
-    
-    for idx, group in enumerate(fleet_groups):
-        group_df = trend_df[trend_df["Group"] == group]
-        
-        if not group_df.empty:
-            # Process group data
-            processed_df = group_df.groupby(
-                ["Shift Date", "Risk Level"]
-            ).size().unstack(fill_value=0).reset_index()
-            
-            # Ensure all risk categories exist
-            for risk in ["Extreme", "High", "Medium"]:
-                if risk not in processed_df.columns:
-                    processed_df[risk] = 0
+    group_fig_list = []
+    if not group_counts.empty:
+        for group, processed_df in group_counts.groupby(level="Group", observed=True):
+            if not processed_df.empty:
+                processed_df = processed_df.droplevel("Group").reset_index()
+                # 3-day rolling trend for all four count columns in a single rolling pass
+                trend_means = processed_df[["Extreme", "High", "Medium", "Total Events"]].rolling(window=3, min_periods=1).mean()
+                # Hand Plotly plain arrays so trace construction skips per-Series validation and boxing
+                dates = processed_df["Shift Date"].to_numpy()
             
-            processed_df["Total Events"] = processed_df[["Extreme", "High", "Medium"]].sum(axis=1)
-            
-            # Create visualization
-            fig = go.Figure()
+                # Create visualization
+                fig = go.Figure()
             
-            # First add all area traces in specific order: Medium, High, Extreme
-            risk_order = ["Medium", "High", "Extreme"]  # Add lowest to highest for proper stacking
-            for risk_level in risk_order:
-                fig.add_trace(
-                    go.Scatter(
-                        x=processed_df["Shift Date"],
-                        y=processed_df[risk_level],
-                        name=risk_level,
-                        fill='tozeroy',
-                        mode='lines',
-                        line=dict(color=bar_colors[risk_level], width=3),
-                        opacity=0.85,
-                        hovertemplate="<b>" + get_translation("date", lang) + ": %{x}</b><br>" + 
-                                      get_translation("risk_level", lang) + ": %{fullData.name}<br>" + 
-                                      get_translation("events", lang) + ": %{y}"
+                # First add all area traces in specific order: Medium, High, Extreme
+                risk_order = ["Medium", "High", "Extreme"]  # Add lowest to highest for proper stacking
+                for risk_level in risk_order:
+                    fig.add_trace(
+                        go.Scatter(
+                            x=dates,
+                            y=processed_df[risk_level].to_numpy(),
+                            name=risk_level,
+                            fill='tozeroy',
+                            mode='lines',
+                            line=dict(color=bar_colors[risk_level], width=3),
+                            opacity=0.85,
+                            hovertemplate=area_hover
+                        )
                     )
-                )
             
-            # Now add all line traces so they appear on top
-            for risk_level in risk_order:  # Use same order for consistency
+                # Now add all line traces so they appear on top
+                for risk_level in risk_order:  # Use same order for consistency
+                    fig.add_trace(
+                        go.Scatter(
+                            x=dates,
+                            y=trend_means[risk_level].to_numpy(),
+                            mode='lines+markers',
+                            name=f"{risk_level} {labels['trend']}",
+                            line=dict(color=trend_colors[risk_level], width=2.5, dash='solid'),
+                            marker=dict(symbol='circle', size=8, color=trend_colors[risk_level]),
+                            hovertemplate=trend_hover
+                        )
+                    )
+
+                # Add total events trend line last so it's on top of everything
                 fig.add_trace(
                     go.Scatter(
-                        x=processed_df["Shift Date"],
-                        y=processed_df[risk_level].rolling(window=3, min_periods=1).mean(),
+                        x=dates,
+                        y=trend_means["Total Events"].to_numpy(),
                         mode='lines+markers',
-                        name=f"{risk_level} {get_translation('trend', lang)}",
-                        line=dict(color=trend_colors[risk_level], width=2.5, dash='solid'),
-                        marker=dict(symbol='circle', size=8, color=trend_colors[risk_level]),
-                        hovertemplate="<b>" + get_translation("date", lang) + ": %{x}</b><br>" + 
-                                      get_translation("trend", lang) + ": %{y}"
+                        name=f"{labels['total_events']} {labels['trend']}",
+                        line=dict(color='#1F77B4', width=3, dash='solid'),
+                        marker=dict(symbol='circle', size=10, color='#1F77B4'),
+                        hovertemplate=total_hover
                     )
                 )
 
-            # Add total events trend line last so it's on top of everything
-            fig.add_trace(
-                go.Scatter(
-                    x=processed_df["Shift Date"],
-                    y=processed_df["Total Events"].rolling(window=3, min_periods=1).mean(),
-                    mode='lines+markers',
-                    name=f"{get_translation('total_events', lang)} {get_translation('trend', lang)}",
-                    line=dict(color='#1F77B4', width=3, dash='solid'),
-                    marker=dict(symbol='circle', size=10, color='#1F77B4'),
-                    hovertemplate="<b>" + get_translation("date", lang) + ": %{x}</b><br>" + 
-                                  get_translation("total_events", lang) + " " + 
-                                  get_translation("trend", lang) + ": %{y}"
-                )
-            )
-
-            # Update layout
-            fig.update_layout(
-                height=350,
-                margin=dict(l=20, r=20, t=40, b=50),
-                legend=dict(
-                    title=get_translation("risk_level", lang),
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="center",
-                    x=0.5,
-                    font=dict(size=11, color="black")
-                ),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                hoverlabel=dict(
-                    bgcolor="black",
-                    font_size=12,
-                    font_color="white",
-                    font_family="Arial"
-                ),
-                xaxis=dict(
-                    tickformat="%b %d, %Y",
-                    showgrid=True,
-                    gridcolor='rgba(200, 200, 200, 0.2)',
-                    linecolor='black',
-                    linewidth=2,
-                    title=get_translation("date", lang)
-                ),
-                yaxis=dict(
-                    showgrid=True,
-                    gridcolor='rgba(200, 200, 200, 0.2)',
-                    linecolor='black',
-                    linewidth=2,
-                    title=get_translation("number_of_events", lang)
+                # Update layout
+                fig.update_layout(
+                    height=350,
+                    margin=dict(l=20, r=20, t=40, b=50),
+                    legend=dict(
+                        title=labels['risk_level'],
+                        orientation="h",
+                        yanchor="bottom",
+                        y=1.02,
+                        xanchor="center",
+                        x=0.5,
+                        font=dict(size=11, color="black")
+                    ),
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    hoverlabel=dict(
+                        bgcolor="black",
+                        font_size=12,
+                        font_color="white",
+                        font_family="Arial"
+                    ),
+                    xaxis=dict(
+                        tickformat="%b %d, %Y",
+                        showgrid=True,
+                        gridcolor='rgba(200, 200, 200, 0.2)',
+                        linecolor='black',
+                        linewidth=2,
+                        title=labels['date']
+                    ),
+                    yaxis=dict(
+                        showgrid=True,
+                        gridcolor='rgba(200, 200, 200, 0.2)',
+                        linecolor='black',
+                        linewidth=2,
+                        title=labels['number_of_events']
+                    )
                 )
-            )
 
-            # Display chart title and chart
-            st.markdown(f"""
-                <div class="fleet-group-title" style="padding: 10px; margin: 10px 0; background: rgba(29, 91, 121, 0.8); border-radius: 8px;">
-                    <h2 style="font-size: 18px; margin: 0; color: #FFFFFF; text-align: center;">📊 {get_translation("fleet_group", lang)}: {group}</h2>
-                </div>
-            """, unsafe_allow_html=True)
-            st.plotly_chart(fig, use_container_width=True, key=f"group_chart_{group}")
-            group_fig_list.append(fig)
+                # Display chart title and chart
+                st.markdown(f"""
+                    <div class="fleet-group-title" style="padding: 10px; margin: 10px 0; background: rgba(29, 91, 121, 0.8); border-radius: 8px;">
+                        <h2 style="font-size: 18px; margin: 0; color: #FFFFFF; text-align: center;">📊 {labels['fleet_group']}: {group}</h2>
+                    </div>
+                """, unsafe_allow_html=True)
+                st.plotly_chart(fig, use_container_width=True, key=f"group_chart_{group}")
+                group_fig_list.append(fig)
     
-    # Store figures in session state
-    st.session_state["group_fig_list"] = group_fig_list
+        # Store figures in session state
+        st.session_state["group_fig_list"] = group_fig_list
 
-else:
-    st.warning(get_translation("no_overspeeding_data", lang))
+    else:
+        st.warning(get_translation("no_overspeeding_data", lang))
+
+render_speeding_charts(df)
 
 @st.cache_data(ttl=300)
 def get_speeding_metrics_sql(selections):
@@ -1157,7 +1162,7 @@ def get_speeding_trend_data_sql(selections):
     try:
         trend_query = f"""
         WITH DateRange AS (
-            SELECT TOP {trend_days}
+            SELECT TOP {int(st.session_state.get('trend_days', 7))}
                 CAST([Shift Date] AS DATE) as event_date,
                 COUNT(*) as total_events,
                 AVG([Overspeeding Value]) as avg_overspeed,
@@ -568,14 +568,14 @@ else:
 # =============================================================================
 # KPI METRICS CALCULATION & DISPLAY (with CSS animations preserved)
 # =============================================================================
-df["Driver"] = df["Driver"].fillna("").astype(str).str.strip()
+df["Driver"] = df["Driver"].astype(object).fillna("").astype(str).str.strip()
 total_unique_drivers = df[df["Driver"] != ""]["Driver"].nunique()
 overspeed_threshold = 6
 total_violations = len(filtered_df[filtered_df["Overspeeding Value"] >= overspeed_threshold])
 driver_daily_events = filtered_df[
     (filtered_df["Driver"] != "") &
     (filtered_df["Overspeeding Value"] >= overspeed_threshold)
-].groupby(["Driver", "Shift_Date_only"]).size().reset_index(name="daily_events")
+].groupby(["Driver", "Shift_Date_only"], observed=True).size().reset_index(name="daily_events")
 high_risk_drivers = driver_daily_events[driver_daily_events["daily_events"] > 1]["Driver"].nunique()
 active_drivers = filtered_df[(filtered_df["Driver"] != "") & (filtered_df["Overspeeding Value"] >= overspeed_threshold)]["Driver"].nunique()
 
@@ -630,11 +630,11 @@ with kpi3:
     if "Driver" in filtered_df.columns and "Overspeeding Value" in filtered_df.columns:
         valid_df = filtered_df[(filtered_df["Driver"] != "") & (filtered_df["Overspeeding Value"] > 0)]
         if not valid_df.empty:
-            avg_overspeeding = valid_df.groupby("Driver")["Overspeeding Value"].mean().mean()
+            avg_overspeeding = valid_df.groupby("Driver", observed=True)["Overspeeding Value"].mean().mean()
             if "Driver" in prev_df.columns and "Overspeeding Value" in prev_df.columns:
                 valid_prev_df = prev_df[(prev_df["Driver"] != "") & (prev_df["Overspeeding Value"] > 0)]
                 if not valid_prev_df.empty:
-                    prev_avg = valid_prev_df.groupby("Driver")["Overspeeding Value"].mean().mean()
+                    prev_avg = valid_prev_df.groupby("Driver", observed=True)["Overspeeding Value"].mean().mean()
                     percent_change = ((avg_overspeeding - prev_avg) / prev_avg * 100) if prev_avg > 0 else 0
                     color_class = 'red' if percent_change > 0 else 'green' if percent_change < 0 else 'blue'
                 else:
@@ -748,7 +748,7 @@ render_glow_line()
 # TOP RISKY DRIVERS & WARNING LETTERS
 # =============================================================================
 render_chart_title("top_10_risky_drivers")
-driver_stats = filtered_df[filtered_df["Driver"].str.strip() != ""].groupby("Driver")["Overspeeding Value"].mean().reset_index()
+driver_stats = filtered_df[filtered_df["Driver"].str.strip() != ""].groupby("Driver", observed=True)["Overspeeding Value"].mean().reset_index()
 top_drivers = driver_stats.sort_values("Overspeeding Value", ascending=False).head(10)
 fig_bar = px.bar(top_drivers, y="Driver", x="Overspeeding Value", 
                  title=get_translation("top_10_risky_drivers", st.session_state.language),
@@ -771,10 +771,10 @@ st.markdown(f"""
     </h2>
 </div>
 """, unsafe_allow_html=True)
-filtered_df["Driver"] = filtered_df["Driver"].fillna("").astype(str).str.strip()
+filtered_df["Driver"] = filtered_df["Driver"].astype(object).fillna("").astype(str).str.strip()
 valid_drivers_df = filtered_df[(filtered_df["Overspeeding Value"] >= overspeed_threshold) & (filtered_df["Driver"] != "")]
 letters_df = valid_drivers_df.drop_duplicates(subset=["Driver", "Shift_Date_only", "Shift"])
-top_letters = letters_df.groupby("Driver").size().reset_index(name="Letters")
+top_letters = letters_df.groupby("Driver", observed=True).size().reset_index(name="Letters")
 top_letters = top_letters.sort_values("Letters", ascending=False).head(15)
 fig_top15 = px.bar(
     top_letters,
@@ -809,7 +809,7 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 if not filtered_df.empty:
     warnings_df = filtered_df[filtered_df["Overspeeding Value"] >= overspeed_threshold]
-    warning_counts = warnings_df.groupby(["Group", "Shift"]).size().reset_index(name="Count")
+    warning_counts = warnings_df.groupby(["Group", "Shift"], observed=True).size().reset_index(name="Count")
     warning_counts.rename(columns={
         "Group": get_translation("group", st.session_state.language),
         "Shift": get_translation("shift", st.session_state.language),
@@ -1071,8 +1071,8 @@ def overspeeding_warning_letters(df: pd.DataFrame):
         st.error(f"{get_translation('Missing required columns', st.session_state.language)}: {missing_cols}")
         st.stop()
     df["Shift_Date_only"] = pd.to_datetime(df["Shift Date"]).dt.date
-    df["Driver"] = df["Driver"].fillna("").astype(str).str.strip()
-    df["License Plate"] = df["License Plate"].fillna("").astype(str).str.strip()
+    df["Driver"] = df["Driver"].astype(object).fillna("").astype(str).str.strip()
+    df["License Plate"] = df["License Plate"].astype(object).fillna("").astype(str).str.strip()
     # Apply date filtering based on whether a single date or a range was selected
     if start_date == end_date:
         filtered = df[df["Shift_Date_only"] == start_date]
@@ -1280,7 +1280,7 @@ driver_list = sorted(filtered_df[filtered_df["Overspeeding Value"] >= overspeed_
 selected_driver = st.selectbox(get_translation("select_driver", st.session_state.language), driver_list)
 if selected_driver:
     driver_data = filtered_df[filtered_df["Driver"] == selected_driver]
-    event_counts = driver_data["Event Type"].value_counts().reset_index()
+    event_counts = driver_data["Event Type"].value_counts()[lambda counts: counts > 0].reset_index()
     event_counts.columns = [get_translation("event_type", st.session_state.language), get_translation("count", st.session_state.language)]
     st.markdown(f"""<div class="section-header"> {get_translation('event_breakdown_for', st.session_state.language)} {selected_driver}</div>""", unsafe_allow_html=True)
     st.dataframe(event_counts, use_container_width=True)
@@ -17,7 +17,7 @@ st.set_page_config(
 )
 
 # Import local modules
-from utils import render_glow_line, render_header, get_sql_connection
+from utils import render_glow_line, render_header, get_sql_connection, sql_snapshot_age_text
 from translations import get_translation
 from config import DB_CONFIG, GLOBAL_CSS
 
@@ -77,6 +77,8 @@ with tab_db:
             st.info("ℹ️ Currently using uploaded file")
         elif data_source == "network":
             st.info("ℹ️ Currently using network dataset")
+        elif data_source == "snapshot":
+            st.warning(f"⚠️ Currently using the last SQL snapshot ({sql_snapshot_age_text()})")
         elif data_source == "sample":
             st.warning("⚠️ Currently using sample dataset")
     
@@ -87,6 +89,7 @@ with tab_db:
         # Also clear session state data
         if 'df' in st.session_state:
             del st.session_state.df
+        st.session_state.pop('df_digest', None)
         st.success("✅ Cache cleared! Data will be reloaded from source.")
         time.sleep(1)
         st.rerun()
@@ -8,6 +8,8 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 import io
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from datetime import datetime
 import numpy as np
 from PIL import Image as PILImage
@@ -39,6 +41,84 @@ try:
 except ImportError:
     HAS_WEBDRIVER_MANAGER = False
 
+# Each element screenshot drives its own headless Chrome, so cap how many run at once
+MAX_CAPTURE_WORKERS = 4
+
+# Report paragraph styles are fixed, so build them once at import time
+SAMPLE_STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=SAMPLE_STYLES['Heading1'],
+    fontSize=36,
+    fontName='Helvetica-Bold',
+    textColor=colors.HexColor('#1D5B79'),
+    alignment=1,  # Center alignment
+    spaceAfter=30,
+    leading=40
+)
+
+SUBTITLE_STYLE = ParagraphStyle(
+    'CustomSubtitle',
+    parent=SAMPLE_STYLES['Heading2'],
+    fontSize=18,
+    fontName='Helvetica',
+    textColor=colors.HexColor('#2E8B57'),
+    alignment=1,
+    spaceAfter=20
+)
+
+FILTER_STYLE = ParagraphStyle(
+    'FilterStyle',
+    parent=SAMPLE_STYLES['Normal'],
+    fontSize=12,
+    textColor=colors.HexColor('#666666'),
+    alignment=1
+)
+
+SECTION_TITLE_STYLE = ParagraphStyle(
+    'SectionTitle',
+    parent=SAMPLE_STYLES['Heading2'],
+    fontSize=24,
+    fontName='Helvetica-Bold',
+    textColor=colors.HexColor('#2E8B57'),
+    alignment=1,
+    spaceAfter=20
+)
+
+# Same as SECTION_TITLE_STYLE with reduced spacing above chart blocks
+CHART_SECTION_TITLE_STYLE = ParagraphStyle(
+    'ChartSectionTitle',
+    parent=SECTION_TITLE_STYLE,
+    spaceAfter=10
+)
+
+CHART_TITLE_STYLE = ParagraphStyle(
+    'ChartTitle',
+    parent=SAMPLE_STYLES['Heading3'],
+    fontSize=18,
+    fontName='Helvetica-Bold',
+    textColor=colors.HexColor('#2E8B57'),
+    alignment=1,
+    spaceAfter=10
+)
+
+KPI_TITLE_STYLE = ParagraphStyle(
+    'KPITitle',
+    parent=SAMPLE_STYLES['Normal'],
+    fontSize=12,
+    alignment=1,
+    textColor=colors.HexColor('#555555')
+)
+
+KPI_UNIT_STYLE = ParagraphStyle(
+    'KPIUnit',
+    parent=SAMPLE_STYLES['Normal'],
+    fontSize=10,
+    alignment=1,
+    textColor=colors.HexColor('#777777')
+)
+
 def get_safe_colormap(name="viridis", fallback="viridis"):
     """Get a colormap, with fallback if not available"""
     try:
@@ -98,6 +178,7 @@ def create_dashboard_styled_charts(df):
         plt.style.use('ggplot')
         
         event_counts = df['Event Type'].value_counts()
+        event_counts = event_counts[event_counts > 0]
         colors = plt.cm.viridis(np.linspace(0, 1, len(event_counts)))
         
         bars = plt.barh(event_counts.index, event_counts.values, color=colors)
@@ -140,7 +221,7 @@ def create_dashboard_styled_charts(df):
         plt.figure(figsize=(10, 6))
         plt.style.use('ggplot')
         
-        driver_events = df.groupby('Driver')['Event Type'].count().sort_values(ascending=False).head(10)
+        driver_events = df.groupby('Driver', observed=True)['Event Type'].count().sort_values(ascending=False).head(10)
         colors = get_safe_colormap("rocket", "viridis")(np.linspace(0, 0.8, len(driver_events)))
         
         bars = plt.barh(driver_events.index, driver_events.values, color=colors)
@@ -435,7 +516,7 @@ def create_kpi_values(df):
     
     return kpi_data
 
-def create_dashboard_report(df, kpi_images, chart_images, filters=None):
+def create_dashboard_report(df, kpi_images, chart_images, filters=None, dashboard_charts=None):
     """Generate a PDF report with title, logo, KPIs and charts."""
     
     if not os.path.exists('reports'):
@@ -455,29 +536,7 @@ def create_dashboard_report(df, kpi_images, chart_images, filters=None):
     )
     
     story = []
-    styles = getSampleStyleSheet()
-    
-    # Create custom title style
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=36,
-        fontName='Helvetica-Bold',
-        textColor=colors.HexColor('#1D5B79'),
-        alignment=1,  # Center alignment
-        spaceAfter=30,
-        leading=40
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Heading2'],
-        fontSize=18,
-        fontName='Helvetica',
-        textColor=colors.HexColor('#2E8B57'),
-        alignment=1,
-        spaceAfter=20
-    )
+    styles = SAMPLE_STYLES
     
     # First page header with larger logo and styled title
     logo_path = "assets/logo.png"
@@ -490,7 +549,7 @@ def create_dashboard_report(df, kpi_images, chart_images, filters=None):
             Image(logo_path, width=desired_width, height=logo_height),
             Paragraph(
                 "Fleet Safety Dashboard Report",
-                title_style
+                TITLE_STYLE
             ),
             ""  # Empty cell for balance
         ]]
@@ -505,7 +564,7 @@ def create_dashboard_report(df, kpi_images, chart_images, filters=None):
     # Add timestamp
     story.append(Paragraph(
         f"Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}",
-        subtitle_style
+        SUBTITLE_STYLE
     ))
     story.append(Spacer(1, 20))
     
@@ -519,13 +578,7 @@ def create_dashboard_report(df, kpi_images, chart_images, filters=None):
         if filter_text:
             filter_para = Paragraph(
                 "Filters Applied: " + " | ".join(filter_text),
-                ParagraphStyle(
-                    'FilterStyle',
-                    parent=styles['Normal'],
-                    fontSize=12,
-                    textColor=colors.HexColor('#666666'),
-                    alignment=1
-                )
+                FILTER_STYLE
             )
             story.append(filter_para)
             story.append(Spacer(1, 20))
@@ -533,15 +586,7 @@ def create_dashboard_report(df, kpi_images, chart_images, filters=None):
     # Add KPI section with styled title
     story.append(Paragraph(
         "Key Performance Indicators",
-        ParagraphStyle(
-            'SectionTitle',
-            parent=styles['Heading2'],
-            fontSize=24,
-            fontName='Helvetica-Bold',
-            textColor=colors.HexColor('#2E8B57'),
-            alignment=1,
-            spaceAfter=20
-        )
+        SECTION_TITLE_STYLE
     ))
     
     # Add KPIs - first try with images, then fall back to generated text KPIs
@@ -591,15 +636,6 @@ def create_dashboard_report(df, kpi_images, chart_images, filters=None):
             kpi_rows = []
             current_row = []
             
-            # Create title and value styles
-            kpi_title_style = ParagraphStyle(
-                'KPITitle',
-                parent=styles['Normal'],
-                fontSize=12,
-                alignment=1,
-                textColor=colors.HexColor('#555555')
-            )
-            
             # Divide KPIs into rows of 3
             for i, kpi in enumerate(kpi_data):
                 # Create KPI card with custom font size for date range
@@ -613,19 +649,11 @@ def create_dashboard_report(df, kpi_images, chart_images, filters=None):
                     leading=kpi.get('line_spacing', 18)  # Ensure default value
                 )
                 
-                kpi_unit_style = ParagraphStyle(
-                    f'KPIUnit_{i}',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    alignment=1,
-                    textColor=colors.HexColor('#777777')
-                )
-                
                 # Build KPI card content
                 kpi_card_content = [
-                    [Paragraph(kpi["title"], kpi_title_style)],
+                    [Paragraph(kpi["title"], KPI_TITLE_STYLE)],
                     [Paragraph(kpi["value"], kpi_value_style)],
-                    [Paragraph(kpi["unit"], kpi_unit_style)]
+                    [Paragraph(kpi["unit"], KPI_UNIT_STYLE)]
                 ]
                 
                 # Create KPI card table with border
@@ -663,22 +691,15 @@ def create_dashboard_report(df, kpi_images, chart_images, filters=None):
     # Add a page break before charts
     story.append(PageBreak())
     
-    # Generate the dashboard-styled charts
-    dashboard_charts = create_dashboard_styled_charts(df)
+    # Generate the dashboard-styled charts unless the caller already rendered them
+    if dashboard_charts is None:
+        dashboard_charts = create_dashboard_styled_charts(df)
     
     # First add any captured chart images from the dashboard
     if chart_images:
         story.append(Paragraph(
             "Dashboard Analytics",
-            ParagraphStyle(
-                'SectionTitle',
-                parent=styles['Heading2'],
-                fontSize=24,
-                fontName='Helvetica-Bold',
-                textColor=colors.HexColor('#2E8B57'),
-                alignment=1,
-                spaceAfter=10  # Reduced spacing
-            )
+            CHART_SECTION_TITLE_STYLE
         ))
         
         for chart_image in chart_images:
@@ -696,15 +717,7 @@ def create_dashboard_report(df, kpi_images, chart_images, filters=None):
     if dashboard_charts:
         story.append(Paragraph(
             "Analytics & Insights",
-            ParagraphStyle(
-                'SectionTitle',
-                parent=styles['Heading2'],
-                fontSize=24,
-                fontName='Helvetica-Bold',
-                textColor=colors.HexColor('#2E8B57'),
-                alignment=1,
-                spaceAfter=10
-            )
+            CHART_SECTION_TITLE_STYLE
         ))
         
         # Add charts in 2-column layout with descriptions
@@ -723,7 +736,7 @@ def create_dashboard_report(df, kpi_images, chart_images, filters=None):
                         [Spacer(1, 0.2*inch)],
                         [Paragraph("Data Summary:", styles['Heading3'])],
                         [Paragraph(f"Records: {len(df):,}", styles['Normal'])],
-                        [Paragraph(f"Time Range: {df['Date'].min()} to {df['Date'].max()}", styles['Normal'])]
+                        [Paragraph(f"Time Range: {pd.Timestamp(df['Date'].min()).date()} to {pd.Timestamp(df['Date'].max()).date()}", styles['Normal'])]
                     ], colWidths=[2.5*inch])
                 ]
             ], colWidths=[6.5*inch, 2.5*inch])
@@ -745,8 +758,18 @@ def create_dashboard_report(df, kpi_images, chart_images, filters=None):
         raise
     return filename
 
-def capture_element_screenshot(element_id):
-    """Capture specific dashboard element by ID"""
+def resolve_chromedriver_path():
+    """Install/locate chromedriver via webdriver_manager; an empty string means use the system driver."""
+    if HAS_WEBDRIVER_MANAGER:
+        try:
+            return ChromeDriverManager().install()
+        except Exception as e:
+            print(f"Could not install chromedriver, using the system driver: {str(e)}")
+    return ""
+
+def capture_element_screenshot(element_id, driver_path=None):
+    """Capture specific dashboard element by ID (``driver_path`` from resolve_chromedriver_path, resolved here if None)"""
+    driver = None
     try:
         # Get current Streamlit URL from runtime config
         port = st.runtime.get_instance().config.server.port
@@ -760,9 +783,10 @@ def capture_element_screenshot(element_id):
         chrome_options.add_argument("--no-sandbox")
         
         # Use browserless/chrome for more reliable captures
-        if HAS_WEBDRIVER_MANAGER:
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
+        if driver_path is None:
+            driver_path = resolve_chromedriver_path()
+        if driver_path:
+            driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
         else:
             driver = webdriver.Chrome(options=chrome_options)
             
@@ -773,7 +797,7 @@ def capture_element_screenshot(element_id):
             WebDriverWait(driver, 10).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, f"#{element_id}"))
             )
-            WebDriverWait(driver, 10).until(
+            map_element = WebDriverWait(driver, 10).until(
                 EC.visibility_of_element_located((By.CSS_SELECTOR, f"#{element_id}"))
             )
         except Exception as e:
@@ -787,13 +811,14 @@ def capture_element_screenshot(element_id):
         driver.execute_script("window.dispatchEvent(new Event('resize'))")
         time.sleep(2)
         
-        screenshot = map_element.screenshot_as_png
-        driver.quit()
-        return screenshot
+        return map_element.screenshot_as_png
         
     except Exception as e:
         print(f"Error capturing {element_id}: {str(e)}")
         return None
+    finally:
+        if driver is not None:
+            driver.quit()
 
 def capture_matching_elements(pattern):
     """Capture all elements matching a pattern in their key."""
@@ -821,7 +846,14 @@ def find_streamlit_elements():
     return element_keys
 
 def generate_dashboard_report(df, filters=None):
-    """Generate report with actual dashboard content."""
+    """
+    Generate report with actual dashboard content.
+
+    Returns ``(filename, status)``; status is "complete", "partial" (some dashboard
+    elements were replaced by data-generated charts), "fallback" (simplified
+    data-only report) or "failed" (filename is None). Nothing is shown in the UI
+    here, because the build may run outside a script run (deferred download).
+    """
     try:
         # Try to ensure required packages are available
         try:
@@ -870,11 +902,19 @@ def generate_dashboard_report(df, filters=None):
         
         # Try to capture all remaining elements as potential charts if we found few
         if len(chart_images) < 3:
-            for key in all_elements:
-                if all(pattern not in str(key).lower() for pattern in chart_patterns + ['kpi', 'metric', 'stat']):
-                    img = capture_element_screenshot(key)
-                    if img:
-                        chart_images.append(img)
+            remaining_keys = [
+                key for key in all_elements
+                if all(pattern not in str(key).lower() for pattern in chart_patterns + ['kpi', 'metric', 'stat'])
+            ]
+            if remaining_keys:
+                # Captures are independent browser sessions; map() keeps them in element order
+                workers = min(len(remaining_keys), MAX_CAPTURE_WORKERS, os.cpu_count() or 1)
+                # Resolve chromedriver before fanning out so the threads don't race on the install
+                driver_path = resolve_chromedriver_path()
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    for img in executor.map(partial(capture_element_screenshot, driver_path=driver_path), remaining_keys):
+                        if img:
+                            chart_images.append(img)
         
         print(f"STEP 1 RESULTS: Found {len(kpi_images)} KPI images and {len(chart_images)} chart images")
         
@@ -903,17 +943,18 @@ def generate_dashboard_report(df, filters=None):
         generated_charts = create_dashboard_styled_charts(df)
         print(f"Generated {len(generated_charts)} charts from data")
         
-        # Alert user if we're using fallback charts
+        # Report back when we're using fallback charts; the caller decides how to tell the user
+        status = "complete"
         if not kpi_images or not chart_images:
             print("Using fallback data-generated charts")
-            st.warning("Some dashboard elements couldn't be captured. The report will include data-generated charts.")
+            status = "partial"
         
         # Create the final report with both captured and generated data
         print("Creating final report...")
-        filename = create_dashboard_report(df, kpi_images, chart_images, filters)
+        filename = create_dashboard_report(df, kpi_images, chart_images, filters, generated_charts)
         
         print(f"Report saved to {filename}")
-        return filename
+        return filename, status
     except Exception as e:
         print(f"Error generating report: {str(e)}")
         import traceback
@@ -940,19 +981,6 @@ def generate_dashboard_report(df, filters=None):
                 )
                 
                 story = []
-                styles = getSampleStyleSheet()
-                
-                # Create a nicer header even in fallback mode
-                title_style = ParagraphStyle(
-                    'CustomTitle',
-                    parent=styles['Heading1'],
-                    fontSize=36,
-                    fontName='Helvetica-Bold',
-                    textColor=colors.HexColor('#1D5B79'),
-                    alignment=1,
-                    spaceAfter=30,
-                    leading=40
-                )
                 
                 logo_path = "assets/logo.png"
                 if os.path.exists(logo_path):
@@ -962,7 +990,7 @@ def generate_dashboard_report(df, filters=None):
                     logo_height = desired_width / aspect_ratio
                     header_table_data = [[
                         Image(logo_path, width=desired_width, height=logo_height),
-                        Paragraph("Fleet Safety Dashboard Report", title_style),
+                        Paragraph("Fleet Safety Dashboard Report", TITLE_STYLE),
                         ""  # Empty cell for balance
                     ]]
                     
@@ -973,24 +1001,14 @@ def generate_dashboard_report(df, filters=None):
                     ]))
                     story.append(header_table)
                 else:
-                    story.append(Paragraph("Fleet Safety Dashboard Report", title_style))
+                    story.append(Paragraph("Fleet Safety Dashboard Report", TITLE_STYLE))
                 
                 story.append(Spacer(1, 20))
                 
                 # Add timestamp
-                subtitle_style = ParagraphStyle(
-                    'CustomSubtitle',
-                    parent=styles['Heading2'],
-                    fontSize=18,
-                    fontName='Helvetica',
-                    textColor=colors.HexColor('#2E8B57'),
-                    alignment=1,
-                    spaceAfter=20
-                )
-                
                 story.append(Paragraph(
                     f"Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}",
-                    subtitle_style
+                    SUBTITLE_STYLE
                 ))
                 story.append(Spacer(1, 20))
                 story.append(PageBreak())
@@ -1003,26 +1021,18 @@ def generate_dashboard_report(df, filters=None):
                             img = Image(chart["image"], width=8*inch, height=4*inch)
                             story.append(Paragraph(
                                 chart_name,
-                                ParagraphStyle(
-                                    'ChartTitle',
-                                    parent=styles['Heading3'],
-                                    fontSize=18,
-                                    fontName='Helvetica-Bold',
-                                    textColor=colors.HexColor('#2E8B57'),
-                                    alignment=1,
-                                    spaceAfter=10
-                                )
+                                CHART_TITLE_STYLE
                             ))
                             story.append(img)
                             story.append(Spacer(1, 20))
                 
                 doc.build(story)
                 print(f"Successfully created fallback report: {filename}")
-                return filename
+                return filename, "fallback"
         except Exception as fallback_error:
             print(f"Even fallback approach failed: {str(fallback_error)}")
         
-        return None
+        return None, "failed"
 
 def generate_report(df, selected_dates=None, selected_plate=None):
     """Wrapper function to generate the report."""
@@ -1033,7 +1043,8 @@ def generate_report(df, selected_dates=None, selected_plate=None):
         if selected_plate and selected_plate != "All":
             filters['License Plate'] = selected_plate
             
-        return generate_dashboard_report(df, filters)
+        filename, _ = generate_dashboard_report(df, filters)
+        return filename
     except Exception as e:
         print(f"Error generating report: {str(e)}")
         return None
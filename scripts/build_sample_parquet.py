@@ -0,0 +1,24 @@
+import os
+import pandas as pd
+
+# Repository root, so the script works from any working directory
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bundled sample workbooks; the dashboard reads the .parquet copy written next to each one when present
+SAMPLE_FILES = [
+    os.path.join(ROOT_DIR, "data", "sample_fms_data.xlsx"),
+    os.path.join(ROOT_DIR, "assets", "sample_data.xlsx"),
+]
+
+def build_sample_parquet():
+    for path in SAMPLE_FILES:
+        if not os.path.exists(path):
+            print(f"Skipping {path} (not found)")
+            continue
+        parquet_path = os.path.splitext(path)[0] + ".parquet"
+        df = pd.read_excel(path)
+        df.to_parquet(parquet_path, engine="pyarrow", compression="zstd", index=False)
+        print(f"Wrote {parquet_path} ({len(df)} rows)")
+
+if __name__ == "__main__":
+    build_sample_parquet()
@@ -193,8 +193,9 @@ def render_sidebar(df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
 
         # Date range picker using the 'Date' column (or modify if you use 'Shift Date')
         if "Date" in df.columns:
-            min_date = df["Date"].min() if df["Date"].min() is not pd.NaT else datetime.date.today()
-            max_date = df["Date"].max() if df["Date"].max() is not pd.NaT else datetime.date.today()
+            date_min, date_max = df["Date"].min(), df["Date"].max()
+            min_date = pd.Timestamp(date_min).date() if pd.notna(date_min) else datetime.date.today()
+            max_date = pd.Timestamp(date_max).date() if pd.notna(date_max) else datetime.date.today()
             if "date_range" not in st.session_state:
                 st.session_state.date_range = (min_date, max_date)
             current_start, current_end = st.session_state.date_range
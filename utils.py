@@ -8,17 +8,21 @@ and data filtering.
 
 import os
 import time
+import hashlib
 import json
 import tempfile
 import shutil
 import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 from pathlib import Path
 from typing import Optional, Any, Dict
+from urllib.parse import quote_plus
 
 import pyodbc
 import streamlit as st
 import pandas as pd
 import numpy as np
+import openpyxl
 import plotly.express as px
 import plotly.graph_objects as go
 from reportlab.lib.pagesizes import letter, A4
@@ -26,18 +30,266 @@ from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
 
+# python-calamine (Rust XLSX reader) is optional; pandas' default openpyxl engine is used without it
+try:
+    import python_calamine  # noqa: F401
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+# numba is optional (not available on every platform); pure numpy fallbacks are used without it
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# pyarrow ships with streamlit, but the CSV export still falls back to pandas without it
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# connectorx (Rust, Arrow-based) is optional; SQL pulls go through pyodbc's cursor without it
+try:
+    import connectorx as cx
+    HAS_CONNECTORX = True
+except ImportError:
+    HAS_CONNECTORX = False
+
 # Local module imports
 from config import (
     THEME_CONFIG,
     GLOBAL_CSS,
     RISK_THRESHOLDS,
     UPLOAD_CONFIG,
+    DATA_CONFIG,
     PDF_CONFIG,
     DB_CONFIG,
 )
 from translations import TRANSLATIONS, get_translation
 
 
+def call_with_timeout(func, timeout: float, *args, **kwargs):
+    """
+    Run ``func(*args, **kwargs)`` on a worker thread and wait at most ``timeout`` seconds.
+
+    The worker is abandoned (not joined) on timeout, so a call blocked on an
+    unreachable network share no longer holds up the Streamlit script thread.
+
+    Raises:
+        TimeoutError: If the call does not finish in time
+    """
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        return executor.submit(func, *args, **kwargs).result(timeout=timeout)
+    except FuturesTimeout:
+        raise TimeoutError(f"{getattr(func, '__name__', 'call')} did not finish within {timeout:.0f}s")
+    finally:
+        executor.shutdown(wait=False)
+
+
+def share_path_exists(path: str) -> bool:
+    """
+    ``os.path.exists`` for network-share paths, bounded by ``DATA_CONFIG['share_probe_timeout']``.
+
+    Args:
+        path: File path, typically on an SMB share
+
+    Returns:
+        True if the path exists; False if it does not or the share did not answer in time
+    """
+    try:
+        return call_with_timeout(os.path.exists, DATA_CONFIG['share_probe_timeout'], path)
+    except TimeoutError:
+        logging.warning(f"Network share did not respond while probing {path}")
+        return False
+
+
+def read_excel_fast(source, **kwargs) -> pd.DataFrame:
+    """
+    Read an Excel workbook, using the calamine engine when it is installed.
+
+    Args:
+        source: File path or file-like object accepted by ``pd.read_excel``
+        **kwargs: Extra keyword arguments passed through to ``pd.read_excel``
+
+    Returns:
+        The parsed dataframe
+    """
+    if HAS_CALAMINE:
+        return pd.read_excel(source, engine="calamine", **kwargs)
+    if not kwargs:
+        return read_xlsx_streaming(source)
+    return pd.read_excel(source, **kwargs)
+
+
+def read_xlsx_streaming(source) -> pd.DataFrame:
+    """
+    Read the first sheet of an XLSX workbook with openpyxl's read-only row iterator.
+
+    Skips the per-cell object model ``pd.read_excel`` builds through openpyxl by
+    streaming plain value tuples; trailing blank rows are dropped like pandas does.
+
+    Args:
+        source: File path or file-like object of an ``.xlsx`` workbook
+
+    Returns:
+        The parsed dataframe, using the first row as the header
+    """
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)  # Sheet 0 like pd.read_excel, not the saved active tab
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        records = list(rows)
+    finally:
+        wb.close()
+    while records and all(value is None for value in records[-1]):
+        records.pop()
+    columns = [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+    return pd.DataFrame.from_records(records, columns=columns)
+
+
+def read_tabular(path: str) -> pd.DataFrame:
+    """
+    Read an Excel file from disk, preferring its Parquet sidecar when enabled.
+
+    With ``DATA_CONFIG['parquet_sidecar']`` set, ``<path>.parquet`` is read whenever
+    it is at least as new as the workbook; otherwise the workbook is parsed and the
+    sidecar is (re)written for the next load.
+
+    Args:
+        path: Path of the Excel workbook
+
+    Returns:
+        The parsed dataframe
+    """
+    if not (DATA_CONFIG['parquet_sidecar'] and HAS_PYARROW):
+        return read_excel_fast(path)
+    parquet_path = path + ".parquet"
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(path):
+        return pd.read_parquet(parquet_path, engine="pyarrow")
+    df = read_excel_fast(path)
+    try:
+        df.to_parquet(parquet_path, engine="pyarrow", compression="zstd", index=False)
+    except Exception as e:
+        # Read-only location or a mixed-type column Arrow cannot store; the Excel read still stands
+        logging.warning(f"Could not write Parquet sidecar {parquet_path}: {e}")
+    return df
+
+
+def prebuilt_parquet_path(path: str) -> str:
+    """Path of the pre-built Parquet copy of a bundled Excel file (see scripts/build_sample_parquet.py)."""
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def sample_data_exists(path: str) -> bool:
+    """Whether a bundled sample workbook or its pre-built Parquet copy is present."""
+    return os.path.exists(path) or os.path.exists(prebuilt_parquet_path(path))
+
+
+def read_sample_data(path: str) -> pd.DataFrame:
+    """
+    Read a bundled sample workbook, preferring its pre-built Parquet copy.
+
+    Args:
+        path: Path of the sample Excel workbook
+
+    Returns:
+        The parsed dataframe
+    """
+    parquet_path = prebuilt_parquet_path(path)
+    if HAS_PYARROW and os.path.exists(parquet_path):
+        return pd.read_parquet(parquet_path, engine="pyarrow")
+    return read_excel_fast(path)
+
+
+def save_sql_snapshot(df: pd.DataFrame) -> None:
+    """
+    Write the latest SQL pull to the local Parquet snapshot (zstd-compressed).
+
+    Failures are logged and ignored; the snapshot is only a fallback.
+
+    Args:
+        df: Raw dataframe returned by the SQL query
+    """
+    if not HAS_PYARROW:
+        return
+    snapshot_path = DATA_CONFIG['sql_snapshot_path']
+    try:
+        os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+        df.to_parquet(snapshot_path, engine="pyarrow", compression="zstd", index=False)
+    except Exception as e:
+        logging.warning(f"Could not write SQL snapshot {snapshot_path}: {e}")
+
+
+def sql_snapshot_age_text() -> str:
+    """
+    Describe when the local SQL snapshot was taken, for the stale-data banners.
+
+    Returns:
+        e.g. "taken 2024-05-01 06:30, 3 h ago", or an empty string if there is no snapshot
+    """
+    snapshot_path = DATA_CONFIG['sql_snapshot_path']
+    if not os.path.exists(snapshot_path):
+        return ""
+    taken = os.path.getmtime(snapshot_path)
+    age_minutes = max(0, int((time.time() - taken) // 60))
+    if age_minutes < 60:
+        age = f"{age_minutes} min ago"
+    elif age_minutes < 48 * 60:
+        age = f"{age_minutes // 60} h ago"
+    else:
+        age = f"{age_minutes // (24 * 60)} days ago"
+    return f"taken {time.strftime('%Y-%m-%d %H:%M', time.localtime(taken))}, {age}"
+
+
+def load_sql_snapshot() -> pd.DataFrame:
+    """
+    Read the local Parquet snapshot of the last SQL pull.
+
+    Returns:
+        The snapshot dataframe, or an empty dataframe if there is none
+    """
+    snapshot_path = DATA_CONFIG['sql_snapshot_path']
+    if not (HAS_PYARROW and os.path.exists(snapshot_path)):
+        return pd.DataFrame()
+    return pd.read_parquet(snapshot_path, engine="pyarrow")
+
+
+def dataframe_to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """
+    Serialize a dataframe to UTF-8 CSV bytes without the index.
+
+    Uses pyarrow's multithreaded CSV writer when it is available and
+    ``DataFrame.to_csv`` otherwise, or when Arrow cannot convert a column
+    (e.g. an object column mixing numbers and strings).
+
+    Args:
+        df: Dataframe to export
+
+    Returns:
+        The CSV file contents
+    """
+    if HAS_PYARROW:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            # The Arrow CSV writer does not take dictionary (categorical) columns; write their values instead
+            for i, field in enumerate(table.schema):
+                if pa.types.is_dictionary(field.type):
+                    table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+            buffer = pa.BufferOutputStream()
+            pacsv.write_csv(table, buffer)
+            return buffer.getvalue().to_pybytes()
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+    return df.to_csv(index=False).encode("utf-8")
+
+
 def process_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """
     Process a dataframe to ensure it has the correct column formats and values.
@@ -51,15 +303,17 @@ def process_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     # Make a copy to avoid modifying the original
     df = df.copy()
     
-    # Process date columns
+    # Process date columns; Date stays datetime64 (midnight) instead of one Python date object per row
     if "Shift Date" in df.columns:
         df["Shift Date"] = pd.to_datetime(df["Shift Date"], errors="coerce")
         df.dropna(subset=["Shift Date"], inplace=True)
-        df["Date"] = df["Shift Date"].dt.date
+        df["Date"] = df["Shift Date"].dt.normalize()
     
-    # Process shift values (capitalize)
+    # Process shift values (capitalize); only the handful of distinct labels are string-processed
     if "Shift" in df.columns:
-        df["Shift"] = df["Shift"].astype(str).str.capitalize()
+        shifts = df["Shift"].astype("category")
+        labels = shifts.cat.categories
+        df["Shift"] = shifts.map(dict(zip(labels, labels.astype(str).str.capitalize())))
     
     # Ensure driver names are clean
     if "Driver" in df.columns:
@@ -86,15 +340,14 @@ def assign_risk_level(df: pd.DataFrame) -> pd.DataFrame:
     """
     if "Overspeeding Value" in df.columns:
         df["Overspeeding Value"] = pd.to_numeric(df["Overspeeding Value"], errors="coerce")
-        conditions = [
-            df["Overspeeding Value"] >= RISK_THRESHOLDS["Extreme"],
-            (df["Overspeeding Value"] >= RISK_THRESHOLDS["High"]) & (df["Overspeeding Value"] < RISK_THRESHOLDS["Extreme"]),
-            df["Overspeeding Value"] < RISK_THRESHOLDS["High"]
-        ]
-        choices = ["Extreme", "High", "Medium"]
-        df["Risk Level"] = np.select(conditions, choices, default="Medium")
+        values = df["Overspeeding Value"].to_numpy(dtype=float)
+        bins = np.array([RISK_THRESHOLDS["High"], RISK_THRESHOLDS["Extreme"]], dtype=float)
+        codes = np.searchsorted(bins, values, side="right")
+        codes[np.isnan(values)] = 0  # Missing values stay Medium
+        # Fixed categories keep groupby/unstack on integer codes with every level present
+        df["Risk Level"] = pd.Categorical.from_codes(codes, categories=["Medium", "High", "Extreme"])
     else:
-        df["Risk Level"] = "Medium"
+        df["Risk Level"] = pd.Categorical(["Medium"] * len(df), categories=["Medium", "High", "Extreme"])
     return df
 
 
@@ -160,6 +413,62 @@ def get_sql_connection() -> Optional[pyodbc.Connection]:
         return None
 
 
+def get_connectorx_uri() -> Optional[str]:
+    """
+    Build the connectorx connection URI from the [sql] block in secrets.toml.
+
+    Returns:
+        str or None: An ``mssql://`` URI, or None when connectorx is unavailable
+        or no SQL credentials are configured.
+    """
+    if not HAS_CONNECTORX or not (hasattr(st, 'secrets') and 'sql' in st.secrets):
+        return None
+    sql = st.secrets.sql
+    host = f"{sql.host}:{sql.get('port', 1433)}"
+    if str(sql.get('trusted_connection', 'no')).lower() == 'yes':
+        return f"mssql://{host}/{sql.database}?trusted_connection=true"
+    return f"mssql://{quote_plus(sql.username)}:{quote_plus(sql.password)}@{host}/{sql.database}"
+
+
+def read_sql_query(query: str) -> pd.DataFrame:
+    """
+    Run a query, preferring connectorx's columnar transfer over pyodbc's row cursor.
+
+    When DATA_CONFIG['sql_partition_column'] is set the connectorx read is split
+    across DATA_CONFIG['sql_partition_num'] parallel range queries on that column.
+    A pyodbc connection is only opened when connectorx is unavailable or fails,
+    and is closed again once ``pd.read_sql`` returns.
+
+    Args:
+        query: SQL query to execute
+
+    Returns:
+        pd.DataFrame: The raw query result.
+
+    Raises:
+        ConnectionError: If the pyodbc fallback cannot connect
+    """
+    uri = get_connectorx_uri()
+    if uri is not None:
+        partition_kwargs = {}
+        if DATA_CONFIG['sql_partition_column']:
+            partition_kwargs = {
+                'partition_on': DATA_CONFIG['sql_partition_column'],
+                'partition_num': DATA_CONFIG['sql_partition_num'],
+            }
+        try:
+            return cx.read_sql(uri, query, return_type="pandas", **partition_kwargs)
+        except Exception as e:
+            logging.warning(f"connectorx read failed, falling back to pyodbc: {e}")
+    conn = get_sql_connection()
+    if conn is None:
+        raise ConnectionError("No SQL connection available")
+    try:
+        return pd.read_sql(query, conn)
+    finally:
+        conn.close()
+
+
 def render_header(title: str, subtitle: str = "", icon_path: Optional[str] = None, icon_width: int = 80) -> None:
     """
     Render a styled header with gradient background, title, subtitle, and an optional icon.
@@ -203,28 +512,8 @@ def fetch_sql_data() -> pd.DataFrame:
         pd.DataFrame: DataFrame containing the fetched data, or an empty DataFrame on error.
     """
     with st.spinner(TRANSLATIONS[st.session_state.language].get("loading", "Loading")):
-        conn = None
         try:
-            conn = get_sql_connection()
-            if conn:
-                try:
-                    query = "SELECT * FROM dbo.FMS_SPEED"
-                    df = pd.read_sql(query, conn)
-                    conn.close()
-                    conn = None
-                    return process_dataframe(df)  # Process the data before returning
-                except Exception as e:
-                    # Log the error but don't show it to the user
-                    logging.error(f"SQL Query Error: {e}")
-                    return pd.DataFrame()
-                finally:
-                    if conn:
-                        try:
-                            conn.close()
-                        except:
-                            pass
-            else:
-                return pd.DataFrame()
+            return process_dataframe(read_sql_query("SELECT * FROM dbo.FMS_SPEED"))
         except Exception as e:
             # Log the error but don't show it to the user
             logging.error(f"SQL fetch error: {e}")
@@ -233,7 +522,15 @@ def fetch_sql_data() -> pd.DataFrame:
 
 @st.cache_data(ttl=3600)  # Cache for 1 hour
 def load_data():
-    """Load data from an uploaded file or a default dataset."""
+    """
+    Load data from an uploaded file or a default dataset.
+
+    Returns:
+        tuple: ``(df, source)`` where source is "upload", "sql", "snapshot",
+        "network", "sample" or "none". The source is returned rather than only
+        written to session state, because the session_state writes below are
+        skipped when the result comes from the cache.
+    """
     # Set up logging for data source
     if 'data_source' not in st.session_state:
         st.session_state.data_source = None
@@ -243,12 +540,12 @@ def load_data():
     if uploaded_file is not None:
         try:
             logging.info(f"Attempting to load data from uploaded file: {uploaded_file.name}")
-            df = pd.read_excel(uploaded_file)
+            df = read_excel_fast(st.session_state.get("uploaded_path") or uploaded_file)
             st.session_state.using_default_data = False
             st.session_state.data_source = "upload"
             logging.info(f"Successfully loaded {len(df)} rows from uploaded file")
             st.success("✅ Uploaded dataset is now being used!")
-            return process_dataframe(df)
+            return process_dataframe(df), "upload"
         except Exception as e:
             error_msg = f"Failed to read uploaded file: {e}"
             logging.error(error_msg)
@@ -258,54 +555,65 @@ def load_data():
     sql_error = None
     try:
         logging.info("Attempting to load data from SQL Server...")
-        conn = get_sql_connection()
-        if conn:
-            try:
-                # Execute query
-                query = "SELECT * FROM dbo.FMS_SPEED"
-                logging.info(f"Executing SQL query: {query}")
-                
-                # Start timer to measure query performance
-                start_time = time.time()
-                df = pd.read_sql(query, conn)
-                query_time = time.time() - start_time
+        try:
+            # Execute query (connectorx when available; pyodbc is only opened as a fallback)
+            query = "SELECT * FROM dbo.FMS_SPEED"
+            logging.info(f"Executing SQL query: {query}")
+            
+            # Start timer to measure query performance
+            start_time = time.time()
+            df = read_sql_query(query)
+            query_time = time.time() - start_time
+            
+            if not df.empty:
+                # Log date range information for debugging
+                if 'Shift Date' in df.columns:
+                    min_date = pd.to_datetime(df['Shift Date']).min().date() if not df.empty else None
+                    max_date = pd.to_datetime(df['Shift Date']).max().date() if not df.empty else None
+                    logging.info(f"SQL data date range: {min_date} to {max_date}")
+                    # Show date range in UI for debugging
+                    st.session_state.sql_date_range = f"{min_date} to {max_date}"
                 
-                conn.close()
-                if not df.empty:
-                    # Log date range information for debugging
-                    if 'Shift Date' in df.columns:
-                        min_date = pd.to_datetime(df['Shift Date']).min().date() if not df.empty else None
-                        max_date = pd.to_datetime(df['Shift Date']).max().date() if not df.empty else None
-                        logging.info(f"SQL data date range: {min_date} to {max_date}")
-                        # Show date range in UI for debugging
-                        st.session_state.sql_date_range = f"{min_date} to {max_date}"
-                    
-                    st.session_state.using_default_data = False
-                    st.session_state.data_source = "sql"
-                    logging.info(f"Successfully loaded {len(df)} rows from SQL Server in {query_time:.2f} seconds")
-                    return process_dataframe(df)
-            except Exception as e:
-                # Log the error
-                sql_error = f"SQL query failed: {str(e)}"
-                logging.error(sql_error)
-                st.session_state.sql_connection_error = sql_error
+                st.session_state.using_default_data = False
+                st.session_state.data_source = "sql"
+                logging.info(f"Successfully loaded {len(df)} rows from SQL Server in {query_time:.2f} seconds")
+                save_sql_snapshot(df)
+                return process_dataframe(df), "sql"
+        except Exception as e:
+            # Log the error
+            sql_error = f"SQL query failed: {str(e)}"
+            logging.error(sql_error)
+            st.session_state.sql_connection_error = sql_error
     except Exception as e:
         # Log the error
         sql_error = f"SQL connection failed: {str(e)}"
         logging.error(sql_error)
         st.session_state.sql_connection_error = sql_error
     
+    # Try the local snapshot of the last SQL pull (much faster than the network workbook)
+    try:
+        df = load_sql_snapshot()
+        if not df.empty:
+            st.session_state.using_default_data = True
+            st.session_state.data_source = "snapshot"
+            logging.info(f"Successfully loaded {len(df)} rows from SQL snapshot")
+            st.info(f"ℹ️ Using the last SQL snapshot ({sql_snapshot_age_text()}).")
+            return process_dataframe(df), "snapshot"
+    except Exception as e:
+        error_msg = f"Failed to read SQL snapshot: {e}"
+        logging.error(error_msg)
+    
     # Try network file share (for local environment)
     DEFAULT_FILE_PATH = r"\\10.211.3.254\04. Mining\WBN - FLEET MANAGEMENT SYSTEM\Haulage DT Safety Event Report\FMS Event Data Query.xlsx"
-    if os.path.exists(DEFAULT_FILE_PATH):
+    if share_path_exists(DEFAULT_FILE_PATH):
         try:
             logging.info(f"Attempting to load data from network file: {DEFAULT_FILE_PATH}")
-            df = pd.read_excel(DEFAULT_FILE_PATH)
+            df = call_with_timeout(read_tabular, DATA_CONFIG['share_read_timeout'], DEFAULT_FILE_PATH)
             st.session_state.using_default_data = True
             st.session_state.data_source = "network"
             logging.info(f"Successfully loaded {len(df)} rows from network file")
             st.info("ℹ️ Using network dataset.")
-            return process_dataframe(df)
+            return process_dataframe(df), "network"
         except Exception as e:
             error_msg = f"Failed to read network file: {e}"
             logging.error(error_msg)
@@ -314,14 +622,14 @@ def load_data():
     try:
         # Check if we have a sample data file in the data directory
         sample_file = "data/sample_fms_data.xlsx"
-        if os.path.exists(sample_file):
+        if sample_data_exists(sample_file):
             logging.info(f"Falling back to sample data: {sample_file}")
-            df = pd.read_excel(sample_file)
+            df = read_sample_data(sample_file)
             st.session_state.using_default_data = True
             st.session_state.data_source = "sample"
             logging.info(f"Successfully loaded {len(df)} rows from sample file")
             st.warning("⚠️ Using sample dataset. Connect to SQL or upload data for latest information.")
-            return process_dataframe(df)
+            return process_dataframe(df), "sample"
     except Exception as e:
         error_msg = f"Failed to read sample file: {e}"
         logging.error(error_msg)
@@ -340,9 +648,10 @@ def load_data():
             if st.button("Go to Settings & Diagnostics"):
                 st.switch_page("pages/4_⚙️_Settings.py")
     
-    return pd.DataFrame()
+    return pd.DataFrame(), "none"
 
 
+@st.cache_data(show_spinner=False)
 def load_lottie_json(json_path: str) -> Optional[Any]:
     """
     Load and return the content of a Lottie animation JSON file.
@@ -363,6 +672,7 @@ def load_lottie_json(json_path: str) -> Optional[Any]:
     return None
 
 
+@st.cache_data(ttl=3600, show_spinner=False)
 def load_lottieurl(url: str) -> Optional[Any]:
     """
     Load a Lottie animation from a URL.
@@ -531,7 +841,8 @@ def get_shared_data() -> pd.DataFrame:
     Returns a processed DataFrame ready for use.
     """
     if "df" not in st.session_state:
-        df = load_data()
+        df, source = load_data()
+        st.session_state.data_source = source
         if not df.empty:
             st.session_state.df = df
             return df
@@ -542,6 +853,36 @@ def clear_shared_data() -> None:
     """Clear the shared data from session state."""
     if "df" in st.session_state:
         del st.session_state.df
+    st.session_state.pop("df_digest", None)
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """
+    Content digest of a DataFrame for use in cache keys.
+
+    Args:
+        df: Dataframe to fingerprint
+
+    Returns:
+        Hex digest of the column names and the per-row hashes in row order
+        (index excluded), so reordered rows give a different digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(tuple(df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+def session_frame_digest(df: pd.DataFrame) -> str:
+    """
+    ``frame_digest`` of the session dataset, computed once per frame object.
+
+    The digest is stored next to the frame it was computed for, so reruns reuse
+    it and any page that replaces ``st.session_state.df`` gets a fresh one.
+    """
+    cached = st.session_state.get("df_digest")
+    if cached is None or cached[0] is not df:
+        cached = (df, frame_digest(df))
+        st.session_state.df_digest = cached
+    return cached[1]
 
 def refresh_data_if_needed() -> None:
     """Check if data needs to be refreshed and reload if necessary."""
@@ -586,3 +927,115 @@ def ensure_column_types(df: pd.DataFrame) -> pd.DataFrame:
         df['Shift_Date_only'] = df['Shift Date'].dt.date
     
     return df
+
+
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True)
+    def masked_bincount(codes: np.ndarray, mask: np.ndarray, n_bins: int) -> np.ndarray:
+        """Count ``codes`` where ``mask`` is set; negative codes (missing values) are skipped."""
+        n_chunks = 16
+        chunk_size = (codes.size + n_chunks - 1) // n_chunks
+        partial = np.zeros((n_chunks, n_bins), dtype=np.int64)
+        # Each chunk fills its own row, so the parallel loop never shares an output slot
+        for chunk in prange(n_chunks):
+            stop = min((chunk + 1) * chunk_size, codes.size)
+            for i in range(chunk * chunk_size, stop):
+                code = codes[i]
+                if mask[i] and code >= 0:
+                    partial[chunk, code] += 1
+        return partial.sum(axis=0)
+else:
+    def masked_bincount(codes: np.ndarray, mask: np.ndarray, n_bins: int) -> np.ndarray:
+        """Count ``codes`` where ``mask`` is set; negative codes (missing values) are skipped."""
+        selected = codes[mask & (codes >= 0)]
+        return np.bincount(selected, minlength=n_bins).astype(np.int64)
+
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def group_mean_and_slope(codes: np.ndarray, values: np.ndarray, n_groups: int):
+        """
+        Per-group means of ``values`` plus the least-squares line through them.
+
+        Groups are the integer ``codes`` 0..n_groups-1 (negative codes and NaN
+        values are skipped). The line is fitted to (group position, group mean)
+        for the groups that have data; slope/intercept are NaN below two groups.
+        """
+        sums = np.zeros(n_groups)
+        counts = np.zeros(n_groups)
+        for i in range(codes.size):
+            code = codes[i]
+            value = values[i]
+            if code >= 0 and not np.isnan(value):
+                sums[code] += value
+                counts[code] += 1
+        means = np.full(n_groups, np.nan)
+        n = 0
+        sx = sy = sxx = sxy = 0.0
+        for g in range(n_groups):
+            if counts[g] > 0:
+                mean = sums[g] / counts[g]
+                means[g] = mean
+                n += 1
+                sx += g
+                sy += mean
+                sxx += g * g
+                sxy += g * mean
+        slope = np.nan
+        intercept = np.nan
+        if n >= 2:
+            slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+            intercept = (sy - slope * sx) / n
+        return means, slope, intercept
+else:
+    def group_mean_and_slope(codes: np.ndarray, values: np.ndarray, n_groups: int):
+        """
+        Per-group means of ``values`` plus the least-squares line through them.
+
+        Groups are the integer ``codes`` 0..n_groups-1 (negative codes and NaN
+        values are skipped). The line is fitted to (group position, group mean)
+        for the groups that have data; slope/intercept are NaN below two groups.
+        """
+        valid = (codes >= 0) & ~np.isnan(values)
+        sums = np.bincount(codes[valid], weights=values[valid], minlength=n_groups)
+        counts = np.bincount(codes[valid], minlength=n_groups)
+        means = np.full(n_groups, np.nan)
+        np.divide(sums, counts, out=means, where=counts > 0)
+        x = np.flatnonzero(counts > 0).astype(float)
+        y = means[counts > 0]
+        if x.size < 2:
+            return means, np.nan, np.nan
+        slope = ((x - x.mean()) * (y - y.mean())).sum() / ((x - x.mean()) ** 2).sum()
+        return means, slope, y.mean() - slope * x.mean()
+
+
+def count_by_category(series: pd.Series, mask: Optional[np.ndarray] = None) -> pd.Series:
+    """
+    Count rows per category of ``series``, optionally restricted to a boolean mask.
+
+    Equivalent to ``series[mask].value_counts()`` sorted by label with unobserved
+    categories dropped, but computed as a single bincount over the category codes.
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype("category")
+    codes = series.cat.codes.to_numpy()
+    if mask is None:
+        mask = np.ones(codes.size, dtype=bool)
+    counts = pd.Series(
+        masked_bincount(codes, np.asarray(mask, dtype=bool), len(series.cat.categories)),
+        index=series.cat.categories,
+    )
+    return counts[counts > 0]
+
+
+def category_isin(series: pd.Series, values) -> np.ndarray:
+    """
+    Boolean mask of ``series.isin(values)`` as a numpy array.
+
+    For categorical columns the test runs on the small integer codes rather than
+    on the Python string objects.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        wanted = series.cat.categories.get_indexer(list(values))
+        return np.isin(series.cat.codes.to_numpy(), wanted[wanted >= 0])
+    return series.isin(values).to_numpy()